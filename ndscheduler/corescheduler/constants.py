@@ -6,15 +6,32 @@
 DEFAULT_JOBS_TABLENAME = 'scheduler_jobs'
 DEFAULT_EXECUTIONS_TABLENAME = 'scheduler_execution'
 DEFAULT_AUDIT_LOGS_TABLENAME = 'scheduler_jobauditlog'
+DEFAULT_LEASES_TABLENAME = 'scheduler_lease'
+DEFAULT_NODES_TABLENAME = 'scheduler_node'
+DEFAULT_EXECUTION_RESULTS_TABLENAME = 'scheduler_execution_result'
 
 #
 # APScheduler Settings
 #
 DEFAULT_THREAD_POOL_SIZE = 4
+DEFAULT_PROCESS_POOL_SIZE = 4
 DEFAULT_JOB_MAX_INSTANCES = 3
 DEFAULT_JOB_COALESCE = True
 DEFAULT_TIMEZONE = 'UTC'
 
+# Jobs run in a pool of threads or a pool of processes.
+# A job class can pick the other kind of pool with the 'executor' key of its meta_info().
+EXECUTOR_TYPE_THREAD = 'thread'
+EXECUTOR_TYPE_PROCESS = 'process'
+EXECUTOR_TYPES = [EXECUTOR_TYPE_THREAD, EXECUTOR_TYPE_PROCESS]
+DEFAULT_EXECUTOR_TYPE = EXECUTOR_TYPE_THREAD
+
+# Jobs with a timeout run in a child process, which is killed when they time out or are stopped.
+# Seconds between two checks of whether a running execution was asked to stop.
+EXECUTION_STOP_POLL_INTERVAL_SEC = 1
+# Seconds a child process has to exit after SIGTERM, before it's sent SIGKILL.
+EXECUTION_KILL_GRACE_SEC = 5
+
 # When a job is misfired -- A job were to run at a specific time, but due to some
 # reason (e.g., scheduler restart), we miss that run.
 #
@@ -22,6 +39,41 @@ DEFAULT_TIMEZONE = 'UTC'
 # Otherwise, if it's misfired over 1 hour, the scheduler will not rerun it.
 DEFAULT_JOB_MISFIRE_GRACE_SEC = 3600
 
+#
+# Execution write-behind settings
+#
+# If enabled, execution state changes are queued in memory and written to the database in batches
+# by a background thread, instead of blocking the worker thread running the job.
+DEFAULT_EXECUTION_WRITE_BEHIND = False
+DEFAULT_EXECUTION_WRITE_BATCH_SIZE = 100
+DEFAULT_EXECUTION_WRITE_FLUSH_INTERVAL_SEC = 1
+
+# If enabled, jobs are stored as compact JSON rather than pickled, when they can be.
+DEFAULT_COMPACT_JOB_STATE = True
+
+# If enabled, the scheduler keeps all jobs in memory and only reads them from the database on start.
+DEFAULT_JOB_INDEX = False
+
+# Seconds after which the job listing cache reloads all jobs, to pick up changes made by other
+# scheduler processes sharing the datastore.
+DEFAULT_JOB_CACHE_MAX_AGE_SEC = 60
+
+#
+# Retention settings
+#
+# Rows are purged in transactions of at most this many rows. SQLite can't go above 999.
+DEFAULT_RETENTION_BATCH_SIZE = 500
+DEFAULT_RETENTION_INTERVAL_SEC = 3600
+
+# Results of executions longer than this many bytes, serialized, are stored compressed in a table
+# of their own, and only the first RESULT_PREVIEW_LENGTH characters of them stay in the executions
+# table. None keeps all results in the executions table.
+DEFAULT_EXECUTION_RESULT_INLINE_MAX_BYTES = 4096
+RESULT_PREVIEW_LENGTH = 200
+
+# Number of rows fetched and streamed at a time by exports of executions and audit logs.
+DEFAULT_EXPORT_CHUNK_SIZE = 1000
+
 # Number of args passed to jobs
 JOB_ARGS = 5
 
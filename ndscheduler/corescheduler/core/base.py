@@ -1,13 +1,44 @@
 """Ensure there's only one scheduler instancing running."""
 
 import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from datetime import datetime
 
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_MODIFIED, EVENT_JOB_REMOVED, JobEvent
+from apscheduler.executors.base import MaxInstancesReachedError
+from apscheduler.job import Job
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers import base as apscheduler_base
 from apscheduler.schedulers import tornado as apscheduler_tornado
+from apscheduler.triggers.date import DateTrigger
 
 from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler import stagger
 from ndscheduler.corescheduler import utils
 from ndscheduler.corescheduler.job import JobBase
 
+logger = logging.getLogger(__name__)
+
+
+def _run_job_in_child_process(connection, job_class, job_id, execution_id, args, kwargs):
+    """Runs a job in the child process of a killable job, and sends back a tuple of
+    (execution state, result, description) through connection.
+    """
+    try:
+        result = job_class.run_job(job_id, execution_id, *args, **kwargs)
+        outcome = (constants.EXECUTION_STATUS_SUCCEEDED,
+                   json.dumps(result, sort_keys=True, separators=(',', ':')),
+                   job_class.get_succeeded_description(result))
+    except Exception:
+        outcome = (constants.EXECUTION_STATUS_FAILED, job_class.get_failed_result(),
+                   job_class.get_failed_description())
+    connection.send(outcome)
+    connection.close()
+
 
 class BaseScheduler (apscheduler_tornado.TornadoScheduler):
     """It's a scheduler instance."""
@@ -17,6 +48,8 @@ class BaseScheduler (apscheduler_tornado.TornadoScheduler):
 
     def __init__(self, datastore_class_path, *args, **kwargs):
         self.datastore_class_path = datastore_class_path
+        # Jobs added without a stagger window of their own are staggered within this many seconds
+        self.job_stagger_window_sec = kwargs.pop('job_stagger_window_sec', None)
         super(BaseScheduler, self).__init__(*args, **kwargs)
 
     @classmethod
@@ -46,27 +79,60 @@ class BaseScheduler (apscheduler_tornado.TornadoScheduler):
         """
         execution_id = utils.generate_uuid()
         datastore = utils.get_datastore_instance(db_class_path, db_config, db_tablenames)
-        datastore.add_execution(execution_id, job_id,
-                                constants.EXECUTION_STATUS_SCHEDULED,
-                                description=JobBase.get_scheduled_description())
         try:
             job_class = utils.import_from_path(job_class_path)
-            datastore.update_execution(execution_id, state=constants.EXECUTION_STATUS_SCHEDULED,
-                                       description=job_class.get_scheduled_description())
             cls.run_scheduler_job(job_class, job_id, execution_id, datastore, *args, **kwargs)
+        except Exception:
+            # run_scheduler_job() only raises before the execution is recorded. Once it is,
+            # _run_recorded_job() records failures on it.
+            datastore.add_execution(execution_id, job_id,
+                                    constants.EXECUTION_STATUS_SCHEDULED_ERROR,
+                                    description=JobBase.get_scheduled_error_description(),
+                                    result=JobBase.get_scheduled_error_result())
+            return None
+        return execution_id
+
+    @classmethod
+    def run_scheduled_execution(cls, execution_id, job_class_path, job_id, db_class_path,
+                                db_config, db_tablenames, *args, **kwargs):
+        """Same as run_job(), for an execution already recorded in the scheduled state, e.g.,
+        by run_scheduler_job_now().
+        :param str execution_id: Execution id
+        :param str job_class_path: String for job class, e.g., 'myscheduler.jobs.a_job.NiceJob'
+        :param str job_id: Job id
+        :param str db_class_path: String for datstore class, e.g. 'datastores.DatastoreSqlite'
+        :param dict db_config: dictionary containing values for db connection
+        :param dict db_tablenames: dictionary containing the names for the jobs,
+        executions, or audit logs table
+        :param args: List of args provided to the job class to be run
+        :param kwargs: Keyword arguments
+        :return: string execution id, or None if the job couldn't be run
+        """
+        datastore = utils.get_datastore_instance(db_class_path, db_config, db_tablenames)
+        try:
+            job_class = utils.import_from_path(job_class_path)
+            cls.pre_run(job_class, job_id, execution_id, *args, **kwargs)
+            timeout = cls.get_job_timeout(job_class)
+            datastore.update_execution(execution_id, state=constants.EXECUTION_STATUS_RUNNING,
+                                       hostname=utils.get_hostname(), pid=utils.get_pid(),
+                                       description=job_class.get_running_description())
         except Exception:
             datastore.update_execution(execution_id,
                                        state=constants.EXECUTION_STATUS_SCHEDULED_ERROR,
                                        description=JobBase.get_scheduled_error_description(),
-                                       result=JobBase.get_scheduled_error_result()
-                                       )
+                                       result=JobBase.get_scheduled_error_result())
             return None
+        cls._run_recorded_job(job_class, job_id, execution_id, datastore, timeout,
+                              *args, **kwargs)
         return execution_id
 
     @classmethod
     def pre_run(cls, job_class, job_id, execution_id, *args, **kwargs):
         """Do any preprocessing before running the job.
         Override this function for your own implementation.
+        For scheduled runs, it's called before the execution is recorded, so there is no
+        execution with this id in the datastore yet. If it raises, the job doesn't run and the
+        execution is recorded as a scheduled error.
         :param JobBase job_class: Instance of job class
         :param str job_id: Job id
         :param str execution_id: Execution id
@@ -90,7 +156,10 @@ class BaseScheduler (apscheduler_tornado.TornadoScheduler):
 
     @classmethod
     def run_scheduler_job(cls, job_class, job_id, execution_id, datastore, *args, **kwargs):
-        """Run a job.
+        """Run a job and record its execution.
+        Exceptions raised by pre_run() or by recording the execution propagate, in which case
+        the execution isn't recorded. Exceptions raised by the job itself are recorded as a
+        failed execution.
         :param JobBase job_class: An instance of the job to run, e.g. myscheduler.jobs.a_job.NiceJob
         :param str job_id: Job id
         :param str execution_id: Execution id
@@ -99,25 +168,186 @@ class BaseScheduler (apscheduler_tornado.TornadoScheduler):
         :param kwargs: Keyword arguments
         """
         cls.pre_run(job_class, job_id, execution_id, *args, **kwargs)
+        timeout = cls.get_job_timeout(job_class)
+        # The execution is recorded as running right away, and updated once more when it's
+        # done, so that each run only costs two statements.
+        datastore.add_execution(execution_id, job_id, constants.EXECUTION_STATUS_RUNNING,
+                                hostname=utils.get_hostname(), pid=utils.get_pid(),
+                                description=job_class.get_running_description())
+        cls._run_recorded_job(job_class, job_id, execution_id, datastore, timeout,
+                              *args, **kwargs)
+
+    @classmethod
+    def _run_recorded_job(cls, job_class, job_id, execution_id, datastore, timeout,
+                          *args, **kwargs):
+        """Runs a job whose execution is recorded in the running state, and records how it ends.
+        It never raises: the execution is already recorded, so failures are recorded on it.
+        :param JobBase job_class: An instance of the job to run, e.g. myscheduler.jobs.a_job.NiceJob
+        :param str job_id: Job id
+        :param str execution_id: Execution id
+        :param DatastoreBase datastore: a datastore instance
+        :param float timeout: Number of seconds after which the job is killed, as returned by
+            get_job_timeout(). None runs it in the current thread.
+        :param args: List of args provided to the job class to be run
+        :param kwargs: Keyword arguments
+        """
         try:
-            datastore.update_execution(execution_id, state=constants.EXECUTION_STATUS_RUNNING,
-                                       hostname=utils.get_hostname(), pid=utils.get_pid(),
-                                       description=job_class.get_running_description())
+            if timeout is not None:
+                cls._run_killable_job(job_class, job_id, execution_id, datastore, timeout,
+                                      *args, **kwargs)
+                return
             result = job_class.run_job(job_id, execution_id, *args, **kwargs)
-            result_json = json.dumps(result, indent=4, sort_keys=True)
+            result_json = json.dumps(result, sort_keys=True, separators=(',', ':'))
             datastore.update_execution(execution_id, state=constants.EXECUTION_STATUS_SUCCEEDED,
                                        description=job_class.get_succeeded_description(result),
                                        result=result_json)
             cls.post_run(job_class, job_id, execution_id, result_json, *args, **kwargs)
         except Exception:
-            datastore.update_execution(execution_id,
-                                       state=constants.EXECUTION_STATUS_FAILED,
-                                       description=job_class.get_failed_description(),
-                                       result=job_class.get_failed_result())
+            try:
+                datastore.update_execution(execution_id,
+                                           state=constants.EXECUTION_STATUS_FAILED,
+                                           description=job_class.get_failed_description(),
+                                           result=job_class.get_failed_result())
+            except Exception:
+                logger.exception('Failed to record the failure of execution %s' % execution_id)
+
+    @classmethod
+    def get_job_timeout(cls, job_class):
+        """Returns the number of seconds after which a run of a job class is killed.
+        A job class sets it with the 'timeout_sec' key of its meta_info(). Override this function
+        for a default timeout.
+        :param JobBase job_class: A job class, e.g. myscheduler.jobs.a_job.NiceJob
+        :return: Number of seconds, or None if runs of the job class are never killed.
+        :rtype: float
+        """
+        return job_class.meta_info().get('timeout_sec')
+
+    @classmethod
+    def _run_killable_job(cls, job_class, job_id, execution_id, datastore, timeout,
+                          *args, **kwargs):
+        """Runs a job in a child process, and records its execution.
+        The child process is killed if the job runs for more than timeout seconds, or if the
+        execution is moved to the stopping state, e.g. by DatastoreBase.stop_execution(). This
+        frees the worker running the job either way.
+        :param JobBase job_class: An instance of the job to run, e.g. myscheduler.jobs.a_job.NiceJob
+        :param str job_id: Job id
+        :param str execution_id: Execution id
+        :param DatastoreBase datastore: a datastore instance
+        :param float timeout: Number of seconds after which the job is killed
+        :param args: List of args provided to the job class to be run
+        :param kwargs: Keyword arguments
+        """
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_run_job_in_child_process,
+            args=(sender, job_class, job_id, execution_id, args, kwargs))
+        try:
+            process.start()
+        except Exception:
+            receiver.close()
+            raise
+        finally:
+            # So that receiving from a child process that died raises EOFError.
+            sender.close()
+
+        deadline = time.time() + timeout
+        outcome = None
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    outcome = (constants.EXECUTION_STATUS_TIMEOUT,
+                               job_class.get_timeout_result(timeout),
+                               job_class.get_timeout_description())
+                    break
+                if receiver.poll(min(remaining, constants.EXECUTION_STOP_POLL_INTERVAL_SEC)):
+                    outcome = receiver.recv()
+                    break
+                try:
+                    state = datastore.get_execution_state(execution_id)
+                except Exception:
+                    # E.g., the database is briefly unreachable. Let the job run, and poll again.
+                    logger.warning('Failed to get the state of execution %s' % execution_id,
+                                   exc_info=True)
+                    continue
+                if state == constants.EXECUTION_STATUS_STOPPING:
+                    outcome = (constants.EXECUTION_STATUS_STOPPED,
+                               job_class.get_stopped_result(),
+                               job_class.get_stopped_description())
+                    break
+        except EOFError:
+            # The child process died without sending anything back.
+            process.join(constants.EXECUTION_KILL_GRACE_SEC)
+            outcome = (constants.EXECUTION_STATUS_FAILED,
+                       'Job process exited with code %s' % process.exitcode,
+                       job_class.get_failed_description())
+        except Exception:
+            outcome = (constants.EXECUTION_STATUS_FAILED, job_class.get_failed_result(),
+                       job_class.get_failed_description())
+        finally:
+            receiver.close()
+            if outcome and outcome[0] in (constants.EXECUTION_STATUS_SUCCEEDED,
+                                          constants.EXECUTION_STATUS_FAILED):
+                # It exits right after sending back its outcome.
+                process.join(constants.EXECUTION_KILL_GRACE_SEC)
+            cls._kill_process(process)
+
+        state, result, description = outcome
+        datastore.update_execution(execution_id, state=state, description=description,
+                                   result=result)
+        if state == constants.EXECUTION_STATUS_SUCCEEDED:
+            cls.post_run(job_class, job_id, execution_id, result, *args, **kwargs)
+
+    @classmethod
+    def _kill_process(cls, process):
+        """Terminates a child process, and kills it if it's still alive after
+        EXECUTION_KILL_GRACE_SEC seconds.
+        :param multiprocessing.Process process: A started child process.
+        """
+        if process.is_alive():
+            process.terminate()
+            process.join(constants.EXECUTION_KILL_GRACE_SEC)
+        if process.is_alive():
+            os.kill(process.pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        process.join()
+
+    def run_scheduler_job_now(self, job):
+        """Runs a job right away on its executor, outside of its schedule, without waiting for
+        the run to end.
+        The execution is recorded in the scheduled state until a worker of the executor picks it
+        up. Runs count towards the max_instances of the job.
+        This is a BLOCKING operation, as it records the execution.
+        :param Job job: An apscheduler.job.Job instance.
+        :return: String of execution id
+        :rtype: str
+        :raises MaxInstancesReachedError: if the job already has max_instances runs, in which
+            case the execution is recorded as a scheduled error.
+        """
+        execution_id = utils.generate_uuid()
+        datastore = self._lookup_jobstore('default')
+        datastore.add_execution(execution_id, job.id, constants.EXECUTION_STATUS_SCHEDULED,
+                                description=JobBase.get_scheduled_description())
+
+        now = datetime.now(self.timezone)
+        run = Job(self, id=job.id, name=job.name, func=self.run_scheduled_execution,
+                  trigger=DateTrigger(now), executor=job.executor,
+                  args=[execution_id] + list(job.args), kwargs=job.kwargs,
+                  misfire_grace_time=None, coalesce=False, max_instances=job.max_instances,
+                  next_run_time=now)
+        run._jobstore_alias = 'default'
+        try:
+            self._lookup_executor(job.executor).submit_job(run, [now])
+        except MaxInstancesReachedError:
+            datastore.update_execution(
+                execution_id, state=constants.EXECUTION_STATUS_SCHEDULED_ERROR,
+                result='Job already has %d running instances' % job.max_instances)
+            raise
+        return execution_id
 
     def add_scheduler_job(self, job_class_string, name, pub_args=None,
                           month=None, day_of_week=None, day=None,
-                          hour=None, minute=None, **kwargs):
+                          hour=None, minute=None, executor=None, stagger_window_sec=None,
+                          **kwargs):
         """Add a job. Job information will be persistent in postgres.
         This is a NON-BLOCKING operation, as internally, apscheduler calls wakeup()
         that is async.
@@ -129,14 +359,76 @@ class BaseScheduler (apscheduler_tornado.TornadoScheduler):
         :param str day: String for day cron string, e.g., */1
         :param str hour: String for hour cron string, e.g., */2
         :param str minute: String for minute cron string, e.g., */3
+        :param str executor: Alias of the executor running the job. By default, the one returned
+            by get_executor_alias().
+        :param int stagger_window_sec: The job runs up to this many seconds after its cron
+            schedule, by an offset hashed from its id. 0 doesn't stagger it. By default,
+            job_stagger_window_sec.
         :param dict kwargs: Other keyword arguments passed to run_job function.
         :return: String of job id, e.g., 6bca19736d374ef2b3df23eb278b512e
         :rtype: str
+        :raises ValueError: if there's no such executor.
         Returns:
             String of job id, e.g., 6bca19736d374ef2b3df23eb278b512e
         """
+        job_kwargs, trigger = self._get_add_job_arguments(
+            job_class_string, name, pub_args, month, day_of_week, day, hour, minute, executor,
+            stagger_window_sec, **kwargs)
+        self.add_job(self.run_job, trigger, **job_kwargs)
+        return job_kwargs['id']
+
+    def add_scheduler_jobs(self, jobs):
+        """Adds multiple jobs in one transaction of the datastore, and wakes up the scheduler
+        once rather than for each job.
+        This is a BLOCKING operation.
+        :param list jobs: Dictionaries of the arguments of add_scheduler_job(), e.g.,
+            [{'job_class_string': ..., 'name': ..., 'minute': ...}, ...]
+        :return: List of job ids, in the order of jobs.
+        :rtype: list
+        """
+        now = datetime.now(self.timezone)
+        new_jobs = []
+        for job_args in jobs:
+            job_kwargs, trigger = self._get_add_job_arguments(**job_args)
+            job = Job(self, func=self.run_job, trigger=trigger, **job_kwargs)
+            # Same as what apscheduler does to a job it adds.
+            replacements = dict((key, value) for key, value in self._job_defaults.items()
+                                if not hasattr(job, key))
+            replacements['next_run_time'] = job.trigger.get_next_fire_time(None, now)
+            job._modify(**replacements)
+            new_jobs.append(job)
+
+        with self._jobstores_lock:
+            if self.state == apscheduler_base.STATE_STOPPED:
+                # apscheduler adds pending jobs one by one when it starts.
+                self._pending_jobs.extend((job, 'default', False) for job in new_jobs)
+                return [job.id for job in new_jobs]
+            self._lookup_jobstore('default').add_jobs(new_jobs)
+            for job in new_jobs:
+                job._jobstore_alias = 'default'
+
+        for job in new_jobs:
+            self._dispatch_event(JobEvent(EVENT_JOB_ADDED, job.id, 'default'))
+        if self.state == apscheduler_base.STATE_RUNNING:
+            self.wakeup()
+        return [job.id for job in new_jobs]
+
+    def _get_add_job_arguments(self, job_class_string, name, pub_args=None, month=None,
+                               day_of_week=None, day=None, hour=None, minute=None, executor=None,
+                               stagger_window_sec=None, **kwargs):
+        """Returns the arguments of a new job, with a new job id.
+        Takes the same arguments as add_scheduler_job().
+        :return: A tuple of (arguments of apscheduler.job.Job other than func and trigger,
+            the trigger).
+        :rtype: tuple
+        :raises ValueError: if there's no such executor.
+        """
         if not pub_args:
             pub_args = []
+        if executor is None:
+            executor = self.get_executor_alias(job_class_string)
+        else:
+            self._check_executor_alias(executor)
 
         job_id = utils.generate_uuid()
         datastore = self._lookup_jobstore('default')
@@ -144,15 +436,55 @@ class BaseScheduler (apscheduler_tornado.TornadoScheduler):
                      datastore.db_config, datastore.table_names]
         arguments.extend(pub_args)
 
-        self.add_job(self.run_job,
-                     'cron', month=month, day=day, day_of_week=day_of_week, hour=hour,
-                     minute=minute, args=arguments, kwargs=kwargs, name=name, id=job_id)
-        return job_id
+        job_kwargs = {'args': arguments, 'kwargs': kwargs, 'name': name, 'id': job_id,
+                      'executor': executor}
+        trigger_args = {'month': month, 'day': day, 'day_of_week': day_of_week, 'hour': hour,
+                        'minute': minute}
+        trigger = stagger.with_offset(self._create_trigger('cron', trigger_args),
+                                      self.get_stagger_offset(job_id, stagger_window_sec))
+        return job_kwargs, trigger
+
+    def get_stagger_offset(self, job_id, window_sec=None):
+        """Returns the seconds a job runs after its cron schedule.
+        :param str job_id: Job id.
+        :param int window_sec: Stagger window of the job. By default, job_stagger_window_sec.
+        :rtype: int
+        """
+        if window_sec is None:
+            window_sec = self.job_stagger_window_sec
+        return stagger.get_offset(job_id, window_sec)
+
+    def _check_executor_alias(self, alias):
+        """
+        :param str alias: executor alias
+        :raises ValueError: if there's no such executor.
+        """
+        if alias not in self._executors:
+            raise ValueError('Unknown executor: %s' % alias)
+
+    def get_executor_alias(self, job_class_string):
+        """Returns the alias of the executor that should run a job class.
+        A job class picks an executor type with the 'executor' key of its meta_info(), e.g.,
+        'process' for CPU bound jobs, or the name of a pool of workers set up for it. Otherwise,
+        or if the job class can't be imported here, the default executor runs it.
+        :param str job_class_string: String for job class, e.g., myscheduler.jobs.a_job.NiceJob
+        :return: executor alias
+        :rtype: str
+        """
+        try:
+            job_class = utils.import_from_path(job_class_string)
+            executor_type = job_class.meta_info().get('executor')
+        except Exception:
+            return 'default'
+        # The default executor isn't registered under its type name.
+        if executor_type in self._executors:
+            return executor_type
+        return 'default'
 
     def modify_scheduler_job(self, job_id, **kwargs):
         """Modifies a job.
         This is a BLOCKING operation, because it calls get_job() that is blocking, even though
-        reschedule() and modify() are both non-blocking.
+        modify_job() is non-blocking.
         :param str job_id: String for job id to be modified.
         :param kwargs: keyword arguments, including:
             - name: String for job name
@@ -164,16 +496,66 @@ class BaseScheduler (apscheduler_tornado.TornadoScheduler):
             - day: String for day cron string, e.g., */1
             - hour: String for hour cron string, e.g., */2
             - minute: String for minute cron string, e.g., */3
+            - executor: Alias of the executor running the job
+        :raises ValueError: if there's no such executor.
         """
 
         # This is a BLOCKING operation
         job = self.get_job(job_id)
 
+        # This is a NON-BLOCKING operation
+        self.modify_job(job_id, **self._get_job_changes(job, **kwargs))
+
+    def modify_scheduler_jobs(self, changes):
+        """Modifies multiple jobs in one transaction of the datastore, and wakes up the scheduler
+        once rather than for each job.
+        This is a BLOCKING operation.
+        :param dict changes: Dictionary mapping job id to the keyword arguments of
+            modify_scheduler_job().
+        :raises JobLookupError: if a job doesn't exist, in which case no job is modified.
+        """
+        datastore = self._lookup_jobstore('default')
+        with self._jobstores_lock:
+            jobs = datastore.lookup_jobs(list(changes))
+            missing_job_ids = sorted(set(changes) - set(jobs))
+            if missing_job_ids:
+                raise JobLookupError(', '.join(missing_job_ids))
+            # Every job's changes are checked before any job is changed, as jobs may be the ones
+            # held by the job index.
+            job_changes = dict((job_id, self._get_job_changes(jobs[job_id], **kwargs))
+                               for job_id, kwargs in changes.items())
+            try:
+                for job_id, job_kwargs in job_changes.items():
+                    jobs[job_id]._modify(**job_kwargs)
+            except Exception:
+                datastore.reload_indexed_jobs(list(jobs))
+                raise
+            datastore.update_jobs(list(jobs.values()))
+
+        for job_id in changes:
+            self._dispatch_event(JobEvent(EVENT_JOB_MODIFIED, job_id, 'default'))
+        if self.state == apscheduler_base.STATE_RUNNING:
+            self.wakeup()
+
+    def _get_job_changes(self, job, **kwargs):
+        """Translates the arguments of modify_scheduler_job() to changes of apscheduler job.
+        :param Job job: Instance of apscheduler.job.Job to modify.
+        :return: A dictionary of changes for apscheduler.job.Job.
+        :rtype: dict
+        :raises ValueError: if there's no such executor.
+        """
+        if 'executor' in kwargs:
+            self._check_executor_alias(kwargs['executor'])
+
         # Handle args
         if 'job_class_string' in kwargs or 'pub_args' in kwargs:
             args = list(job.args)
             if 'job_class_string' in kwargs:
+                # Make sure the next run resolves the job class afresh.
+                utils.invalidate_import_cache(args[0])
+                utils.invalidate_import_cache(kwargs['job_class_string'])
                 args[0] = kwargs['job_class_string']
+                kwargs.setdefault('executor', self.get_executor_alias(kwargs['job_class_string']))
                 # 'task_name' is not an argument for modify_job.
                 del kwargs['job_class_string']
             if 'pub_args' in kwargs:
@@ -188,19 +570,33 @@ class BaseScheduler (apscheduler_tornado.TornadoScheduler):
                 trigger_kwargs[cron_key] = kwargs[cron_key]
                 del kwargs[cron_key]
 
+        offset_sec = stagger.get_trigger_offset(job.trigger)
+        if 'stagger_window_sec' in kwargs:
+            offset_sec = self.get_stagger_offset(job.id, kwargs.pop('stagger_window_sec'))
+        trigger = job.trigger
         if trigger_kwargs:
-            # This is a NON-BLOCKING operation
-            job.reschedule(trigger='cron', **trigger_kwargs)
+            trigger = self._create_trigger('cron', trigger_kwargs)
+        trigger = stagger.with_offset(trigger, offset_sec)
 
-        # This is a NON-BLOCKING operation
-        job.modify(**kwargs)
-
-        # apschedule has a "bug" or "feature":
-        # Whenever you modify a job, it resumes the job, no matter whether
-        # the job is paused or not originally.
-        # So we need to manually pause it at the end.
-        if not job.next_run_time:
-            job.pause()
+        if trigger is not job.trigger:
+            kwargs['trigger'] = trigger
+            # A paused job stays paused.
+            if job.next_run_time:
+                kwargs['next_run_time'] = kwargs['trigger'].get_next_fire_time(
+                    None, datetime.now(self.timezone))
+        return kwargs
+
+    def remove_scheduler_jobs(self, job_ids):
+        """Removes multiple jobs in one transaction of the datastore.
+        This is a BLOCKING operation.
+        :param list job_ids: Job ids.
+        :raises JobLookupError: if a job doesn't exist, in which case no job is removed.
+        """
+        with self._jobstores_lock:
+            self._lookup_jobstore('default').remove_jobs(job_ids)
+
+        for job_id in job_ids:
+            self._dispatch_event(JobEvent(EVENT_JOB_REMOVED, job_id, 'default'))
 
     def _process_jobs(self):
         """
@@ -1,11 +1,91 @@
 """Unit tests for BaseScheduler class."""
 
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
+from concurrent import futures
 
 import mock
+import sqlalchemy
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_MODIFIED, EVENT_JOB_REMOVED
+from apscheduler.executors.base import MaxInstancesReachedError
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.blocking import BlockingScheduler
 
+from ndscheduler.corescheduler import constants
 from ndscheduler.corescheduler.core.base import BaseScheduler
 from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.corescheduler.job import JobBase
+
+
+class SucceedingJob(JobBase):
+
+    def run(self, *args, **kwargs):
+        return {'args': list(args)}
+
+
+class FailingJob(JobBase):
+
+    def run(self, *args, **kwargs):
+        raise ValueError('Oops')
+
+
+class KillableJob(JobBase):
+
+    @classmethod
+    def meta_info(cls):
+        return dict(super(KillableJob, cls).meta_info(), timeout_sec=30)
+
+    def run(self, *args, **kwargs):
+        return {'args': list(args), 'pid': os.getpid()}
+
+
+class SlowJob(KillableJob):
+
+    def run(self, *args, **kwargs):
+        time.sleep(0.2)
+        return super(SlowJob, self).run(*args, **kwargs)
+
+
+class HangingJob(KillableJob):
+
+    @classmethod
+    def meta_info(cls):
+        return dict(super(HangingJob, cls).meta_info(), timeout_sec=0.5)
+
+    def run(self, *args, **kwargs):
+        time.sleep(60)
+
+
+class ExitingJob(KillableJob):
+
+    def run(self, *args, **kwargs):
+        os._exit(3)
+
+
+class BlockedJob(JobBase):
+
+    unblocked = threading.Event()
+
+    def run(self, *args, **kwargs):
+        self.unblocked.wait(10)
+
+
+class PreRunScheduler(BaseScheduler):
+
+    executions = []
+    error = None
+
+    @classmethod
+    def pre_run(cls, job_class, job_id, execution_id, *args, **kwargs):
+        datastore = DatastoreSqlite.get_instance()
+        cls.executions.append((execution_id, datastore.get_execution(execution_id)))
+        if cls.error:
+            raise cls.error
 
 
 class BaseSchedulerTest(unittest.TestCase):
@@ -27,3 +107,295 @@ class BaseSchedulerTest(unittest.TestCase):
             dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
             sched = BaseScheduler(dcp, jobstores=job_stores)
             self.assertEqual(sched._process_jobs(), sched.DEFAULT_WAIT_SECONDS)
+
+    def _run_job_counting_statements(self, job_class_path):
+        """Runs a job and returns its execution along with the statements sent to the db."""
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        datastore = DatastoreSqlite.get_instance()
+        datastore.start(BlockingScheduler(), None)
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sqlalchemy.event.listen(datastore.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            execution_id = BaseScheduler.run_job(job_class_path, 'job-id', dcp, None, None,
+                                                 'arg1')
+        finally:
+            sqlalchemy.event.remove(datastore.engine, 'before_cursor_execute',
+                                    before_cursor_execute)
+        return execution_id, statements
+
+    def test_run_job_succeeded(self):
+        execution_id, statements = self._run_job_counting_statements(
+            'ndscheduler.corescheduler.core.base_test.SucceedingJob')
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(statements[0].startswith('INSERT'))
+        self.assertTrue(statements[1].startswith('UPDATE'))
+
+        execution = DatastoreSqlite.get_instance().get_execution(execution_id)
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_SUCCEEDED])
+        self.assertIn('arg1', execution['result'])
+        self.assertTrue(execution['hostname'])
+
+    def test_run_job_failed(self):
+        execution_id, statements = self._run_job_counting_statements(
+            'ndscheduler.corescheduler.core.base_test.FailingJob')
+        self.assertEqual(len(statements), 2)
+
+        execution = DatastoreSqlite.get_instance().get_execution(execution_id)
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_FAILED])
+        self.assertIn('Oops', execution['result'])
+
+    def test_run_job_scheduled_error(self):
+        execution_id, statements = self._run_job_counting_statements(
+            'ndscheduler.corescheduler.core.base_test.NoSuchJob')
+        self.assertIsNone(execution_id)
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT'))
+
+    def _run_job_with_pre_run(self, error=None):
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        DatastoreSqlite.get_instance().start(BlockingScheduler(), None)
+        PreRunScheduler.executions = []
+        PreRunScheduler.error = error
+        execution_id = PreRunScheduler.run_job(
+            'ndscheduler.corescheduler.core.base_test.SucceedingJob', 'job-id', dcp, None, None)
+        self.assertEqual(len(PreRunScheduler.executions), 1)
+        return execution_id, PreRunScheduler.executions[0]
+
+    def test_pre_run_runs_before_execution_is_recorded(self):
+        execution_id, (pre_run_execution_id, execution) = self._run_job_with_pre_run()
+        self.assertEqual(pre_run_execution_id, execution_id)
+        self.assertIsNone(execution)
+
+    def test_pre_run_fails(self):
+        execution_id, (pre_run_execution_id, execution) = self._run_job_with_pre_run(
+            ValueError('Oops'))
+        self.assertIsNone(execution_id)
+        self.assertIsNone(execution)
+
+        execution = DatastoreSqlite.get_instance().get_execution(pre_run_execution_id)
+        self.assertEqual(
+            execution['state'],
+            constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_SCHEDULED_ERROR])
+
+    def test_run_job_in_forked_process(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        db_config = {'file_path': os.path.join(tmp_dir, 'datastore.db')}
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+
+        # The parent process has a datastore instance, which the child inherits.
+        DatastoreSqlite.destroy_instance()
+        datastore = DatastoreSqlite.get_instance(db_config)
+        self.addCleanup(DatastoreSqlite.destroy_instance)
+
+        executor = futures.ProcessPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        execution_id = executor.submit(
+            BaseScheduler.run_job, 'ndscheduler.corescheduler.core.base_test.SucceedingJob',
+            'job-id', dcp, db_config, None, 'arg1').result()
+
+        datastore.start(BlockingScheduler(), None)
+        execution = datastore.get_execution(execution_id)
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_SUCCEEDED])
+        self.assertNotEqual(execution['pid'], os.getpid())
+
+    def _get_killable_job_execution(self, job_class_path):
+        """Runs a job with a timeout and returns its execution."""
+        execution_id, _ = self._run_job_counting_statements(job_class_path)
+        return DatastoreSqlite.get_instance().get_execution(execution_id)
+
+    def test_run_killable_job_succeeded(self):
+        execution = self._get_killable_job_execution(
+            'ndscheduler.corescheduler.core.base_test.KillableJob')
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_SUCCEEDED])
+        result = json.loads(execution['result'])
+        self.assertEqual(result['args'], ['arg1'])
+        # It ran in a child process.
+        self.assertNotEqual(result['pid'], os.getpid())
+
+    def test_run_killable_job_timeout(self):
+        start = time.time()
+        execution = self._get_killable_job_execution(
+            'ndscheduler.corescheduler.core.base_test.HangingJob')
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_TIMEOUT])
+
+    def test_run_killable_job_stopped(self):
+        with mock.patch.object(DatastoreSqlite, 'get_execution_state',
+                               return_value=constants.EXECUTION_STATUS_STOPPING):
+            execution = self._get_killable_job_execution(
+                'ndscheduler.corescheduler.core.base_test.HangingJob')
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_STOPPED])
+
+    def test_run_killable_job_exited(self):
+        execution = self._get_killable_job_execution(
+            'ndscheduler.corescheduler.core.base_test.ExitingJob')
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_FAILED])
+        self.assertIn('code 3', execution['result'])
+
+    def test_run_killable_job_state_poll_fails(self):
+        # E.g., the database is unreachable for a while. The job keeps running.
+        with mock.patch.object(DatastoreSqlite, 'get_execution_state',
+                               side_effect=sqlalchemy.exc.OperationalError('', {}, None)), \
+                mock.patch.object(constants, 'EXECUTION_STOP_POLL_INTERVAL_SEC', 0.01):
+            execution = self._get_killable_job_execution(
+                'ndscheduler.corescheduler.core.base_test.SlowJob')
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_SUCCEEDED])
+
+    def test_run_killable_job_fails_to_start(self):
+        with mock.patch('multiprocessing.Process.start', side_effect=OSError('No memory')):
+            execution = self._get_killable_job_execution(
+                'ndscheduler.corescheduler.core.base_test.KillableJob')
+        # The recorded execution fails, instead of being recorded again.
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_FAILED])
+        self.assertIn('No memory', execution['result'])
+
+    def test_run_scheduled_execution_scheduled_error(self):
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        datastore = DatastoreSqlite.get_instance()
+        datastore.start(BlockingScheduler(), None)
+        datastore.add_execution('manual1', 'job-id', constants.EXECUTION_STATUS_SCHEDULED)
+        self.assertIsNone(BaseScheduler.run_scheduled_execution(
+            'manual1', 'ndscheduler.corescheduler.core.base_test.NoSuchJob', 'job-id', dcp,
+            None, None))
+        self.assertEqual(datastore.get_execution_state('manual1'),
+                         constants.EXECUTION_STATUS_SCHEDULED_ERROR)
+
+    def _wait_for_execution_state(self, datastore, execution_id, state):
+        for _ in range(100):
+            if datastore.get_execution_state(execution_id) == state:
+                return
+            time.sleep(0.1)
+        self.fail('Execution %s never got to state %s' % (execution_id, state))
+
+    def test_run_scheduler_job_now(self):
+        # The job runs on a thread of the executor, so the database can't be in memory.
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        DatastoreSqlite.destroy_instance()
+        self.addCleanup(DatastoreSqlite.destroy_instance)
+        datastore = DatastoreSqlite.get_instance({'file_path': os.path.join(tmp_dir, 'db')})
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        sched = BaseScheduler(dcp, jobstores={'default': datastore})
+        sched.start()
+        self.addCleanup(sched.shutdown)
+        self.addCleanup(BlockedJob.unblocked.set)
+
+        job_id = sched.add_scheduler_job(
+            'ndscheduler.corescheduler.core.base_test.BlockedJob', 'blocked', minute='*/1')
+        job = sched.get_job(job_id)
+        execution_id = sched.run_scheduler_job_now(job)
+        # It returned while the job is still running.
+        self._wait_for_execution_state(datastore, execution_id,
+                                       constants.EXECUTION_STATUS_RUNNING)
+
+        self.assertRaises(MaxInstancesReachedError, sched.run_scheduler_job_now, job)
+        executions = datastore.engine.execute(datastore.executions_table.select().where(
+            datastore.executions_table.c.eid != execution_id)).fetchall()
+        self.assertEqual([row.state for row in executions],
+                         [constants.EXECUTION_STATUS_SCHEDULED_ERROR])
+
+        BlockedJob.unblocked.set()
+        self._wait_for_execution_state(datastore, execution_id,
+                                       constants.EXECUTION_STATUS_SUCCEEDED)
+
+    def _start_scheduler(self):
+        """Starts a scheduler with a fresh in-memory datastore. Jobs never run."""
+        DatastoreSqlite.destroy_instance()
+        self.addCleanup(DatastoreSqlite.destroy_instance)
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        sched = BaseScheduler(dcp, jobstores={'default': DatastoreSqlite.get_instance()})
+        sched.start()
+        self.addCleanup(sched.shutdown)
+        return sched
+
+    def test_add_modify_remove_scheduler_jobs(self):
+        sched = self._start_scheduler()
+        datastore = sched._lookup_jobstore('default')
+        events = []
+        sched.add_listener(lambda event: events.append(event.code))
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement.split()[0])
+
+        sqlalchemy.event.listen(datastore.engine, 'before_cursor_execute', before_cursor_execute)
+        self.addCleanup(sqlalchemy.event.remove, datastore.engine, 'before_cursor_execute',
+                        before_cursor_execute)
+
+        with mock.patch.object(sched, 'wakeup') as mock_wakeup:
+            job_ids = sched.add_scheduler_jobs([
+                {'job_class_string': 'hello.world', 'name': 'job %d' % i, 'minute': '*/5',
+                 'pub_args': [i]}
+                for i in range(3)])
+        self.assertEqual(mock_wakeup.call_count, 1)
+        self.assertEqual(statements, ['INSERT'])
+        self.assertEqual(events, [EVENT_JOB_ADDED] * 3)
+        job = sched.get_job(job_ids[2])
+        self.assertEqual(job.name, 'job 2')
+        self.assertEqual(list(job.args[constants.JOB_ARGS:]), [2])
+        self.assertEqual(str(job.trigger.fields[6]), '*/5')
+        self.assertIsNotNone(job.next_run_time)
+
+        sched.pause_job(job_ids[1])
+        del events[:]
+        with mock.patch.object(sched, 'wakeup') as mock_wakeup:
+            sched.modify_scheduler_jobs(dict((job_id, {'name': 'renamed', 'minute': '*/7'})
+                                             for job_id in job_ids[:2]))
+        self.assertEqual(mock_wakeup.call_count, 1)
+        self.assertEqual(events, [EVENT_JOB_MODIFIED] * 2)
+        jobs = datastore.lookup_jobs(job_ids)
+        self.assertEqual(jobs[job_ids[0]].name, 'renamed')
+        self.assertEqual(str(jobs[job_ids[0]].trigger.fields[6]), '*/7')
+        self.assertIsNotNone(jobs[job_ids[0]].next_run_time)
+        # A paused job stays paused.
+        self.assertIsNone(jobs[job_ids[1]].next_run_time)
+        self.assertEqual(jobs[job_ids[2]].name, 'job 2')
+
+        del events[:]
+        sched.remove_scheduler_jobs(job_ids[:2])
+        self.assertEqual(events, [EVENT_JOB_REMOVED] * 2)
+        self.assertEqual([job.id for job in sched.get_jobs()], [job_ids[2]])
+
+    def test_bulk_changes_are_all_or_nothing(self):
+        sched = self._start_scheduler()
+        job_ids = sched.add_scheduler_jobs([
+            {'job_class_string': 'hello.world', 'name': 'job', 'minute': '*/5'}])
+
+        with self.assertRaises(JobLookupError):
+            sched.modify_scheduler_jobs({job_ids[0]: {'name': 'renamed'},
+                                         'missing': {'name': 'renamed'}})
+        with self.assertRaises(JobLookupError):
+            sched.remove_scheduler_jobs([job_ids[0], 'missing'])
+
+        self.assertEqual(sched.get_job(job_ids[0]).name, 'job')
+
+    def test_bulk_modify_with_job_index(self):
+        sched = self._start_scheduler()
+        datastore = sched._lookup_jobstore('default')
+        datastore.enable_job_index()
+        datastore.start(sched, 'default')
+        job_ids = sched.add_scheduler_jobs([
+            {'job_class_string': 'hello.world', 'name': 'job%d' % i, 'minute': '*/5'}
+            for i in range(2)])
+
+        # The second job's changes are invalid, so the first job isn't changed either.
+        with self.assertRaises(ValueError):
+            sched.modify_scheduler_jobs({job_ids[0]: {'name': 'renamed', 'minute': '*/7'},
+                                         job_ids[1]: {'minute': 'abc'}})
+        job = sched.get_job(job_ids[0])
+        self.assertEqual(job.name, 'job0')
+        self.assertEqual(str(job.trigger), "cron[minute='*/5']")
@@ -0,0 +1,93 @@
+"""A scheduler that only schedules jobs while it holds a lease in the datastore.
+
+Run as many of these processes as needed against the same datastore: one of them is the leader
+and schedules jobs, the others are hot standbys that take over once the leader's lease expires.
+
+A leader may not notice right away that it lost its lease, e.g., if it stalls for longer than
+LEASE_TTL_SECONDS in the middle of processing jobs. The fencing token of its lease guards against
+that: while it processes jobs, updates and removals of jobs are only written if it still holds the
+lease with that token. The first one that isn't stops processing, so a deposed leader dispatches
+at most the one run whose job update was refused.
+"""
+
+import logging
+
+from ndscheduler.corescheduler import utils
+from ndscheduler.corescheduler.core import base
+from ndscheduler.corescheduler.datastore.base import LeaseLostError
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderScheduler(base.BaseScheduler):
+    """Elects a leader among scheduler processes with a lease stored in the datastore."""
+
+    LEASE_NAME = 'scheduler'
+
+    # Seconds before the lease expires if the leader doesn't renew it, i.e., the upper bound of
+    # how long the leader is gone before a standby takes over.
+    LEASE_TTL_SECONDS = 30
+
+    # Seconds between lease renewals by the leader, and between attempts to acquire the lease by
+    # standbys. Has to be well below LEASE_TTL_SECONDS.
+    LEASE_RENEW_SECONDS = 10
+
+    def __init__(self, datastore_class_path, *args, **kwargs):
+        self.lease_holder = '%s:%s:%s' % (utils.get_hostname(), utils.get_pid(),
+                                          utils.generate_uuid())
+        self.fencing_token = None
+        super(LeaderScheduler, self).__init__(datastore_class_path, *args, **kwargs)
+
+    def is_okay_to_run(self, datastore):
+        """Acquires or renews the lease. It's okay to run if this process holds it.
+        :param DatastoreBase datastore: a DatastoreBase instance.
+        :return: True if this process is the leader; otherwise, False.
+        :rtype: bool
+        """
+        try:
+            token = datastore.acquire_lease(self.LEASE_NAME, self.lease_holder,
+                                            self.LEASE_TTL_SECONDS)
+        except Exception:
+            # We can't tell whether the lease is still ours, so assume it isn't.
+            logger.exception('Failed to acquire lease %s' % self.LEASE_NAME)
+            token = None
+
+        if token != self.fencing_token:
+            if token:
+                logger.info('%s is now the leader (fencing token: %d)' % (
+                    self.lease_holder, token))
+            else:
+                logger.info('%s is no longer the leader' % self.lease_holder)
+        self.fencing_token = token
+        return token is not None
+
+    def _process_jobs(self):
+        """
+        :return: Integer for seconds to wake up in next processing cycle. It's never longer than
+            LEASE_RENEW_SECONDS, so that the leader renews its lease in time and standbys try to
+            take over shortly after it expires.
+        :rtype: int
+        """
+        datastore = self._lookup_jobstore('default')
+        if not self.is_okay_to_run(datastore):
+            return self.LEASE_RENEW_SECONDS
+
+        datastore.fence = (self.LEASE_NAME, self.lease_holder, self.fencing_token)
+        try:
+            wait_seconds = super(base.BaseScheduler, self)._process_jobs()
+        except LeaseLostError:
+            logger.warning('%s lost the lease while processing jobs' % self.lease_holder)
+            self.fencing_token = None
+            return self.LEASE_RENEW_SECONDS
+        finally:
+            datastore.fence = None
+        if wait_seconds is None:
+            return self.LEASE_RENEW_SECONDS
+        return min(wait_seconds, self.LEASE_RENEW_SECONDS)
+
+    def shutdown(self, *args, **kwargs):
+        """Releases the lease on the way out, so that a standby takes over right away."""
+        super(LeaderScheduler, self).shutdown(*args, **kwargs)
+        if self.fencing_token is not None:
+            self._lookup_jobstore('default').release_lease(self.LEASE_NAME, self.lease_holder)
+            self.fencing_token = None
@@ -0,0 +1,136 @@
+"""Unit tests for LeaderScheduler class."""
+
+import datetime
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+import mock
+from apscheduler.schedulers.blocking import BlockingScheduler
+from dateutil import tz
+
+from ndscheduler.corescheduler.core.leader import LeaderScheduler
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+
+DATASTORE_CLASS_PATH = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+
+
+def hold_lease(db_config, ttl_sec, acquired):
+    """Acts as a leader in another process: holds the lease until it gets killed."""
+    datastore = DatastoreSqlite.get_instance(db_config)
+    while True:
+        if datastore.acquire_lease(LeaderScheduler.LEASE_NAME, 'leader process', ttl_sec):
+            acquired.set()
+        time.sleep(ttl_sec / 4)
+
+
+def do_nothing():
+    pass
+
+
+class LeaderSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        # Leader and standbys may live in different processes, so use a file.
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.db_config = {'file_path': os.path.join(tmp_dir, 'datastore.db')}
+        DatastoreSqlite.destroy_instance()
+        self.addCleanup(DatastoreSqlite.destroy_instance)
+        self.datastore = DatastoreSqlite.get_instance(self.db_config)
+        self.datastore.start(BlockingScheduler(), None)
+
+    def _create_scheduler(self):
+        return LeaderScheduler(DATASTORE_CLASS_PATH, jobstores={'default': self.datastore})
+
+    def test_only_one_leader(self):
+        leader = self._create_scheduler()
+        standby = self._create_scheduler()
+
+        self.assertTrue(leader.is_okay_to_run(self.datastore))
+        self.assertFalse(standby.is_okay_to_run(self.datastore))
+        # Renewal keeps the fencing token.
+        self.assertTrue(leader.is_okay_to_run(self.datastore))
+        self.assertEqual(leader.fencing_token, 1)
+        self.assertIsNone(standby.fencing_token)
+
+        self.assertEqual(leader._process_jobs(), LeaderScheduler.LEASE_RENEW_SECONDS)
+        self.assertEqual(standby._process_jobs(), LeaderScheduler.LEASE_RENEW_SECONDS)
+
+    def test_takeover_after_lease_expires(self):
+        leader = self._create_scheduler()
+        standby = self._create_scheduler()
+
+        with mock.patch.object(LeaderScheduler, 'LEASE_TTL_SECONDS', 0.1):
+            self.assertTrue(leader.is_okay_to_run(self.datastore))
+            self.assertFalse(standby.is_okay_to_run(self.datastore))
+            time.sleep(0.2)
+            self.assertTrue(standby.is_okay_to_run(self.datastore))
+            self.assertFalse(leader.is_okay_to_run(self.datastore))
+
+        self.assertEqual(standby.fencing_token, 2)
+        self.assertIsNone(leader.fencing_token)
+
+    def test_release_lease_on_shutdown(self):
+        leader = self._create_scheduler()
+        standby = self._create_scheduler()
+        leader.start()
+        self.assertTrue(leader.is_okay_to_run(self.datastore))
+        self.assertFalse(standby.is_okay_to_run(self.datastore))
+
+        leader.shutdown()
+        self.assertTrue(standby.is_okay_to_run(self.datastore))
+
+    def test_deposed_leader_is_fenced_off(self):
+        leader = self._create_scheduler()
+        standby = self._create_scheduler()
+        for scheduler in (leader, standby):
+            scheduler.start()
+            self.addCleanup(scheduler.shutdown)
+        with mock.patch.object(LeaderScheduler, 'LEASE_TTL_SECONDS', 0.1):
+            self.assertTrue(leader.is_okay_to_run(self.datastore))
+            time.sleep(0.2)
+            self.assertTrue(standby.is_okay_to_run(self.datastore))
+
+        next_run_time = datetime.datetime.now(tz.tzutc()) - datetime.timedelta(seconds=30)
+        leader.add_job(do_nothing, 'cron', minute='*', id='fenced', next_run_time=next_run_time)
+        # The leader stalled right after it checked its lease, and hasn't noticed it lost it.
+        with mock.patch.object(LeaderScheduler, 'is_okay_to_run', return_value=True):
+            self.assertEqual(leader._process_jobs(), LeaderScheduler.LEASE_RENEW_SECONDS)
+        self.assertIsNone(leader.fencing_token)
+        self.assertIsNone(self.datastore.fence)
+        self.assertEqual(self.datastore.lookup_job('fenced').next_run_time, next_run_time)
+
+        # The new leader's writes go through.
+        with mock.patch.object(LeaderScheduler, 'is_okay_to_run', return_value=True):
+            standby._process_jobs()
+        self.assertGreater(self.datastore.lookup_job('fenced').next_run_time, next_run_time)
+
+    def test_failover_when_leader_is_killed(self):
+        ttl_sec = 0.5
+        poll_sec = 0.05
+        acquired = multiprocessing.Event()
+        leader = multiprocessing.Process(target=hold_lease,
+                                         args=(self.db_config, ttl_sec, acquired))
+        leader.start()
+        self.addCleanup(leader.join)
+        self.assertTrue(acquired.wait(10))
+
+        standby = self._create_scheduler()
+        with mock.patch.object(LeaderScheduler, 'LEASE_TTL_SECONDS', ttl_sec):
+            self.assertFalse(standby.is_okay_to_run(self.datastore))
+
+            os.kill(leader.pid, signal.SIGKILL)
+            killed_at = time.time()
+            while not standby.is_okay_to_run(self.datastore):
+                self.assertLess(time.time() - killed_at, 10 * ttl_sec)
+                time.sleep(poll_sec)
+            failover_sec = time.time() - killed_at
+
+        # The lease was renewed at most ttl_sec ago, and standby polls every poll_sec.
+        self.assertLessEqual(failover_sec, ttl_sec + 2 * poll_sec)
+        self.assertEqual(standby.fencing_token, 2)
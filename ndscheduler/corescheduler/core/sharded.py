@@ -0,0 +1,133 @@
+"""A scheduler that shares the jobs with other scheduler processes.
+
+Run as many of these processes as needed against the same datastore. Job ids are partitioned
+among the live processes (nodes) with a consistent hash ring, and each node only runs the jobs in
+its partition. Nodes announce themselves with heartbeats in the datastore. When a node joins or
+shuts down, the others pick up the change within HEARTBEAT_SECONDS, or NODE_TTL_SECONDS if a node
+dies, and the partitions rebalance. Consistent hashing keeps the number of jobs that move to
+another node small.
+
+While nodes disagree on who is alive, e.g., right after one joins, a due job may be run by two
+nodes, or by none until the next heartbeat, in which case it's run late as a misfire.
+"""
+
+import bisect
+import hashlib
+import logging
+import time
+
+from ndscheduler.corescheduler import utils
+from ndscheduler.corescheduler.core import base
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing(object):
+    """Consistent hash ring mapping keys to nodes."""
+
+    # Points per node on the ring. More points spread keys more evenly.
+    VIRTUAL_NODES = 100
+
+    def __init__(self, nodes):
+        """
+        :param list nodes: node ids.
+        """
+        self.nodes = sorted(nodes)
+        ring = []
+        for node in self.nodes:
+            for i in range(self.VIRTUAL_NODES):
+                ring.append((self._hash('%s#%d' % (node, i)), node))
+        ring.sort()
+        self._hashes = [point for point, _ in ring]
+        self._nodes = [node for _, node in ring]
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+    def get_node(self, key):
+        """Returns the node owning a key, or None if the ring is empty.
+        :param str key: e.g., a job id.
+        :rtype: str
+        """
+        if not self._nodes:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class ShardedScheduler(base.BaseScheduler):
+    """Runs the jobs in this node's partition of job ids."""
+
+    # Seconds between heartbeats, i.e., how often a node refreshes the list of live nodes.
+    HEARTBEAT_SECONDS = 10
+
+    # Seconds without heartbeat after which a node is considered dead and its jobs move.
+    NODE_TTL_SECONDS = 30
+
+    def __init__(self, datastore_class_path, *args, **kwargs):
+        self.node_id = '%s:%s:%s' % (utils.get_hostname(), utils.get_pid(),
+                                     utils.generate_uuid())
+        self.ring = HashRing([self.node_id])
+        self.last_heartbeat = None
+        super(ShardedScheduler, self).__init__(datastore_class_path, *args, **kwargs)
+
+    def owns_job(self, job_id):
+        """Returns True if the job is in this node's partition.
+        :param str job_id: Job id
+        :rtype: bool
+        """
+        return self.ring.get_node(job_id) == self.node_id
+
+    def refresh_membership(self, force=False):
+        """Sends a heartbeat and rebuilds the hash ring from the live nodes.
+        Does nothing if the last heartbeat is less than HEARTBEAT_SECONDS old, unless forced.
+        :param bool force: True to refresh regardless of the last heartbeat.
+        """
+        now = time.time()
+        if (not force and self.last_heartbeat and
+                now - self.last_heartbeat < self.HEARTBEAT_SECONDS):
+            return
+        datastore = self._lookup_jobstore('default')
+        try:
+            datastore.heartbeat_node(self.node_id)
+            datastore.remove_nodes(ttl_sec=self.NODE_TTL_SECONDS)
+            nodes = datastore.get_live_nodes(self.NODE_TTL_SECONDS)
+        except Exception:
+            # Keep the current partition; other nodes take it over if this goes on.
+            logger.exception('Failed to refresh scheduler nodes')
+            return
+        self.last_heartbeat = now
+
+        if self.node_id not in nodes:
+            nodes.append(self.node_id)
+        if sorted(nodes) != self.ring.nodes:
+            logger.info('Scheduler nodes changed: %s' % ', '.join(sorted(nodes)))
+            self.ring = HashRing(nodes)
+        datastore.job_filter = self.owns_job
+
+    def _process_jobs(self):
+        """
+        :return: Integer for seconds to wake up in next processing cycle. It's never longer than
+            HEARTBEAT_SECONDS, so that the node keeps sending heartbeats.
+        :rtype: int
+        """
+        if not self.is_okay_to_run(self._lookup_jobstore('default')):
+            return self.DEFAULT_WAIT_SECONDS
+
+        self.refresh_membership()
+        if not self.last_heartbeat:
+            # Until membership loads once, this node doesn't know its partition, and would
+            # otherwise run every job.
+            return self.HEARTBEAT_SECONDS
+        wait_seconds = super(base.BaseScheduler, self)._process_jobs()
+        if wait_seconds is None:
+            return self.HEARTBEAT_SECONDS
+        return min(wait_seconds, self.HEARTBEAT_SECONDS)
+
+    def shutdown(self, *args, **kwargs):
+        """Leaves the ring on the way out, so that other nodes take over its jobs right away."""
+        super(ShardedScheduler, self).shutdown(*args, **kwargs)
+        datastore = self._lookup_jobstore('default')
+        datastore.job_filter = None
+        datastore.remove_nodes(node_id=self.node_id)
@@ -0,0 +1,136 @@
+"""Unit tests for ShardedScheduler class."""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import pytz
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from ndscheduler.corescheduler.core.sharded import HashRing
+from ndscheduler.corescheduler.core.sharded import ShardedScheduler
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.corescheduler.datastore.testing import make_job
+
+DATASTORE_CLASS_PATH = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+
+
+class HashRingTest(unittest.TestCase):
+
+    def test_keys_spread_over_nodes(self):
+        ring = HashRing(['a', 'b', 'c'])
+        counts = {'a': 0, 'b': 0, 'c': 0}
+        for i in range(3000):
+            counts[ring.get_node('job%d' % i)] += 1
+        for count in counts.values():
+            self.assertGreater(count, 700)
+
+    def test_only_keys_of_removed_node_move(self):
+        ring = HashRing(['a', 'b', 'c'])
+        smaller_ring = HashRing(['a', 'c'])
+        for i in range(1000):
+            key = 'job%d' % i
+            if ring.get_node(key) != 'b':
+                self.assertEqual(smaller_ring.get_node(key), ring.get_node(key))
+
+    def test_empty_ring(self):
+        self.assertIsNone(HashRing([]).get_node('job'))
+
+
+class ShardedSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.db_config = {'file_path': os.path.join(tmp_dir, 'datastore.db')}
+
+        self.now = datetime.datetime.now(pytz.utc)
+        datastore = self._create_datastore()
+        fake_scheduler = BlockingScheduler()
+        for i in range(100):
+            datastore.add_job(make_job(
+                fake_scheduler, 'job%d' % i, 'job',
+                next_run_time=self.now - datetime.timedelta(seconds=i)))
+
+    def _create_datastore(self):
+        # Nodes normally live in different processes, each with its own datastore instance.
+        datastore = DatastoreSqlite(self.db_config, None)
+        datastore.start(BlockingScheduler(), None)
+        self.addCleanup(datastore.engine.dispose)
+        return datastore
+
+    def _create_node(self):
+        return ShardedScheduler(DATASTORE_CLASS_PATH,
+                                jobstores={'default': self._create_datastore()})
+
+    def _get_due_job_ids(self, node):
+        return set(job.id for job in node._lookup_jobstore('default').get_due_jobs(self.now))
+
+    def test_nodes_split_due_jobs(self):
+        node1 = self._create_node()
+        node2 = self._create_node()
+        node1.refresh_membership(force=True)
+        node2.refresh_membership(force=True)
+        node1.refresh_membership(force=True)
+
+        job_ids1 = self._get_due_job_ids(node1)
+        job_ids2 = self._get_due_job_ids(node2)
+        self.assertTrue(job_ids1)
+        self.assertTrue(job_ids2)
+        self.assertFalse(job_ids1 & job_ids2)
+        self.assertEqual(len(job_ids1 | job_ids2), 100)
+
+        for node, job_ids in ((node1, job_ids1), (node2, job_ids2)):
+            next_run_time = node._lookup_jobstore('default').get_next_run_time()
+            oldest_job_id = 'job%d' % max(int(job_id[3:]) for job_id in job_ids)
+            self.assertEqual(next_run_time,
+                             node._lookup_jobstore('default').lookup_job(
+                                 oldest_job_id).next_run_time)
+
+    def test_overdue_jobs_of_other_nodes(self):
+        datastore = self._create_datastore()
+        datastore.NEXT_RUN_TIME_SCAN_LIMIT = 10
+        # All the jobs are overdue, and belong to another node, e.g., one that died.
+        datastore.job_filter = lambda job_id: False
+        next_run_time = datastore.get_next_run_time()
+        self.assertGreater(next_run_time, datetime.datetime.now(pytz.utc))
+
+    def test_rebalance_when_node_leaves(self):
+        node1 = self._create_node()
+        node2 = self._create_node()
+        node1.refresh_membership(force=True)
+        node2.refresh_membership(force=True)
+        node1.refresh_membership(force=True)
+        self.assertLess(len(self._get_due_job_ids(node1)), 100)
+
+        node2.start()
+        node2.shutdown()
+        node1.refresh_membership(force=True)
+        self.assertEqual(len(self._get_due_job_ids(node1)), 100)
+
+    def test_heartbeat_is_throttled(self):
+        node1 = self._create_node()
+        node2 = self._create_node()
+        node1.refresh_membership()
+        node2.refresh_membership()
+        # node1 doesn't look for other nodes again until HEARTBEAT_SECONDS pass.
+        node1.refresh_membership()
+        self.assertEqual(node1.ring.nodes, [node1.node_id])
+        self.assertEqual(len(self._get_due_job_ids(node1)), 100)
+
+    def test_no_jobs_run_until_membership_loads(self):
+        node = self._create_node()
+        datastore = node._lookup_jobstore('default')
+        with mock.patch.object(datastore, 'get_live_nodes', side_effect=Exception('Oops')), \
+                mock.patch('apscheduler.schedulers.base.BaseScheduler._process_jobs') as process:
+            self.assertEqual(node._process_jobs(), node.HEARTBEAT_SECONDS)
+            self.assertFalse(process.called)
+
+        with mock.patch('apscheduler.schedulers.base.BaseScheduler._process_jobs',
+                        return_value=None) as process:
+            node._process_jobs()
+            self.assertTrue(process.called)
+        self.assertEqual(datastore.job_filter, node.owns_job)
@@ -0,0 +1,112 @@
+"""Asyncio datastore for executions and audit logs.
+
+API handlers await its methods on the IOLoop instead of running blocking calls on the thread pool,
+so the number of concurrent requests isn't capped by TORNADO_MAX_WORKERS.
+
+It requires Python 3.6+, SQLAlchemy 1.4+ and an asyncio driver for the database: aiosqlite,
+asyncpg or aiomysql. Jobs are still stored with the blocking apscheduler jobstore.
+"""
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+# Asyncio driver for each database backend.
+ASYNC_DRIVERS = {
+    'sqlite': 'aiosqlite',
+    'postgresql': 'asyncpg',
+    'mysql': 'aiomysql'
+}
+
+
+class AsyncDatastore(object):
+
+    def __init__(self, datastore):
+        """
+        :param DatastoreBase datastore: blocking datastore of the same database. Its tables,
+            queries and ways to build results are reused.
+        :raises ValueError: if there's no asyncio driver for the database.
+        """
+        self.datastore = datastore
+        url = datastore.engine.url
+        backend = url.get_backend_name()
+        if backend not in ASYNC_DRIVERS:
+            raise ValueError('No asyncio driver for database: %s' % backend)
+        if backend == 'sqlite' and not url.database:
+            raise ValueError('An in-memory SQLite database can\'t be shared with asyncio')
+        url = url.set(drivername='%s+%s' % (backend, ASYNC_DRIVERS[backend]))
+        engine_kwargs = {}
+        if backend == 'sqlite':
+            # Each aiosqlite connection has its own thread, don't keep them around.
+            engine_kwargs['poolclass'] = NullPool
+        if 'sslmode' in url.query:
+            # asyncpg takes the libpq sslmode values as its ssl argument.
+            engine_kwargs['connect_args'] = {'ssl': url.query['sslmode']}
+            url = url.difference_update_query(['sslmode'])
+        self.engine = create_async_engine(url, **engine_kwargs)
+
+    async def dispose(self):
+        """Closes all connections."""
+        await self.engine.dispose()
+
+    async def _fetchall(self, selectable):
+        async with self.engine.connect() as connection:
+            result = await connection.execute(selectable)
+            return result.fetchall()
+
+    async def lookup_jobs(self, job_ids):
+        """Same as DatastoreBase.lookup_jobs()."""
+        jobs = {}
+        for selectable in self.datastore._get_lookup_jobs_queries(job_ids):
+            jobs.update(self.datastore._reconstitute_jobs(await self._fetchall(selectable)))
+        return jobs
+
+    async def get_execution(self, execution_id):
+        """Same as DatastoreBase.get_execution()."""
+        rows = await self._fetchall(self.datastore._get_execution_query(execution_id))
+        for row in rows:
+            execution = self.datastore._build_execution(row, await self.lookup_jobs([row.job_id]))
+            for result_row in await self._fetchall(
+                    self.datastore._get_stored_result_query(execution_id)):
+                execution['result'] = self.datastore._decompress_result(result_row.result)
+            return execution
+
+    async def _get_stored_result_sizes(self, execution_ids):
+        """Same as DatastoreBase._get_stored_result_sizes()."""
+        sizes = {}
+        for selectable in self.datastore._get_stored_result_sizes_queries(execution_ids):
+            sizes.update((row.eid, row.size) for row in await self._fetchall(selectable))
+        return sizes
+
+    async def get_executions(self, time_range_start, time_range_end, limit=None, cursor=None):
+        """Same as DatastoreBase.get_executions()."""
+        selectable = self.datastore._get_executions_query(time_range_start, time_range_end,
+                                                          limit, cursor)
+        rows, next_cursor = self.datastore._get_executions_page(
+            await self._fetchall(selectable), limit)
+
+        jobs = await self.lookup_jobs([row.job_id for row in rows])
+        result_sizes = await self._get_stored_result_sizes([row.eid for row in rows])
+
+        return {
+            'executions': [self.datastore._build_execution(row, jobs, result_sizes)
+                           for row in rows],
+            'next_cursor': next_cursor}
+
+    async def get_execution_stats(self, time_range_start, time_range_end, by_job=False):
+        """Same as DatastoreBase.get_execution_stats()."""
+        selectable = self.datastore._get_execution_stats_query(time_range_start, time_range_end,
+                                                               by_job)
+        return self.datastore._build_execution_stats(await self._fetchall(selectable), by_job)
+
+    async def add_audit_log(self, job_id, job_name, event, **kwargs):
+        """Same as DatastoreBase.add_audit_log()."""
+        async with self.engine.begin() as connection:
+            await connection.execute(
+                self.datastore._get_audit_log_insert(job_id, job_name, event, **kwargs))
+
+    async def get_audit_logs(self, time_range_start, time_range_end):
+        """Same as DatastoreBase.get_audit_logs()."""
+        selectable = self.datastore._get_audit_logs_query(time_range_start, time_range_end)
+        return {
+            'logs': [self.datastore._build_audit_log(row)
+                     for row in await self._fetchall(selectable)]}
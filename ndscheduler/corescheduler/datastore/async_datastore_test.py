@@ -0,0 +1,105 @@
+"""Unit tests for AsyncDatastore."""
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.corescheduler.datastore.testing import make_job
+
+AsyncDatastore = None
+if sys.version_info >= (3, 5):
+    # async_datastore is a SyntaxError on older versions of Python.
+    import asyncio
+    try:
+        import aiosqlite  # noqa: F401
+        from ndscheduler.corescheduler.datastore.async_datastore import AsyncDatastore
+    except ImportError:
+        pass
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'requires Python 3.5+')
+@unittest.skipIf(AsyncDatastore is None, 'aiosqlite is not installed')
+class AsyncDatastoreTest(unittest.TestCase):
+
+    def setUp(self):
+        # aiosqlite opens its own connections, so the database has to be a file.
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.scheduler = BlockingScheduler()
+        self.store = DatastoreSqlite({'file_path': os.path.join(tmp_dir, 'datastore.db')}, None)
+        self.store.start(self.scheduler, None)
+        self.addCleanup(self.store.engine.dispose)
+        self.async_store = AsyncDatastore(self.store)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def _add_job(self, job_id, name):
+        self.store.add_job(make_job(self.scheduler, job_id, name))
+
+    def test_in_memory_database(self):
+        with self.assertRaises(ValueError):
+            AsyncDatastore(DatastoreSqlite({}, None))
+
+    def test_get_execution(self):
+        self._add_job('job1', 'first job')
+        self.store.add_execution('eid1', 'job1', state=constants.EXECUTION_STATUS_SUCCEEDED)
+
+        execution = self._run(self.async_store.get_execution('eid1'))
+        self.assertEqual(execution, self.store.get_execution('eid1'))
+        self.assertEqual(execution['job']['name'], 'first job')
+        self.assertIsNone(self._run(self.async_store.get_execution('missing')))
+
+    def test_get_executions(self):
+        self._add_job('job1', 'first job')
+        now = datetime.datetime.utcnow()
+        for i in range(3):
+            self.store.add_execution('eid%d' % i, 'job1',
+                                     state=constants.EXECUTION_STATUS_SCHEDULED,
+                                     scheduled_time=now - datetime.timedelta(minutes=i))
+        start = (now - datetime.timedelta(minutes=10)).isoformat()
+        end = (now + datetime.timedelta(minutes=1)).isoformat()
+
+        page = self._run(self.async_store.get_executions(start, end, limit=2))
+        self.assertEqual(page, self.store.get_executions(start, end, limit=2))
+        self.assertEqual(len(page['executions']), 2)
+        page = self._run(self.async_store.get_executions(start, end, limit=2,
+                                                         cursor=page['next_cursor']))
+        self.assertEqual([execution['execution_id'] for execution in page['executions']],
+                         ['eid0'])
+        self.assertIsNone(page['next_cursor'])
+
+    def test_get_execution_stats(self):
+        now = datetime.datetime.utcnow()
+        self.store.add_execution('eid1', 'job1', state=constants.EXECUTION_STATUS_SUCCEEDED,
+                                 scheduled_time=now)
+        self.store.add_execution('eid2', 'job2', state=constants.EXECUTION_STATUS_FAILED,
+                                 scheduled_time=now)
+        start = (now - datetime.timedelta(minutes=10)).isoformat()
+        end = (now + datetime.timedelta(minutes=1)).isoformat()
+
+        for by_job in (False, True):
+            self.assertEqual(
+                self._run(self.async_store.get_execution_stats(start, end, by_job=by_job)),
+                self.store.get_execution_stats(start, end, by_job=by_job))
+
+    def test_add_audit_log_get_audit_logs(self):
+        now = datetime.datetime.utcnow()
+        self._run(self.async_store.add_audit_log('job1', 'first job',
+                                                 constants.AUDIT_LOG_ADDED, user='foo'))
+        start = (now - datetime.timedelta(minutes=1)).isoformat()
+        end = (now + datetime.timedelta(minutes=1)).isoformat()
+
+        logs = self._run(self.async_store.get_audit_logs(start, end))
+        self.assertEqual(logs, self.store.get_audit_logs(start, end))
+        self.assertEqual(len(logs['logs']), 1)
+        self.assertEqual(logs['logs'][0]['user'], 'foo')
@@ -1,23 +1,65 @@
 """Base class to represent datastore."""
 
+import base64
+import binascii
+import multiprocessing.util
+import os
+import pickle
+import time
+import zlib
+
 import dateutil.tz
 import dateutil.parser
+from apscheduler.job import Job
 from apscheduler.jobstores import sqlalchemy as sched_sqlalchemy
-from sqlalchemy import desc, select, MetaData
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from sqlalchemy import and_, bindparam, case, desc, exists, func, inspect, or_, select, MetaData
+from sqlalchemy.exc import IntegrityError
 
 from ndscheduler.corescheduler import constants
 from ndscheduler.corescheduler import utils
+from ndscheduler.corescheduler.datastore import job_index
+from ndscheduler.corescheduler.datastore import job_state
 from ndscheduler.corescheduler.datastore import tables
+from ndscheduler.corescheduler.datastore import write_behind
+
+
+class LeaseLostError(Exception):
+    """Raised when a write is fenced off, because the lease it's conditional on is lost."""
+
+    def __init__(self, name):
+        super(LeaseLostError, self).__init__('Lease %s is no longer held' % name)
 
 
 class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
 
     instance = None
+    forked_instance = None
+
+    # Max number of job ids in one "IN (...)" clause when loading jobs in batch.
+    # SQLite limits the number of host parameters in a single statement to 999.
+    JOB_LOOKUP_BATCH_SIZE = 500
+
+    # Max number of upcoming jobs get_next_run_time() looks at to find one that passes job_filter.
+    NEXT_RUN_TIME_SCAN_LIMIT = 1000
+
+    # If none of them pass job_filter, get_next_run_time() is checked again in no less than this
+    # many seconds.
+    NEXT_RUN_TIME_RESCAN_SECONDS = 1
 
     @classmethod
     def get_instance(cls, db_config=None, table_names=None):
+        if cls.instance and cls.instance.pid != os.getpid():
+            # Inherited through fork(), e.g., by a process pool worker. Its connections belong to
+            # the parent process. Keep it referenced, so that they never get closed (and the
+            # parent's sessions terminated) by garbage collection here, and start over.
+            cls.forked_instance = cls.instance
+            cls.instance = None
         if not cls.instance:
             cls.instance = cls(db_config, table_names)
+            if cls.forked_instance:
+                cls.instance._copy_runtime_settings(cls.forked_instance)
         return cls.instance
 
     @classmethod
@@ -28,20 +70,40 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
         """
         :param dict db_config: dictionary containing values for db connection
         :param dict table_names: dictionary containing the names for the jobs,
-        executions, or audit logs table, e.g. {
+        executions, audit logs, leases, or nodes table, e.g. {
             'executions_tablename': 'scheduler_executions',
             'jobs_tablename': 'scheduler_jobs',
-            'auditlogs_tablename': 'scheduler_auditlogs'
+            'auditlogs_tablename': 'scheduler_auditlogs',
+            'leases_tablename': 'scheduler_leases',
+            'nodes_tablename': 'scheduler_nodes',
+            'execution_results_tablename': 'scheduler_execution_result'
         }
         If any of these keys is not provided, the default table name is selected from constants.py
         """
         self.metadata = MetaData()
+        self.pid = os.getpid()
         self.table_names = table_names
         self.db_config = db_config
+        self.write_behind_queue = None
+        # If set, jobs are served from memory. See enable_job_index().
+        self.job_index = None
+        # If set, a (lease name, holder, fencing token) tuple. Updates and removals of jobs are
+        # only written while holder holds the lease with that token, see acquire_lease().
+        self.fence = None
+        # If set, get_due_jobs() and get_next_run_time() only consider job ids it returns True for
+        self.job_filter = None
+        # Results longer than this are stored out of line. None keeps all of them inline.
+        self.result_inline_max_bytes = constants.DEFAULT_EXECUTION_RESULT_INLINE_MAX_BYTES
+        # If False, job states are pickled, which versions of ndscheduler before the compact
+        # format can read. Both formats are always read.
+        self.compact_job_state = constants.DEFAULT_COMPACT_JOB_STATE
 
         executions_tablename = constants.DEFAULT_EXECUTIONS_TABLENAME
         jobs_tablename = constants.DEFAULT_JOBS_TABLENAME
         auditlogs_tablename = constants.DEFAULT_AUDIT_LOGS_TABLENAME
+        leases_tablename = constants.DEFAULT_LEASES_TABLENAME
+        nodes_tablename = constants.DEFAULT_NODES_TABLENAME
+        execution_results_tablename = constants.DEFAULT_EXECUTION_RESULTS_TABLENAME
         if table_names:
             if 'executions_tablename' in table_names:
                 executions_tablename = table_names['executions_tablename']
@@ -52,12 +114,105 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
             if 'auditlogs_tablename' in table_names:
                 auditlogs_tablename = table_names['auditlogs_tablename']
 
+            if 'leases_tablename' in table_names:
+                leases_tablename = table_names['leases_tablename']
+
+            if 'nodes_tablename' in table_names:
+                nodes_tablename = table_names['nodes_tablename']
+
+            if 'execution_results_tablename' in table_names:
+                execution_results_tablename = table_names['execution_results_tablename']
+
         self.executions_table = tables.get_execution_table(self.metadata, executions_tablename)
         self.auditlogs_table = tables.get_auditlogs_table(self.metadata, auditlogs_tablename)
+        self.leases_table = tables.get_leases_table(self.metadata, leases_tablename)
+        self.nodes_table = tables.get_nodes_table(self.metadata, nodes_tablename)
+        self.execution_results_table = tables.get_execution_results_table(
+            self.metadata, execution_results_tablename)
 
         super(DatastoreBase, self).__init__(url=self.get_db_url(), tablename=jobs_tablename)
 
         self.metadata.create_all(self.engine)
+        self._create_missing_indexes()
+
+    def _copy_runtime_settings(self, other):
+        """Applies the settings changed on another instance since it was created, e.g., the one
+        inherited through fork(). Every setting that isn't passed to __init__() belongs here.
+        The job index isn't copied: it's only loaded by start(), which workers don't call.
+        :param DatastoreBase other: instance to copy the settings of.
+        """
+        self.result_inline_max_bytes = other.result_inline_max_bytes
+        self.compact_job_state = other.compact_job_state
+        self.job_filter = other.job_filter
+        self.fence = other.fence
+        if other.write_behind_queue and not self.write_behind_queue:
+            self.enable_write_behind(other.write_behind_queue.batch_size,
+                                     other.write_behind_queue.flush_interval_sec)
+            if other.pid != self.pid:
+                # A process pool worker exits without running atexit hooks, only the finalizers
+                # of multiprocessing, so queued writes are flushed by one of those.
+                multiprocessing.util.Finalize(self, self.disable_write_behind, exitpriority=10)
+
+    def _create_missing_indexes(self):
+        """Creates indexes that are missing from existing executions and audit logs tables.
+        metadata.create_all() only creates indexes along with new tables. Deployments whose
+        tables were created by an older version of ndscheduler get the indexes here on start.
+        """
+        inspector = inspect(self.engine)
+        for table in (self.executions_table, self.auditlogs_table):
+            existing_indexes = set(index['name'] for index in inspector.get_indexes(table.name))
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    self._logger.info('Creating index %s on table %s' % (index.name, table.name))
+                    index.create(self.engine)
+
+    def enable_write_behind(self, batch_size, flush_interval_sec):
+        """Queues execution inserts and updates in memory and writes them in batches.
+        Until a queued write is flushed, it isn't visible to get_execution() / get_executions().
+        Writes happen on a background thread, so this doesn't work with an in-memory SQLite db.
+        :param int batch_size: Number of queued writes that triggers a flush right away.
+        :param float flush_interval_sec: Max number of seconds a write stays in the queue.
+        """
+        if self.write_behind_queue:
+            return
+        self.write_behind_queue = write_behind.ExecutionWriteBehindQueue(
+            self, batch_size, flush_interval_sec)
+        self.write_behind_queue.start()
+
+    def disable_write_behind(self):
+        """Flushes queued execution writes, then goes back to writing synchronously.
+        This is a BLOCKING operation.
+        """
+        if not self.write_behind_queue:
+            return
+        self.write_behind_queue.stop()
+        self.write_behind_queue = None
+
+    def flush_execution_writes(self):
+        """Writes the execution changes queued by write-behind right away, if it's enabled.
+        Only this instance's queue is flushed, not the ones of other processes, e.g., of process
+        pool workers.
+        This is a BLOCKING operation.
+        """
+        if self.write_behind_queue:
+            self.write_behind_queue.flush()
+
+    def enable_job_index(self):
+        """Keeps all jobs in memory, and serves due jobs, next run times and job lookups from
+        there. Changes are still written to the database, before they're applied in memory, but
+        jobs are only read from it on start. Changes made by other processes sharing the database
+        aren't seen, so it only works with a single scheduler process.
+        It has to be called before the scheduler starts.
+        """
+        if not self.job_index:
+            self.job_index = job_index.JobIndex()
+
+    def start(self, scheduler, alias):
+        super(DatastoreBase, self).start(scheduler, alias)
+        if self.job_index:
+            jobs = super(DatastoreBase, self).get_all_jobs()
+            self.job_index.load(jobs)
+            self._logger.info('Loaded %d jobs into the job index' % len(jobs))
 
     def get_db_url(self):
         """We can use the dict passed from db_config_dict to construct a db url.
@@ -72,12 +227,20 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
         :param str job_id: Job id.
         :param int state: Execution state. See ndscheduler.constants.EXECUTION_*
         """
+        self._store_result(execution_id, kwargs)
         execution = {
             'eid': execution_id,
             'job_id': job_id,
             'state': state
         }
         execution.update(kwargs)
+        if self.write_behind_queue:
+            # Take the timestamps now rather than when the queue is flushed.
+            now = utils.get_current_datetime()
+            execution.setdefault('scheduled_time', now)
+            execution.setdefault('updated_time', now)
+            self.write_behind_queue.put(write_behind.INSERT, execution_id, execution)
+            return
         execution_insert = self.executions_table.insert().values(**execution)
         self.engine.execute(execution_insert)
 
@@ -87,27 +250,467 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
         :return: Diction for execution info.
         :rtype: dict
         """
-        selectable = select('*').where(self.executions_table.c.eid == execution_id)
-        rows = self.engine.execute(selectable)
+        rows = self.engine.execute(self._get_execution_query(execution_id))
 
         for row in rows:
-            return self._build_execution(row)
+            execution = self._build_execution(row, self.lookup_jobs([row.job_id]))
+            for result_row in self.engine.execute(self._get_stored_result_query(execution_id)):
+                execution['result'] = self._decompress_result(result_row.result)
+            return execution
+
+    def _get_execution_query(self, execution_id):
+        """Returns the query of get_execution().
+        :return: A SQLAlchemy selectable.
+        """
+        return select('*').where(self.executions_table.c.eid == execution_id)
+
+    def _store_result(self, execution_id, execution):
+        """Moves a result longer than result_inline_max_bytes to the execution results table,
+        compressed, and leaves a preview of it in its place.
+        :param str execution_id: Execution id.
+        :param dict execution: Columns of the execution to write. Modified in place.
+        """
+        result = execution.get('result')
+        if result is None or self.result_inline_max_bytes is None:
+            return
+        data = result.encode('utf-8')
+        if len(data) <= self.result_inline_max_bytes:
+            return
+        table = self.execution_results_table
+        with self.engine.begin() as connection:
+            connection.execute(table.delete().where(table.c.eid == execution_id))
+            connection.execute(table.insert().values(eid=execution_id, result=zlib.compress(data),
+                                                     size=len(data)))
+        execution['result'] = result[:constants.RESULT_PREVIEW_LENGTH]
+
+    def _get_stored_result_query(self, execution_id):
+        """Returns the query of the result of an execution in the execution results table.
+        :return: A SQLAlchemy selectable.
+        """
+        table = self.execution_results_table
+        return select([table.c.result]).where(table.c.eid == execution_id)
+
+    def _get_stored_result_sizes_queries(self, execution_ids):
+        """Returns the queries of the sizes of results in the execution results table, in batches
+        of JOB_LOOKUP_BATCH_SIZE.
+        :param list execution_ids: Execution ids.
+        :return: A list of SQLAlchemy selectables.
+        :rtype: list
+        """
+        table = self.execution_results_table
+        return [select([table.c.eid, table.c.size]).where(
+                    table.c.eid.in_(execution_ids[i:i + self.JOB_LOOKUP_BATCH_SIZE]))
+                for i in range(0, len(execution_ids), self.JOB_LOOKUP_BATCH_SIZE)]
+
+    def _get_stored_result_sizes(self, execution_ids):
+        """Returns the sizes of the results of executions that are stored out of line.
+        :param list execution_ids: Execution ids.
+        :return: A dictionary mapping execution id to result size in bytes.
+        :rtype: dict
+        """
+        sizes = {}
+        for selectable in self._get_stored_result_sizes_queries(execution_ids):
+            sizes.update((row.eid, row.size) for row in self.engine.execute(selectable))
+        return sizes
+
+    def _decompress_result(self, data):
+        """Returns a result stored in the execution results table.
+        :param bytes data: compressed result.
+        :rtype: str
+        """
+        return zlib.decompress(data).decode('utf-8')
 
     def update_execution(self, execution_id, **kwargs):
         """Update execution in database.
         :param str execution_id: Execution id.
         :param kwargs: Keyword arguments.
         """
+        self._store_result(execution_id, kwargs)
+        if self.write_behind_queue:
+            kwargs.setdefault('updated_time', utils.get_current_datetime())
+            self.write_behind_queue.put(write_behind.UPDATE, execution_id, kwargs)
+            return
         execution_update = self.executions_table.update().where(
             self.executions_table.c.eid == execution_id).values(**kwargs)
         self.engine.execute(execution_update)
 
-    def _build_execution(self, row):
+    def get_execution_state(self, execution_id):
+        """Returns the state of an execution.
+        :param str execution_id: Execution id.
+        :return: One of constants.EXECUTION_STATUS_*, or None if the execution doesn't exist.
+        :rtype: int
+        """
+        table = self.executions_table
+        return self.engine.execute(
+            select([table.c.state]).where(table.c.eid == execution_id)).scalar()
+
+    def stop_execution(self, execution_id):
+        """Asks a running execution to stop, by moving it to the stopping state. The worker
+        running it kills it and moves it to the stopped state.
+        :param str execution_id: Execution id.
+        :return: False if the execution isn't running.
+        :rtype: bool
+        """
+        table = self.executions_table
+        execution_update = table.update().where(
+            (table.c.eid == execution_id) &
+            (table.c.state == constants.EXECUTION_STATUS_RUNNING)).values(
+                state=constants.EXECUTION_STATUS_STOPPING)
+        return self.engine.execute(execution_update).rowcount > 0
+
+    def lookup_jobs(self, job_ids):
+        """Loads multiple jobs with as few queries as possible.
+        Each job state is fetched and deserialized only once, no matter how many times its id
+        appears in job_ids.
+        :param list job_ids: Job ids. Duplicates are allowed.
+        :return: A dictionary mapping job id to apscheduler.job.Job instance. Job ids that
+            don't exist (e.g., the job was deleted) are not in the dictionary.
+        :rtype: dict
+        """
+        if self.job_index:
+            return self.job_index.get_many(job_ids)
+        return self._load_jobs(job_ids)
+
+    def _load_jobs(self, job_ids):
+        """Loads multiple jobs from the database. See lookup_jobs()."""
+        jobs = {}
+        for selectable in self._get_lookup_jobs_queries(job_ids):
+            jobs.update(self._reconstitute_jobs(self.engine.execute(selectable)))
+        return jobs
+
+    def _get_lookup_jobs_queries(self, job_ids):
+        """Returns the queries fetching the states of jobs, in batches of JOB_LOOKUP_BATCH_SIZE.
+        :param list job_ids: Job ids. Duplicates are allowed.
+        :return: A list of SQLAlchemy selectables.
+        :rtype: list
+        """
+        job_ids = list(set(job_ids))
+        return [select([self.jobs_t.c.id, self.jobs_t.c.job_state]).where(
+                    self.jobs_t.c.id.in_(job_ids[i:i + self.JOB_LOOKUP_BATCH_SIZE]))
+                for i in range(0, len(job_ids), self.JOB_LOOKUP_BATCH_SIZE)]
+
+    def get_class_path(self):
+        """Returns the path run_job() imports the datastore class from.
+        :rtype: str
+        """
+        return '%s.%s' % (self.__class__.__module__, self.__class__.__name__)
+
+    def _serialize_job(self, job):
+        """Serializes a job for the job_state column, in the compact format if possible.
+        :param Job job: apscheduler.job.Job instance.
+        :rtype: bytes
+        """
+        if self.compact_job_state:
+            data = job_state.dumps(job)
+            if data:
+                return data
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, data):
+        """Overrides SQLAlchemyJobStore._reconstitute_job() to read compact job states too."""
+        if not job_state.is_compact(data):
+            return super(DatastoreBase, self)._reconstitute_job(data)
+        state = job_state.loads(data, (self.get_class_path(), self.db_config, self.table_names))
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def migrate_job_states(self, batch_size, dry_run=False):
+        """Rewrites pickled job states in the compact format.
+        This is a BLOCKING operation. The scheduler may keep running, since each batch is
+        rewritten in a transaction that checks the job states didn't change meanwhile.
+        :param int batch_size: Max number of jobs rewritten in one transaction.
+        :param bool dry_run: If True, only counts the jobs that would be rewritten.
+        :return: A dictionary with the number of jobs 'migrated', already 'compact', and
+            'skipped', as they can't be represented in the compact format or failed to load.
+        :rtype: dict
+        """
+        counts = {'migrated': 0, 'compact': 0, 'skipped': 0}
+        # apscheduler only creates the jobs table when the scheduler starts.
+        self.jobs_t.create(self.engine, checkfirst=True)
+        update = self.jobs_t.update().where(and_(
+            self.jobs_t.c.id == bindparam('job_id'),
+            self.jobs_t.c.job_state == bindparam('old_job_state'))).values(
+                job_state=bindparam('new_job_state'))
+        last_id = None
+        while True:
+            selectable = select([self.jobs_t.c.id, self.jobs_t.c.job_state]).order_by(
+                self.jobs_t.c.id).limit(batch_size)
+            if last_id is not None:
+                selectable = selectable.where(self.jobs_t.c.id > last_id)
+            rows = self.engine.execute(selectable).fetchall()
+            if not rows:
+                return counts
+            last_id = rows[-1].id
+
+            updates = []
+            for row in rows:
+                if job_state.is_compact(row.job_state):
+                    counts['compact'] += 1
+                    continue
+                try:
+                    data = job_state.dumps(self._reconstitute_job(row.job_state))
+                except Exception:
+                    self._logger.exception('Unable to restore job "%s"' % row.id)
+                    data = None
+                if data:
+                    updates.append({'job_id': row.id, 'old_job_state': row.job_state,
+                                    'new_job_state': data})
+                else:
+                    counts['skipped'] += 1
+            counts['migrated'] += len(updates)
+            if updates and not dry_run:
+                with self.engine.begin() as connection:
+                    connection.execute(update, updates)
+
+    def _reconstitute_jobs(self, rows):
+        """Deserializes jobs fetched by a query from _get_lookup_jobs_queries().
+        :param rows: Rows with id and job_state columns.
+        :return: A dictionary mapping job id to apscheduler.job.Job instance. Jobs that can't be
+            deserialized are logged and left out.
+        :rtype: dict
+        """
+        jobs = {}
+        for row in rows:
+            try:
+                jobs[row.id] = self._reconstitute_job(row.job_state)
+            except Exception:
+                self._logger.exception('Unable to restore job "%s"' % row.id)
+        return jobs
+
+    def add_jobs(self, jobs):
+        """Adds multiple jobs in one transaction.
+        :param list jobs: apscheduler.job.Job instances.
+        :raises ConflictingIdError: if a job id already exists, in which case no job is added.
+        """
+        if not jobs:
+            return
+        with self.engine.begin() as connection:
+            try:
+                connection.execute(self.jobs_t.insert(), [
+                    {'id': job.id,
+                     'next_run_time': datetime_to_utc_timestamp(job.next_run_time),
+                     'job_state': self._serialize_job(job)}
+                    for job in jobs])
+            except IntegrityError:
+                raise ConflictingIdError(', '.join(job.id for job in jobs))
+        if self.job_index:
+            for job in jobs:
+                self.job_index.put(job)
+
+    def update_jobs(self, jobs):
+        """Updates multiple jobs in one transaction.
+        :param list jobs: apscheduler.job.Job instances.
+        :raises JobLookupError: if a job doesn't exist, in which case no job is updated.
+        :raises LeaseLostError: if the fence's lease is lost, in which case no job is updated.
+        """
+        if not jobs:
+            return
+        update = self.jobs_t.update().where(
+            self._get_fenced_clause(self.jobs_t.c.id == bindparam('job_id')))
+        try:
+            with self.engine.begin() as connection:
+                self._check_jobs_exist(connection, [job.id for job in jobs])
+                result = connection.execute(update, [
+                    {'job_id': job.id,
+                     'next_run_time': datetime_to_utc_timestamp(job.next_run_time),
+                     'job_state': self._serialize_job(job)}
+                    for job in jobs])
+                rowcount = -1
+                if connection.dialect.supports_sane_multi_rowcount:
+                    rowcount = result.rowcount
+                self._check_bulk_write(connection, rowcount, len(jobs))
+        except Exception:
+            self.reload_indexed_jobs([job.id for job in jobs])
+            raise
+        if self.job_index:
+            for job in jobs:
+                self.job_index.put(job)
+
+    def remove_jobs(self, job_ids):
+        """Removes multiple jobs in one transaction.
+        :param list job_ids: Job ids.
+        :raises JobLookupError: if a job doesn't exist, in which case no job is removed.
+        :raises LeaseLostError: if the fence's lease is lost, in which case no job is removed.
+        """
+        job_ids = list(set(job_ids))
+        with self.engine.begin() as connection:
+            self._check_jobs_exist(connection, job_ids)
+            rowcount = 0
+            for i in range(0, len(job_ids), self.JOB_LOOKUP_BATCH_SIZE):
+                rowcount += connection.execute(self.jobs_t.delete().where(self._get_fenced_clause(
+                    self.jobs_t.c.id.in_(job_ids[i:i + self.JOB_LOOKUP_BATCH_SIZE])))).rowcount
+            self._check_bulk_write(connection, rowcount, len(job_ids))
+        if self.job_index:
+            for job_id in job_ids:
+                self.job_index.remove(job_id)
+
+    def _check_jobs_exist(self, connection, job_ids):
+        """Raises JobLookupError if any of job_ids isn't in the jobs table.
+        :param Connection connection: connection of the current transaction.
+        :param list job_ids: Job ids.
+        """
+        job_ids = list(set(job_ids))
+        existing_job_ids = set()
+        for i in range(0, len(job_ids), self.JOB_LOOKUP_BATCH_SIZE):
+            selectable = select([self.jobs_t.c.id]).where(
+                self.jobs_t.c.id.in_(job_ids[i:i + self.JOB_LOOKUP_BATCH_SIZE]))
+            existing_job_ids.update(row.id for row in connection.execute(selectable))
+        missing_job_ids = sorted(set(job_ids) - existing_job_ids)
+        if missing_job_ids:
+            raise JobLookupError(', '.join(missing_job_ids))
+
+    def reload_indexed_jobs(self, job_ids):
+        """Reloads jobs into the job index from the database, after changing them failed.
+        Callers change the jobs they got from the index before writing them, so the index may
+        hold changes that never made it to the database.
+        :param list job_ids: Job ids.
+        """
+        if not self.job_index:
+            return
+        jobs = self._load_jobs(job_ids)
+        for job_id in job_ids:
+            if job_id in jobs:
+                self.job_index.put(jobs[job_id])
+            else:
+                self.job_index.remove(job_id)
+
+    def lookup_job(self, job_id):
+        if self.job_index:
+            return self.job_index.get(job_id)
+        return super(DatastoreBase, self).lookup_job(job_id)
+
+    def get_all_jobs(self):
+        if self.job_index:
+            return self.job_index.get_all()
+        return super(DatastoreBase, self).get_all_jobs()
+
+    def add_job(self, job):
+        self.add_jobs([job])
+
+    def _get_fenced_clause(self, clause):
+        """Returns the where clause of a write to jobs, conditional on the fence if it's set.
+        :param clause: Where clause selecting the jobs, e.g., on their ids.
+        """
+        if not self.fence:
+            return clause
+        name, holder, token = self.fence
+        table = self.leases_table
+        return and_(clause, exists().where(and_(
+            table.c.name == name, table.c.holder == holder, table.c.token == token,
+            table.c.expires_at > time.time())))
+
+    def _check_write(self, connection, rowcount, job_id):
+        """Raises if a write from _get_fenced_clause() changed no row.
+        :param Connection connection: connection of the current transaction.
+        :param int rowcount: number of rows the write changed.
+        :param str job_id: Job id.
+        :raises LeaseLostError: if the fence's lease is lost.
+        :raises JobLookupError: if the job doesn't exist.
+        """
+        if rowcount:
+            return
+        if self.fence and not self.holds_lease(*self.fence, connection=connection):
+            raise LeaseLostError(self.fence[0])
+        raise JobLookupError(job_id)
+
+    def _check_bulk_write(self, connection, rowcount, expected_rowcount):
+        """Raises if a write from _get_fenced_clause() to jobs known to exist missed some of them.
+        :param Connection connection: connection of the current transaction.
+        :param int rowcount: number of rows the write changed, or -1 if the driver can't tell.
+        :param int expected_rowcount: number of jobs written to.
+        :raises LeaseLostError: if the fence's lease is lost.
+        """
+        if rowcount == expected_rowcount or not self.fence:
+            return
+        if rowcount >= 0 or not self.holds_lease(*self.fence, connection=connection):
+            raise LeaseLostError(self.fence[0])
+
+    def update_job(self, job):
+        update = self.jobs_t.update().values(
+            next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+            job_state=self._serialize_job(job)).where(
+                self._get_fenced_clause(self.jobs_t.c.id == job.id))
+        try:
+            with self.engine.begin() as connection:
+                self._check_write(connection, connection.execute(update).rowcount, job.id)
+        except Exception:
+            self.reload_indexed_jobs([job.id])
+            raise
+        if self.job_index:
+            self.job_index.put(job)
+
+    def remove_job(self, job_id):
+        delete = self.jobs_t.delete().where(self._get_fenced_clause(self.jobs_t.c.id == job_id))
+        with self.engine.begin() as connection:
+            self._check_write(connection, connection.execute(delete).rowcount, job_id)
+        if self.job_index:
+            self.job_index.remove(job_id)
+
+    def remove_all_jobs(self):
+        super(DatastoreBase, self).remove_all_jobs()
+        if self.job_index:
+            self.job_index.clear()
+
+    def get_due_jobs(self, now):
+        """Returns the jobs due at now that pass job_filter, sorted by next run time.
+        Overrides SQLAlchemyJobStore.get_due_jobs() to only deserialize jobs that pass job_filter.
+        :param datetime now: the current (timezone aware) datetime.
+        :return: A list of apscheduler.job.Job instances.
+        :rtype: list
+        """
+        if self.job_index:
+            return self.job_index.get_due_jobs(datetime_to_utc_timestamp(now), self.job_filter)
+        if not self.job_filter:
+            return super(DatastoreBase, self).get_due_jobs(now)
+
+        timestamp = datetime_to_utc_timestamp(now)
+        selectable = select([self.jobs_t.c.id]).where(self.jobs_t.c.next_run_time <= timestamp)
+        job_ids = [row.id for row in self.engine.execute(selectable) if self.job_filter(row.id)]
+        jobs = list(self.lookup_jobs(job_ids).values())
+        jobs.sort(key=lambda job: job.next_run_time)
+        return jobs
+
+    def get_next_run_time(self):
+        """Returns the earliest next run time of jobs that pass job_filter.
+        If none of the next NEXT_RUN_TIME_SCAN_LIMIT jobs to run pass it, returns the run time of
+        the last of them, which is early but safe, or NEXT_RUN_TIME_RESCAN_SECONDS from now if
+        that's later.
+        :return: the earliest run time, or None if there's no job to run.
+        :rtype: datetime
+        """
+        if self.job_index:
+            return utc_timestamp_to_datetime(self.job_index.get_next_run_time(self.job_filter))
+        if not self.job_filter:
+            return super(DatastoreBase, self).get_next_run_time()
+
+        selectable = select([self.jobs_t.c.id, self.jobs_t.c.next_run_time]).where(
+            self.jobs_t.c.next_run_time.isnot(None)).order_by(
+                self.jobs_t.c.next_run_time).limit(self.NEXT_RUN_TIME_SCAN_LIMIT)
+        rows = self.engine.execute(selectable).fetchall()
+        for row in rows:
+            if self.job_filter(row.id):
+                return utc_timestamp_to_datetime(row.next_run_time)
+        if len(rows) == self.NEXT_RUN_TIME_SCAN_LIMIT:
+            # The jobs of other nodes may all be overdue, e.g., those of a dead node until they
+            # move. Waking up right away for them would keep running this query in a loop.
+            return utc_timestamp_to_datetime(max(
+                rows[-1].next_run_time, time.time() + self.NEXT_RUN_TIME_RESCAN_SECONDS))
+        return None
+
+    def _build_execution(self, row, jobs, result_sizes=None):
         """Return job execution info from a row of scheduler_execution table.
         :param obj row: A row instance of scheduler_execution table.
+        :param dict jobs: A dictionary mapping job id to apscheduler.job.Job instance, as returned
+            by lookup_jobs().
+        :param dict result_sizes: A dictionary mapping execution id to result size, as returned
+            by _get_stored_result_sizes(). If the execution is in it, its result is a preview.
         :return: A dictionary of job execution info.
         :rtype: dict
         """
+        result_sizes = result_sizes or {}
         return_json = {
             'execution_id': row.eid,
             'state': constants.EXECUTION_STATUS_DICT[row.state],
@@ -116,9 +719,12 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
             'task_id': row.task_id,
             'description': row.description,
             'result': row.result,
+            'result_truncated': row.eid in result_sizes,
             'scheduled_time': self.get_time_isoformat_from_db(row.scheduled_time),
             'updated_time': self.get_time_isoformat_from_db(row.updated_time)}
-        job = self.lookup_job(row.job_id)
+        if row.eid in result_sizes:
+            return_json['result_size'] = result_sizes[row.eid]
+        job = jobs.get(row.job_id)
         if job:
             return_json['job'] = {
                 'job_id': job.id,
@@ -135,47 +741,280 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
         :return: iso8601 format string
         :rtype: str
         """
+        if time_object.tzinfo is None:
+            # Times are stored in UTC, but some databases (e.g., MySQL) don't keep the timezone.
+            time_object = time_object.replace(tzinfo=dateutil.tz.tzutc())
         return time_object.isoformat()
 
-    def get_executions(self, time_range_start, time_range_end):
+    def get_executions(self, time_range_start, time_range_end, limit=None, cursor=None):
         """Returns info for multiple job executions.
+        Executions are paginated with a keyset on (updated_time, eid): pass the 'next_cursor' of
+        a page as cursor to fetch the following page.
         :param str time_range_start: ISO format for time range starting point.
         :param str time_range_end: ISO for time range ending point.
+        :param int limit: Max number of executions to return. None means no limit.
+        :param str cursor: Opaque cursor returned as 'next_cursor' by a previous call.
         :return: A dictionary of multiple execution info, e.g.,
             {
-                'executions': [...]
+                'executions': [...],
+                'next_cursor': 'MjAxNS0xMi0yMVQxODoyMDowNS42MDQ3MzIrMDA6MDB8YWJj'
             }
-            Sorted by updated_time.
+            Sorted by updated_time, then execution id, in descending order. next_cursor is None
+            if there are no more executions.
         :rtype: dict
+        :raises ValueError: if cursor is malformed.
+        """
+        selectable = self._get_executions_query(time_range_start, time_range_end, limit, cursor)
+        rows, next_cursor = self._get_executions_page(
+            self.engine.execute(selectable).fetchall(), limit)
+
+        jobs = self.lookup_jobs([row.job_id for row in rows])
+        result_sizes = self._get_stored_result_sizes([row.eid for row in rows])
+
+        return_json = {
+            'executions': [self._build_execution(row, jobs, result_sizes) for row in rows],
+            'next_cursor': next_cursor}
+
+        return return_json
+
+    def iter_executions(self, time_range_start, time_range_end,
+                        chunk_size=constants.DEFAULT_EXPORT_CHUNK_SIZE):
+        """Yields the executions in a time range, chunk by chunk.
+        Rows are read with a server-side cursor where the database supports it, so that memory
+        use doesn't grow with the number of executions.
+        :param str time_range_start: ISO format for time range starting point.
+        :param str time_range_end: ISO for time range ending point.
+        :param int chunk_size: Max number of executions in a chunk.
+        :return: A generator of lists of execution info, in the order of get_executions().
+        :rtype: generator
+        """
+        selectable = self._get_executions_query(time_range_start, time_range_end, None, None)
+        for rows in self._iter_chunks(selectable, chunk_size):
+            jobs = self.lookup_jobs(set(row.job_id for row in rows))
+            result_sizes = self._get_stored_result_sizes([row.eid for row in rows])
+            yield [self._build_execution(row, jobs, result_sizes) for row in rows]
+
+    def _iter_chunks(self, selectable, chunk_size):
+        """Runs a query, and yields its rows in lists of at most chunk_size rows."""
+        connection = self.engine.connect()
+        try:
+            result = connection.execution_options(stream_results=True).execute(selectable)
+            while True:
+                rows = result.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            connection.close()
+
+    def _get_executions_query(self, time_range_start, time_range_end, limit, cursor):
+        """Returns the query of get_executions().
+        :return: A SQLAlchemy selectable.
+        :raises ValueError: if cursor is malformed.
         """
         utc = dateutil.tz.gettz('UTC')
         start_time = dateutil.parser.parse(time_range_start).replace(tzinfo=utc)
         end_time = dateutil.parser.parse(time_range_end).replace(tzinfo=utc)
+        table = self.executions_table
         selectable = select('*').where(
-            self.executions_table.c.scheduled_time.between(
-                start_time, end_time)).order_by(desc(self.executions_table.c.updated_time))
+            table.c.scheduled_time.between(start_time, end_time)).order_by(
+                desc(table.c.updated_time), desc(table.c.eid))
 
-        rows = self.engine.execute(selectable)
+        if cursor:
+            updated_time, eid = self._decode_executions_cursor(cursor)
+            selectable = selectable.where(or_(
+                table.c.updated_time < updated_time,
+                and_(table.c.updated_time == updated_time, table.c.eid < eid)))
 
-        return_json = {
-            'executions': [self._build_execution(row) for row in rows]}
+        if limit is not None:
+            # Fetch one more row to know whether there is a next page.
+            selectable = selectable.limit(limit + 1)
+        return selectable
 
+    def _get_executions_page(self, rows, limit):
+        """Cuts the rows fetched by the query of _get_executions_query() to a page.
+        :param list rows: Rows of scheduler_execution table.
+        :param int limit: Max number of executions to return. None means no limit.
+        :return: A tuple of (rows of the page, next_cursor).
+        :rtype: tuple
+        """
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_executions_cursor(rows[-1])
+        return rows, next_cursor
+
+    def get_execution_stats(self, time_range_start, time_range_end, by_job=False):
+        """Returns the number of executions in each state.
+        Counts are computed by the database in one GROUP BY query, without fetching executions.
+        :param str time_range_start: ISO format for time range starting point.
+        :param str time_range_end: ISO for time range ending point.
+        :param bool by_job: If True, also returns the counts of each job.
+        :return: A dictionary of counts, e.g.,
+            {
+                'total': 12,
+                'states': {'scheduled': 0, 'running': 2, ..., 'succeeded': 9},
+                'jobs': {
+                    '6bca19736d374ef2b3df23eb278b512e': {
+                        'total': 3,
+                        'states': {'scheduled': 0, 'running': 1, ..., 'succeeded': 2}
+                    },
+                    ...
+                }
+            }
+            'jobs' is only returned if by_job is True, and only has jobs with executions.
+        :rtype: dict
+        """
+        selectable = self._get_execution_stats_query(time_range_start, time_range_end, by_job)
+        return self._build_execution_stats(self.engine.execute(selectable), by_job)
+
+    def _get_execution_stats_query(self, time_range_start, time_range_end, by_job):
+        """Returns the query of get_execution_stats().
+        :return: A SQLAlchemy selectable.
+        """
+        utc = dateutil.tz.gettz('UTC')
+        start_time = dateutil.parser.parse(time_range_start).replace(tzinfo=utc)
+        end_time = dateutil.parser.parse(time_range_end).replace(tzinfo=utc)
+        table = self.executions_table
+        columns = [table.c.state]
+        if by_job:
+            columns.append(table.c.job_id)
+        return select(columns + [func.count().label('num_executions')]).where(
+            table.c.scheduled_time.between(start_time, end_time)).group_by(*columns)
+
+    def _build_execution_stats(self, rows, by_job):
+        """Returns the counts of get_execution_stats() from the rows of its query.
+        :param rows: Rows fetched by the query of _get_execution_stats_query().
+        :param bool by_job: If True, also returns the counts of each job.
+        :rtype: dict
+        """
+        def empty_stats():
+            return {
+                'total': 0,
+                'states': dict((name, 0) for name in constants.EXECUTION_STATUS_DICT.values())}
+
+        return_json = empty_stats()
+        if by_job:
+            return_json['jobs'] = {}
+        for row in rows:
+            state = constants.EXECUTION_STATUS_DICT[row.state]
+            stats_list = [return_json]
+            if by_job:
+                stats_list.append(return_json['jobs'].setdefault(row.job_id, empty_stats()))
+            for stats in stats_list:
+                stats['total'] += row.num_executions
+                stats['states'][state] += row.num_executions
         return return_json
 
+    def _encode_executions_cursor(self, row):
+        """Returns an opaque pagination cursor pointing at a row of scheduler_execution table.
+        :param obj row: A row instance of scheduler_execution table.
+        :return: url-safe cursor string
+        :rtype: str
+        """
+        key = '%s|%s' % (self.get_time_isoformat_from_db(row.updated_time), row.eid)
+        return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+    def _decode_executions_cursor(self, cursor):
+        """Parses a cursor generated by _encode_executions_cursor().
+        :param str cursor: cursor string
+        :return: a tuple of (updated_time, execution id)
+        :rtype: tuple
+        :raises ValueError: if cursor is malformed.
+        """
+        try:
+            key = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            updated_time, eid = key.split('|', 1)
+            return dateutil.parser.parse(updated_time), eid
+        except (binascii.Error, UnicodeError, ValueError, OverflowError):
+            raise ValueError('Invalid cursor: %s' % cursor)
+
+    def purge_executions(self, clause, batch_size, archive=None):
+        """Deletes the oldest executions matching a condition, at most batch_size of them.
+        Call it repeatedly until it returns 0 to delete all of them in bounded transactions.
+        :param clause: SQLAlchemy condition on executions_table, e.g.,
+            executions_table.c.scheduled_time < a_datetime.
+        :param int batch_size: Max number of executions to delete. On SQLite, it has to stay
+            below the host parameter limit of 999.
+        :param callable archive: If set, called with the list of rows to delete, as dictionaries,
+            before deleting them. If it raises, nothing is deleted. Results stored out of line
+            are only archived as their preview.
+        :return: Number of deleted executions.
+        :rtype: int
+        """
+        table = self.executions_table
+        columns = [table] if archive else [table.c.eid]
+        selectable = select(columns).where(clause).order_by(
+            table.c.scheduled_time).limit(batch_size)
+        rows = self.engine.execute(selectable).fetchall()
+        if not rows:
+            return 0
+
+        if archive:
+            archive([dict(row) for row in rows])
+        execution_ids = [row.eid for row in rows]
+        results_table = self.execution_results_table
+        with self.engine.begin() as connection:
+            connection.execute(table.delete().where(table.c.eid.in_(execution_ids)))
+            connection.execute(
+                results_table.delete().where(results_table.c.eid.in_(execution_ids)))
+        return len(rows)
+
+    def purge_audit_logs(self, before, batch_size, archive=None):
+        """Deletes the oldest audit logs created before a time, about batch_size of them.
+        Audit logs have no primary key, so a batch ends at a created_time, and logs created at
+        the same time as the last one of the batch are deleted along with it.
+        :param datetime before: Audit logs created before this (timezone aware) time are deleted.
+        :param int batch_size: Number of audit logs to delete.
+        :param callable archive: If set, called with the list of rows to delete, as dictionaries,
+            before deleting them. If it raises, nothing is deleted.
+        :return: Number of deleted audit logs.
+        :rtype: int
+        """
+        table = self.auditlogs_table
+        selectable = select([table.c.created_time]).where(
+            table.c.created_time < before).order_by(table.c.created_time).limit(batch_size)
+        rows = self.engine.execute(selectable).fetchall()
+        if not rows:
+            return 0
+
+        clause = and_(table.c.created_time < before, table.c.created_time <= rows[-1][0])
+        if archive:
+            archive([dict(row) for row in self.engine.execute(select([table]).where(clause))])
+        return self.engine.execute(table.delete().where(clause)).rowcount
+
     def add_audit_log(self, job_id, job_name, event, **kwargs):
         """Insert an audit log.
         :param str job_id: string for job id.
         :param str job_name: string for job name.
         :param int event: integer for an event.
         """
+        self.engine.execute(self._get_audit_log_insert(job_id, job_name, event, **kwargs))
+
+    def add_audit_logs(self, audit_logs):
+        """Inserts multiple audit logs with one statement.
+        :param list audit_logs: Dictionaries of the arguments of add_audit_log(), e.g.,
+            [{'job_id': ..., 'job_name': ..., 'event': ..., 'user': ..., 'description': ...}]
+            user and description are optional.
+        """
+        if not audit_logs:
+            return
+        # Every row needs the same columns to go in one statement.
+        self.engine.execute(self.auditlogs_table.insert(), [
+            dict({'user': None, 'description': None}, **audit_log)
+            for audit_log in audit_logs])
+
+    def _get_audit_log_insert(self, job_id, job_name, event, **kwargs):
+        """Returns the statement of add_audit_log().
+        :return: A SQLAlchemy insert statement.
+        """
         audit_log = {
             'job_id': job_id,
             'job_name': job_name,
             'event': event
         }
         audit_log.update(kwargs)
-        log_insert = self.auditlogs_table.insert().values(**audit_log)
-        self.engine.execute(log_insert)
+        return self.auditlogs_table.insert().values(**audit_log)
 
     def get_audit_logs(self, time_range_start, time_range_end):
         """Returns a list of audit logs.
@@ -195,13 +1034,7 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
             Sorted by created_time.
         :rtype: dict
         """
-        utc = dateutil.tz.gettz('UTC')
-        start_time = dateutil.parser.parse(time_range_start).replace(tzinfo=utc)
-        end_time = dateutil.parser.parse(time_range_end).replace(tzinfo=utc)
-        selectable = select('*').where(
-            self.auditlogs_table.c.created_time.between(
-                start_time, end_time)).order_by(desc(self.auditlogs_table.c.created_time))
-
+        selectable = self._get_audit_logs_query(time_range_start, time_range_end)
         rows = self.engine.execute(selectable)
 
         return_json = {
@@ -209,6 +1042,31 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
 
         return return_json
 
+    def iter_audit_logs(self, time_range_start, time_range_end,
+                        chunk_size=constants.DEFAULT_EXPORT_CHUNK_SIZE):
+        """Yields the audit logs in a time range, chunk by chunk.
+        Like iter_executions(), memory use doesn't grow with the number of audit logs.
+        :param str time_range_start: ISO format for time range starting point.
+        :param str time_range_end: ISO for time range ending point.
+        :param int chunk_size: Max number of audit logs in a chunk.
+        :return: A generator of lists of audit logs, in the order of get_audit_logs().
+        :rtype: generator
+        """
+        selectable = self._get_audit_logs_query(time_range_start, time_range_end)
+        for rows in self._iter_chunks(selectable, chunk_size):
+            yield [self._build_audit_log(row) for row in rows]
+
+    def _get_audit_logs_query(self, time_range_start, time_range_end):
+        """Returns the query of get_audit_logs().
+        :return: A SQLAlchemy selectable.
+        """
+        utc = dateutil.tz.gettz('UTC')
+        start_time = dateutil.parser.parse(time_range_start).replace(tzinfo=utc)
+        end_time = dateutil.parser.parse(time_range_end).replace(tzinfo=utc)
+        return select('*').where(
+            self.auditlogs_table.c.created_time.between(
+                start_time, end_time)).order_by(desc(self.auditlogs_table.c.created_time))
+
     def _build_audit_log(self, row):
         """Return audit_log from a row of scheduler_auditlog table.
         :param obj row: A row instance of scheduler_auditlog table.
@@ -223,3 +1081,95 @@ class DatastoreBase(sched_sqlalchemy.SQLAlchemyJobStore):
             'created_time': self.get_time_isoformat_from_db(row.created_time),
             'description': row.description}
         return return_dict
+
+    def acquire_lease(self, name, holder, ttl_sec):
+        """Acquires a lease, or renews it if holder already holds it.
+        A lease can be acquired if nobody holds it or if it expired, i.e., its holder didn't
+        renew it within ttl_sec.
+        :param str name: Lease name.
+        :param str holder: Unique id of the process trying to hold the lease.
+        :param float ttl_sec: Number of seconds the lease is valid for if it's not renewed.
+        :return: If holder holds the lease, a fencing token that increases every time the lease
+            changes hands; otherwise, None.
+        :rtype: int
+        """
+        now = time.time()
+        table = self.leases_table
+        lease_update = table.update().where(and_(
+            table.c.name == name,
+            or_(table.c.holder == holder, table.c.expires_at < now))).values(
+                token=case({holder: table.c.token}, value=table.c.holder,
+                           else_=table.c.token + 1),
+                holder=holder,
+                expires_at=now + ttl_sec)
+        if self.engine.execute(lease_update).rowcount:
+            selectable = select([table.c.token]).where(
+                and_(table.c.name == name, table.c.holder == holder))
+            return self.engine.execute(selectable).scalar()
+
+        lease_insert = table.insert().values(name=name, token=1, holder=holder,
+                                             expires_at=now + ttl_sec)
+        try:
+            self.engine.execute(lease_insert)
+        except IntegrityError:
+            # Somebody else holds the lease.
+            return None
+        return 1
+
+    def holds_lease(self, name, holder, token, connection=None):
+        """Tells whether holder still holds a lease, with the fencing token it acquired it with.
+        :param str name: Lease name.
+        :param str holder: Unique id of the process holding the lease.
+        :param int token: Fencing token returned by acquire_lease().
+        :param Connection connection: connection of a transaction to check in, if any.
+        :rtype: bool
+        """
+        table = self.leases_table
+        selectable = select([table.c.name]).where(and_(
+            table.c.name == name, table.c.holder == holder, table.c.token == token,
+            table.c.expires_at > time.time()))
+        return (connection or self.engine).execute(selectable).first() is not None
+
+    def release_lease(self, name, holder):
+        """Releases a lease, so that another process can acquire it right away.
+        Does nothing if holder doesn't hold the lease.
+        :param str name: Lease name.
+        :param str holder: Unique id of the process holding the lease.
+        """
+        table = self.leases_table
+        lease_update = table.update().where(
+            and_(table.c.name == name, table.c.holder == holder)).values(expires_at=0)
+        self.engine.execute(lease_update)
+
+    def heartbeat_node(self, node_id):
+        """Records that a scheduler node is alive.
+        :param str node_id: Unique id of the scheduler node.
+        """
+        now = time.time()
+        table = self.nodes_table
+        node_update = table.update().where(table.c.node_id == node_id).values(heartbeat_at=now)
+        if not self.engine.execute(node_update).rowcount:
+            self.engine.execute(table.insert().values(node_id=node_id, heartbeat_at=now))
+
+    def get_live_nodes(self, ttl_sec):
+        """Returns the ids of scheduler nodes that sent a heartbeat within ttl_sec.
+        :param float ttl_sec: Number of seconds after which a silent node is considered dead.
+        :return: A sorted list of node ids.
+        :rtype: list
+        """
+        table = self.nodes_table
+        selectable = select([table.c.node_id]).where(
+            table.c.heartbeat_at >= time.time() - ttl_sec).order_by(table.c.node_id)
+        return [row.node_id for row in self.engine.execute(selectable)]
+
+    def remove_nodes(self, node_id=None, ttl_sec=None):
+        """Removes a scheduler node, or the nodes that didn't send a heartbeat within ttl_sec.
+        :param str node_id: Id of the node to remove.
+        :param float ttl_sec: Number of seconds after which a silent node is considered dead.
+        """
+        table = self.nodes_table
+        if node_id is not None:
+            node_delete = table.delete().where(table.c.node_id == node_id)
+        else:
+            node_delete = table.delete().where(table.c.heartbeat_at < time.time() - ttl_sec)
+        self.engine.execute(node_delete)
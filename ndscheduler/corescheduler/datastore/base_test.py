@@ -1,12 +1,35 @@
 """Unit tests for DatastoreBase."""
 
 import datetime
+import os
+import shutil
+import tempfile
 import unittest
+from concurrent import futures
 
+import mock
+import sqlalchemy
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
 from apscheduler.schedulers.blocking import BlockingScheduler
 
 from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler.datastore.base import LeaseLostError
 from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.corescheduler.datastore.testing import make_job
+
+
+def _get_forked_settings(db_config):
+    """Runs in a forked process, and returns the settings of its datastore instance."""
+    store = DatastoreSqlite.get_instance(db_config)
+    store.add_execution('forked-execution', 'job-id', constants.EXECUTION_STATUS_SCHEDULED)
+    return {
+        'result_inline_max_bytes': store.result_inline_max_bytes,
+        'compact_job_state': store.compact_job_state,
+        'job_filter': [store.job_filter('a'), store.job_filter('b')],
+        'fence': store.fence,
+        'write_behind': (store.write_behind_queue.batch_size,
+                         store.write_behind_queue.flush_interval_sec),
+    }
 
 
 class DatastoreBaseTest(unittest.TestCase):
@@ -15,6 +38,11 @@ class DatastoreBaseTest(unittest.TestCase):
         fake_scheduler = BlockingScheduler()
         self.store = DatastoreSqlite.get_instance()
         self.store.start(fake_scheduler, None)
+        self.fake_scheduler = fake_scheduler
+
+    def _add_job(self, job_id, name):
+        """Persists a job straight into the job store, without starting a scheduler."""
+        self.store.add_job(make_job(self.fake_scheduler, job_id, name, pub_args=['arg1']))
 
     def test_add_execution_get_execution(self):
         eid = '12345'
@@ -33,6 +61,114 @@ class DatastoreBaseTest(unittest.TestCase):
         self.assertEqual(execution['state'],
                          constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_RUNNING])
 
+    def test_stop_execution(self):
+        self.store.add_execution('stop1', '321', state=constants.EXECUTION_STATUS_RUNNING)
+        self.store.add_execution('stop2', '321', state=constants.EXECUTION_STATUS_SUCCEEDED)
+
+        self.assertTrue(self.store.stop_execution('stop1'))
+        self.assertEqual(self.store.get_execution_state('stop1'),
+                         constants.EXECUTION_STATUS_STOPPING)
+        self.assertFalse(self.store.stop_execution('stop1'))
+        self.assertFalse(self.store.stop_execution('stop2'))
+        self.assertEqual(self.store.get_execution_state('stop2'),
+                         constants.EXECUTION_STATUS_SUCCEEDED)
+        self.assertIsNone(self.store.get_execution_state('missing'))
+
+    def test_large_result_stored_out_of_line(self):
+        now = datetime.datetime.utcnow()
+        large_result = '"%s"' % ('x' * constants.DEFAULT_EXECUTION_RESULT_INLINE_MAX_BYTES)
+        self.store.add_execution('large1', '321', state=constants.EXECUTION_STATUS_SUCCEEDED,
+                                 scheduled_time=now, result=large_result)
+        self.store.add_execution('small1', '321', state=constants.EXECUTION_STATUS_SCHEDULED,
+                                 scheduled_time=now)
+        self.store.update_execution('small1', state=constants.EXECUTION_STATUS_SUCCEEDED,
+                                    result='"small"')
+
+        execution = self.store.get_execution('large1')
+        self.assertEqual(execution['result'], large_result)
+        self.assertFalse(execution['result_truncated'])
+
+        start = (now - datetime.timedelta(minutes=1)).isoformat()
+        end = (now + datetime.timedelta(minutes=1)).isoformat()
+        executions = dict((execution['execution_id'], execution) for execution in
+                          self.store.get_executions(start, end)['executions'])
+        self.assertEqual(executions['large1']['result'],
+                         large_result[:constants.RESULT_PREVIEW_LENGTH])
+        self.assertTrue(executions['large1']['result_truncated'])
+        self.assertEqual(executions['large1']['result_size'], len(large_result))
+        self.assertEqual(executions['small1']['result'], '"small"')
+        self.assertFalse(executions['small1']['result_truncated'])
+        self.assertNotIn('result_size', executions['small1'])
+
+        table = self.store.executions_table
+        self.store.purge_executions(table.c.eid.in_(['large1', 'small1']), 10)
+        results_table = self.store.execution_results_table
+        self.assertEqual(self.store.engine.execute(results_table.select()).fetchall(), [])
+
+    def test_runtime_settings_survive_fork(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        db_config = {'file_path': os.path.join(tmp_dir, 'datastore.db')}
+        DatastoreSqlite.destroy_instance()
+        self.addCleanup(DatastoreSqlite.destroy_instance)
+        store = DatastoreSqlite.get_instance(db_config)
+        store.result_inline_max_bytes = 10
+        store.compact_job_state = False
+        store.job_filter = lambda job_id: job_id == 'a'
+        store.fence = ('leader', 'host-1', 3)
+        store.enable_write_behind(50, 60)
+        self.addCleanup(store.disable_write_behind)
+
+        executor = futures.ProcessPoolExecutor(1)
+        settings = executor.submit(_get_forked_settings, db_config).result()
+        executor.shutdown()
+
+        self.assertEqual(settings, {
+            'result_inline_max_bytes': 10,
+            'compact_job_state': False,
+            'job_filter': [True, False],
+            'fence': ('leader', 'host-1', 3),
+            'write_behind': (50, 60),
+        })
+        # The worker flushed its queued write on exit, long before the flush interval.
+        store.disable_write_behind()
+        store.start(BlockingScheduler(), None)
+        self.assertIsNotNone(store.get_execution('forked-execution'))
+
+    def test_add_update_remove_jobs(self):
+        jobs = [make_job(self.fake_scheduler, 'bulk%d' % i, 'job') for i in range(2)]
+        self.store.add_jobs(jobs)
+        self.assertRaises(ConflictingIdError, self.store.add_jobs, jobs[:1])
+
+        jobs[0]._modify(name='renamed')
+        self.store.update_jobs(jobs)
+        self.assertEqual(self.store.lookup_job('bulk0').name, 'renamed')
+
+        self.assertRaises(JobLookupError, self.store.remove_jobs, ['bulk0', 'missing'])
+        self.assertEqual(len(self.store.lookup_jobs(['bulk0', 'bulk1'])), 2)
+        self.store.remove_jobs(['bulk0', 'bulk1'])
+        self.assertEqual(self.store.lookup_jobs(['bulk0', 'bulk1']), {})
+
+    def test_bulk_writes_are_fenced(self):
+        jobs = [make_job(self.fake_scheduler, 'fenced%d' % i, 'job') for i in range(2)]
+        self.store.add_jobs(jobs)
+        token = self.store.acquire_lease('bulk-lease', 'host-1', 60)
+        self.addCleanup(setattr, self.store, 'fence', None)
+
+        # Another holder took the lease over since.
+        self.store.fence = ('bulk-lease', 'host-1', token - 1)
+        jobs[0]._modify(name='renamed')
+        self.assertRaises(LeaseLostError, self.store.update_jobs, jobs)
+        self.assertEqual(self.store.lookup_job('fenced0').name, 'job')
+        self.assertRaises(LeaseLostError, self.store.remove_jobs, ['fenced0', 'fenced1'])
+        self.assertEqual(len(self.store.lookup_jobs(['fenced0', 'fenced1'])), 2)
+
+        self.store.fence = ('bulk-lease', 'host-1', token)
+        self.store.update_jobs(jobs)
+        self.assertEqual(self.store.lookup_job('fenced0').name, 'renamed')
+        self.store.remove_jobs(['fenced0', 'fenced1'])
+        self.assertEqual(self.store.lookup_jobs(['fenced0', 'fenced1']), {})
+
     def test_get_executions_by_time_interval(self):
         now = datetime.datetime.now()
         start_time = (now + datetime.timedelta(minutes=20)).isoformat()
@@ -48,6 +184,115 @@ class DatastoreBaseTest(unittest.TestCase):
         executions = self.store.get_executions(start_time, end_time)
         self.assertEqual(len(executions['executions']), 2)
 
+    def test_get_executions_loads_each_job_once(self):
+        now = datetime.datetime.utcnow()
+        start_time = (now - datetime.timedelta(minutes=1)).isoformat()
+        end_time = (now + datetime.timedelta(minutes=1)).isoformat()
+        self._add_job('job-a', 'job a')
+        self._add_job('job-b', 'job b')
+        for i in range(10):
+            self.store.add_execution('a%d' % i, 'job-a', state=constants.EXECUTION_STATUS_SCHEDULED)
+            self.store.add_execution('b%d' % i, 'job-b', state=constants.EXECUTION_STATUS_SCHEDULED)
+        self.store.add_execution('c0', 'job-c', state=constants.EXECUTION_STATUS_SCHEDULED)
+
+        with mock.patch.object(self.store, 'lookup_job') as mock_lookup_job, \
+                mock.patch.object(self.store, '_reconstitute_job',
+                                  wraps=self.store._reconstitute_job) as mock_reconstitute:
+            executions = self.store.get_executions(start_time, end_time)['executions']
+            self.assertFalse(mock_lookup_job.called)
+            self.assertEqual(mock_reconstitute.call_count, 2)
+
+        by_id = dict((execution['execution_id'], execution) for execution in executions)
+        for i in range(10):
+            self.assertIn('a%d' % i, by_id)
+            self.assertIn('b%d' % i, by_id)
+        self.assertEqual(by_id['a3']['job']['name'], 'job a')
+        self.assertEqual(by_id['b7']['job']['job_id'], 'job-b')
+        self.assertEqual(list(by_id['b7']['job']['pub_args']), ['arg1'])
+        self.assertNotIn('job', by_id['c0'])
+
+    def test_get_executions_paginated(self):
+        now = datetime.datetime.utcnow()
+        start_time = (now + datetime.timedelta(days=1)).isoformat()
+        end_time = (now + datetime.timedelta(days=2)).isoformat()
+        scheduled_time = now + datetime.timedelta(days=1, minutes=1)
+        same_updated_time = now + datetime.timedelta(days=1, minutes=2)
+        for i in range(5):
+            self.store.add_execution('page%d' % i, '34', state=constants.EXECUTION_STATUS_SCHEDULED,
+                                     scheduled_time=scheduled_time,
+                                     updated_time=scheduled_time + datetime.timedelta(seconds=i))
+        # Ties on updated_time are broken by execution id.
+        for i in range(5, 7):
+            self.store.add_execution('page%d' % i, '34', state=constants.EXECUTION_STATUS_SCHEDULED,
+                                     scheduled_time=scheduled_time,
+                                     updated_time=same_updated_time)
+
+        eids = []
+        cursor = None
+        while True:
+            page = self.store.get_executions(start_time, end_time, limit=3, cursor=cursor)
+            self.assertLessEqual(len(page['executions']), 3)
+            eids.extend(execution['execution_id'] for execution in page['executions'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(eids, ['page6', 'page5', 'page4', 'page3', 'page2', 'page1', 'page0'])
+
+        unlimited = self.store.get_executions(start_time, end_time)
+        self.assertEqual(len(unlimited['executions']), 7)
+        self.assertIsNone(unlimited['next_cursor'])
+
+    def test_iter_executions(self):
+        now = datetime.datetime.utcnow()
+        start_time = (now + datetime.timedelta(days=6)).isoformat()
+        end_time = (now + datetime.timedelta(days=7)).isoformat()
+        scheduled_time = now + datetime.timedelta(days=6, minutes=1)
+        for i in range(5):
+            self.store.add_execution('iter%d' % i, '34', state=constants.EXECUTION_STATUS_SCHEDULED,
+                                     scheduled_time=scheduled_time,
+                                     updated_time=scheduled_time + datetime.timedelta(seconds=i))
+
+        chunks = list(self.store.iter_executions(start_time, end_time, chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([execution for chunk in chunks for execution in chunk],
+                         self.store.get_executions(start_time, end_time)['executions'])
+
+    def test_get_execution_stats(self):
+        now = datetime.datetime.utcnow()
+        start_time = (now + datetime.timedelta(days=3)).isoformat()
+        end_time = (now + datetime.timedelta(days=4)).isoformat()
+        scheduled_time = now + datetime.timedelta(days=3, minutes=1)
+        for i, (job_id, state) in enumerate([
+                ('stats-a', constants.EXECUTION_STATUS_SUCCEEDED),
+                ('stats-a', constants.EXECUTION_STATUS_SUCCEEDED),
+                ('stats-a', constants.EXECUTION_STATUS_FAILED),
+                ('stats-b', constants.EXECUTION_STATUS_RUNNING)]):
+            self.store.add_execution('stats%d' % i, job_id, state=state,
+                                     scheduled_time=scheduled_time)
+        self.store.add_execution('stats-out', 'stats-a', state=constants.EXECUTION_STATUS_FAILED,
+                                 scheduled_time=now + datetime.timedelta(days=5))
+
+        stats = self.store.get_execution_stats(start_time, end_time)
+        self.assertEqual(stats['total'], 4)
+        self.assertEqual(stats['states']['succeeded'], 2)
+        self.assertEqual(stats['states']['failed'], 1)
+        self.assertEqual(stats['states']['running'], 1)
+        self.assertEqual(stats['states']['scheduled'], 0)
+        self.assertNotIn('jobs', stats)
+
+        stats = self.store.get_execution_stats(start_time, end_time, by_job=True)
+        self.assertEqual(stats['total'], 4)
+        self.assertEqual(set(stats['jobs']), {'stats-a', 'stats-b'})
+        self.assertEqual(stats['jobs']['stats-a']['total'], 3)
+        self.assertEqual(stats['jobs']['stats-a']['states']['failed'], 1)
+        self.assertEqual(stats['jobs']['stats-b']['states']['running'], 1)
+        self.assertEqual(stats['jobs']['stats-b']['states']['succeeded'], 0)
+
+    def test_get_executions_invalid_cursor(self):
+        now = datetime.datetime.utcnow()
+        self.assertRaises(ValueError, self.store.get_executions, now.isoformat(),
+                          now.isoformat(), limit=1, cursor='not a cursor')
+
     def test_add_audit_log_get_audit_logs(self):
         job_id = '234'
         job_name = 'asdfs'
@@ -62,3 +307,70 @@ class DatastoreBaseTest(unittest.TestCase):
 
         logs = self.store.get_audit_logs(five_min_ago.isoformat(), now.isoformat())
         self.assertEqual(len(logs['logs']), 1)
+
+    def test_add_audit_logs(self):
+        self.store.add_audit_logs([
+            {'job_id': 'bulk1', 'job_name': 'job', 'event': constants.AUDIT_LOG_ADDED,
+             'user': 'aa'},
+            {'job_id': 'bulk2', 'job_name': 'job', 'event': constants.AUDIT_LOG_DELETED,
+             'description': 'hihi'}])
+        now = datetime.datetime.utcnow()
+        five_min_ago = now - datetime.timedelta(minutes=5)
+
+        logs = self.store.get_audit_logs(five_min_ago.isoformat(), now.isoformat())['logs']
+        logs = dict((log['job_id'], log) for log in logs)
+        self.assertEqual(logs['bulk1']['user'], 'aa')
+        self.assertIsNone(logs['bulk1']['description'])
+        self.assertEqual(logs['bulk2']['description'], 'hihi')
+
+    def test_iter_audit_logs(self):
+        for i in range(3):
+            self.store.add_audit_log('iter%d' % i, 'job', constants.AUDIT_LOG_ADDED)
+        now = datetime.datetime.utcnow()
+        five_min_ago = now - datetime.timedelta(minutes=5)
+
+        chunks = list(self.store.iter_audit_logs(five_min_ago.isoformat(), now.isoformat(),
+                                                 chunk_size=2))
+        self.assertEqual([log for chunk in chunks for log in chunk],
+                         self.store.get_audit_logs(five_min_ago.isoformat(),
+                                                   now.isoformat())['logs'])
+        self.assertTrue(all(len(chunk) <= 2 for chunk in chunks))
+
+    def test_create_missing_indexes(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        file_path = os.path.join(tmp_dir, 'datastore.db')
+
+        # Tables created by a version of ndscheduler without indexes
+        engine = sqlalchemy.create_engine('sqlite:///' + file_path)
+        metadata = sqlalchemy.MetaData()
+        sqlalchemy.Table(constants.DEFAULT_EXECUTIONS_TABLENAME, metadata,
+                         sqlalchemy.Column('eid', sqlalchemy.Unicode(191), primary_key=True),
+                         sqlalchemy.Column('state', sqlalchemy.Integer),
+                         sqlalchemy.Column('scheduled_time', sqlalchemy.DateTime),
+                         sqlalchemy.Column('updated_time', sqlalchemy.DateTime),
+                         sqlalchemy.Column('job_id', sqlalchemy.Text))
+        sqlalchemy.Table(constants.DEFAULT_AUDIT_LOGS_TABLENAME, metadata,
+                         sqlalchemy.Column('job_id', sqlalchemy.Text),
+                         sqlalchemy.Column('created_time', sqlalchemy.DateTime))
+        metadata.create_all(engine)
+        engine.dispose()
+
+        store = DatastoreSqlite({'file_path': file_path}, None)
+        self.addCleanup(store.engine.dispose)
+
+        inspector = sqlalchemy.inspect(store.engine)
+        execution_indexes = set(index['name'] for index in inspector.get_indexes(
+            constants.DEFAULT_EXECUTIONS_TABLENAME))
+        self.assertEqual(execution_indexes, set([
+            'ix_scheduler_execution_scheduled_time',
+            'ix_scheduler_execution_updated_time_eid',
+            'ix_scheduler_execution_job_id']))
+        auditlog_indexes = set(index['name'] for index in inspector.get_indexes(
+            constants.DEFAULT_AUDIT_LOGS_TABLENAME))
+        self.assertEqual(auditlog_indexes, set([
+            'ix_scheduler_jobauditlog_created_time',
+            'ix_scheduler_jobauditlog_job_id']))
+
+        # Starting again is a no-op
+        DatastoreSqlite({'file_path': file_path}, None).engine.dispose()
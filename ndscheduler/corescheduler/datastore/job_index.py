@@ -0,0 +1,159 @@
+"""In-memory index of the jobs of a datastore.
+
+Every wakeup of the scheduler asks the jobstore for due jobs and the next run time, which costs
+an SQL query plus unpickling every due job. A single scheduler process already knows every job,
+though: it added them, and it moves their next run times. The index keeps the deserialized jobs
+in memory, with a heap of (next run time, job id) to find the due ones. The datastore writes every
+change through to the database before applying it here, and only loads jobs from the database on
+start.
+
+Heap entries aren't removed when a job changes or goes away. Entries whose timestamp is no longer
+the one of their job are skipped, and dropped, as they come up.
+"""
+
+import heapq
+import threading
+
+from apscheduler.util import datetime_to_utc_timestamp
+
+
+class JobIndex(object):
+
+    # The heap is rebuilt when it has this many more entries than twice the number of jobs.
+    COMPACT_SLACK = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # job id -> (apscheduler.job.Job instance, next run time as a UTC timestamp)
+        self._jobs = {}
+        # (next run time as a UTC timestamp, job id), for jobs that aren't paused
+        self._heap = []
+
+    def load(self, jobs):
+        """Replaces all jobs in the index.
+        :param list jobs: apscheduler.job.Job instances.
+        """
+        with self._lock:
+            self._jobs = dict((job.id, (job, datetime_to_utc_timestamp(job.next_run_time)))
+                              for job in jobs)
+            self._rebuild_heap()
+
+    def put(self, job):
+        """Adds a job, or replaces the job with the same id.
+        :param Job job: apscheduler.job.Job instance.
+        """
+        timestamp = datetime_to_utc_timestamp(job.next_run_time)
+        with self._lock:
+            previous = self._jobs.get(job.id)
+            self._jobs[job.id] = (job, timestamp)
+            if timestamp is not None and (not previous or previous[1] != timestamp):
+                heapq.heappush(self._heap, (timestamp, job.id))
+            if len(self._heap) > 2 * len(self._jobs) + self.COMPACT_SLACK:
+                self._rebuild_heap()
+
+    def remove(self, job_id):
+        """Removes a job. Does nothing if it isn't in the index.
+        :param str job_id: Job id.
+        """
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def clear(self):
+        """Removes all jobs."""
+        with self._lock:
+            self._jobs = {}
+            self._heap = []
+
+    def get(self, job_id):
+        """Returns a job.
+        :param str job_id: Job id.
+        :return: apscheduler.job.Job instance, or None if it isn't in the index.
+        :rtype: Job
+        """
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return entry[0] if entry else None
+
+    def get_many(self, job_ids):
+        """Returns multiple jobs.
+        :param list job_ids: Job ids. Duplicates are allowed.
+        :return: A dictionary mapping job id to apscheduler.job.Job instance. Job ids that
+            aren't in the index are not in the dictionary.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict((job_id, self._jobs[job_id][0])
+                        for job_id in job_ids if job_id in self._jobs)
+
+    def get_all(self):
+        """Returns all jobs, sorted by next run time. Paused jobs are last.
+        :return: A list of apscheduler.job.Job instances.
+        :rtype: list
+        """
+        with self._lock:
+            entries = sorted(self._jobs.values(),
+                             key=lambda entry: (entry[1] is None, entry[1] or 0))
+        return [job for job, _ in entries]
+
+    def get_due_jobs(self, timestamp, job_filter=None):
+        """Returns the jobs due at a time, sorted by next run time.
+        :param float timestamp: UTC timestamp.
+        :param job_filter: If set, only jobs whose id it returns True for are returned.
+        :return: A list of apscheduler.job.Job instances.
+        :rtype: list
+        """
+        with self._lock:
+            popped = []
+            while self._heap and self._heap[0][0] <= timestamp:
+                self._pop(popped)
+            self._push(popped)
+            return [self._jobs[job_id][0] for entry_timestamp, job_id in popped
+                    if entry_timestamp <= timestamp and (not job_filter or job_filter(job_id))]
+
+    def get_next_run_time(self, job_filter=None):
+        """Returns the earliest next run time of jobs.
+        :param job_filter: If set, only jobs whose id it returns True for are considered.
+        :return: UTC timestamp, or None if there's no job to run.
+        :rtype: float
+        """
+        with self._lock:
+            popped = []
+            next_run_time = None
+            entry = self._pop(popped)
+            while entry:
+                if not job_filter or job_filter(entry[1]):
+                    next_run_time = entry[0]
+                    break
+                entry = self._pop(popped)
+            self._push(popped)
+            return next_run_time
+
+    def _pop(self, popped):
+        """Pops the earliest entry of a job from the heap and appends it to popped.
+        Stale entries are dropped on the way, and so are duplicates of the last entry in popped,
+        which come right after it.
+        :param list popped: Entries popped so far.
+        :return: the popped entry, or None if the heap is out of entries.
+        :rtype: tuple
+        """
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            timestamp, job_id = entry
+            if job_id not in self._jobs or self._jobs[job_id][1] != timestamp:
+                continue
+            if popped and popped[-1] == entry:
+                continue
+            popped.append(entry)
+            return entry
+        return None
+
+    def _push(self, entries):
+        """Puts popped entries back in the heap."""
+        for entry in entries:
+            heapq.heappush(self._heap, entry)
+
+    def _rebuild_heap(self):
+        """Rebuilds the heap from the jobs, without stale entries."""
+        self._heap = [(timestamp, job_id) for job_id, (_, timestamp) in self._jobs.items()
+                      if timestamp is not None]
+        heapq.heapify(self._heap)
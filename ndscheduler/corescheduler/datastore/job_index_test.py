@@ -0,0 +1,152 @@
+"""Unit tests for JobIndex."""
+
+import datetime
+import unittest
+
+import sqlalchemy
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
+from apscheduler.schedulers.blocking import BlockingScheduler
+from dateutil import tz
+
+from ndscheduler.corescheduler.datastore.job_index import JobIndex
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.corescheduler.datastore.testing import make_job
+
+
+class JobIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = BlockingScheduler()
+        self.now = datetime.datetime(2024, 1, 1, 12, 0, tzinfo=tz.tzutc())
+
+    def _make_job(self, job_id, minutes=None):
+        next_run_time = None
+        if minutes is not None:
+            next_run_time = self.now + datetime.timedelta(minutes=minutes)
+        return make_job(self.scheduler, job_id, next_run_time=next_run_time)
+
+    def _timestamp(self, minutes):
+        return (self.now + datetime.timedelta(minutes=minutes) -
+                datetime.datetime(1970, 1, 1, tzinfo=tz.tzutc())).total_seconds()
+
+    def test_get_due_jobs(self):
+        index = JobIndex()
+        index.load([self._make_job('c', 3), self._make_job('a', 1), self._make_job('b', 2),
+                    self._make_job('paused')])
+
+        self.assertEqual([job.id for job in index.get_due_jobs(self._timestamp(2))], ['a', 'b'])
+        self.assertEqual([job.id for job in index.get_due_jobs(self._timestamp(2),
+                                                               lambda job_id: job_id != 'a')],
+                         ['b'])
+        self.assertEqual(index.get_due_jobs(self._timestamp(0)), [])
+        self.assertEqual([job.id for job in index.get_all()], ['a', 'b', 'c', 'paused'])
+
+    def test_changes(self):
+        index = JobIndex()
+        index.load([self._make_job('a', 1), self._make_job('b', 2)])
+
+        # Moves a after b, then back to where it was, which leaves two entries of it in the heap.
+        index.put(self._make_job('a', 3))
+        index.put(self._make_job('a', 1))
+        self.assertEqual([job.id for job in index.get_due_jobs(self._timestamp(5))], ['a', 'b'])
+        self.assertEqual(index.get_next_run_time(), self._timestamp(1))
+
+        index.put(self._make_job('a'))
+        index.remove('b')
+        self.assertEqual(index.get_due_jobs(self._timestamp(5)), [])
+        self.assertIsNone(index.get_next_run_time())
+        self.assertEqual(index.get('a').id, 'a')
+        self.assertEqual(list(index.get_many(['a', 'b', 'a'])), ['a'])
+
+        index.clear()
+        self.assertEqual(index.get_all(), [])
+
+    def test_get_next_run_time_job_filter(self):
+        index = JobIndex()
+        index.load([self._make_job('a', 1), self._make_job('b', 2)])
+
+        self.assertEqual(index.get_next_run_time(lambda job_id: job_id == 'b'),
+                         self._timestamp(2))
+        self.assertIsNone(index.get_next_run_time(lambda job_id: False))
+        # Entries looked at are put back.
+        self.assertEqual(index.get_next_run_time(), self._timestamp(1))
+
+    def test_heap_is_compacted(self):
+        index = JobIndex()
+        index.load([self._make_job('a', 0)])
+        for minutes in range(1, 500):
+            index.put(self._make_job('a', minutes))
+        self.assertLessEqual(len(index._heap), 2 + index.COMPACT_SLACK)
+        self.assertEqual(index.get_next_run_time(), self._timestamp(499))
+
+
+class DatastoreJobIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = BlockingScheduler()
+        self.now = datetime.datetime.now(tz.tzutc())
+        self.store = DatastoreSqlite({}, None)
+        self.addCleanup(self.store.engine.dispose)
+
+    def _make_job(self, job_id, minutes):
+        return make_job(self.scheduler, job_id,
+                        next_run_time=self.now + datetime.timedelta(minutes=minutes))
+
+    def _count_jobs_queries(self, function, *args):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *unused):
+            if self.store.jobs_t.name in statement:
+                statements.append(statement)
+
+        sqlalchemy.event.listen(self.store.engine, 'before_cursor_execute',
+                                before_cursor_execute)
+        try:
+            result = function(*args)
+        finally:
+            sqlalchemy.event.remove(self.store.engine, 'before_cursor_execute',
+                                    before_cursor_execute)
+        return result, len(statements)
+
+    def test_jobs_loaded_on_start(self):
+        # Jobs written before the index is enabled.
+        self.store.start(self.scheduler, 'default')
+        self.store.add_jobs([self._make_job('a', -1), self._make_job('b', 10)])
+
+        self.store.enable_job_index()
+        self.store.start(self.scheduler, 'default')
+
+        jobs, queries = self._count_jobs_queries(self.store.get_due_jobs, self.now)
+        self.assertEqual([job.id for job in jobs], ['a'])
+        self.assertEqual(queries, 0)
+        next_run_time, queries = self._count_jobs_queries(self.store.get_next_run_time)
+        self.assertEqual(next_run_time, jobs[0].next_run_time)
+        self.assertEqual(queries, 0)
+
+    def test_changes_are_written_through(self):
+        self.store.enable_job_index()
+        self.store.start(self.scheduler, 'default')
+
+        self.store.add_job(self._make_job('a', -1))
+        self.store.add_jobs([self._make_job('b', -2), self._make_job('c', 10)])
+        self.assertRaises(ConflictingIdError, self.store.add_job, self._make_job('a', 1))
+        self.assertEqual([job.id for job in self.store.get_due_jobs(self.now)], ['b', 'a'])
+
+        job = self.store.lookup_job('a')
+        job._modify(next_run_time=self.now + datetime.timedelta(minutes=5))
+        self.store.update_job(job)
+        self.store.remove_jobs(['b'])
+        self.assertEqual(self.store.get_due_jobs(self.now), [])
+
+        # A job that fails to be written is reloaded from the database.
+        job = self.store.lookup_job('c')
+        job._modify(name='renamed')
+        self.store.remove_job('c')
+        self.store.job_index.put(job)
+        self.assertRaises(JobLookupError, self.store.update_jobs, [job])
+        self.assertIsNone(self.store.lookup_job('c'))
+
+        # The database has the same jobs as the index.
+        self.store.job_index = None
+        self.assertEqual([(job.id, job.next_run_time) for job in self.store.get_all_jobs()],
+                         [('a', self.now + datetime.timedelta(minutes=5))])
@@ -0,0 +1,153 @@
+"""Compact serialization of job states.
+
+apscheduler pickles the whole job into the jobs table, including the arguments of run_job(): the
+datastore class path, its db_config and its table names. That makes every row large and slow to
+load, and leaves database credentials in every job state.
+
+Jobs scheduled by ndscheduler are instead stored as JSON of what makes them up: the job class,
+the arguments passed to it, the cron fields and the scheduling options. The datastore arguments
+are filled back in from the datastore that loads the job. Jobs that can't be represented that way,
+e.g., with a trigger other than cron, are still pickled. Both formats are read.
+"""
+
+import inspect
+import json
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler import stagger
+
+# Version of the compact format. Bump it when the format changes, and keep reading older ones.
+# Version 2 adds the stagger offset. Jobs without one are still written as version 1.
+VERSION = 2
+
+# Parsing cron fields takes most of the time of loading a job, and most jobs share a handful of
+# schedules. Triggers are never changed in place, so jobs with the same schedule share one.
+TRIGGER_CACHE_SIZE = 1000
+_trigger_cache = {}
+
+
+def is_compact(job_state):
+    """Tells a compact job state from a pickled one, which never starts with '{'.
+    :param bytes job_state: job_state column of the jobs table.
+    :rtype: bool
+    """
+    return job_state[:1] == b'{'
+
+
+def _get_timezone_name(timezone):
+    """Returns the name a timezone can be created back from, or None."""
+    name = getattr(timezone, 'key', None) or getattr(timezone, 'zone', None)
+    if not name and timezone.tzname(None) == 'UTC':
+        name = 'UTC'
+    return name
+
+
+def _is_json_value(value):
+    """Tells whether a value comes back the same out of JSON, e.g., not a tuple or a datetime."""
+    try:
+        return json.loads(json.dumps(value)) == value
+    except (TypeError, ValueError):
+        return False
+
+
+def _get_trigger(cron, timezone, jitter, offset_sec):
+    """Returns a cron trigger, from the cache if possible.
+    :param dict cron: cron fields that aren't defaults.
+    :param str timezone: timezone name.
+    :param int jitter: jitter in seconds, or None.
+    :param int offset_sec: stagger offset in seconds.
+    :rtype: CronTrigger
+    """
+    key = (timezone, jitter, offset_sec, tuple(sorted(cron.items())))
+    trigger = _trigger_cache.get(key)
+    if not trigger:
+        trigger = stagger.with_offset(CronTrigger(timezone=timezone, jitter=jitter, **cron),
+                                      offset_sec)
+        if len(_trigger_cache) >= TRIGGER_CACHE_SIZE:
+            _trigger_cache.clear()
+        _trigger_cache[key] = trigger
+    return trigger
+
+
+def dumps(job):
+    """Serializes a job in the compact format.
+    :param Job job: apscheduler.job.Job instance.
+    :return: the job state, or None if the job can't be represented in the compact format.
+    :rtype: bytes
+    """
+    trigger = job.trigger
+    if (type(trigger) not in (CronTrigger, stagger.StaggeredCronTrigger) or
+            trigger.start_date or trigger.end_date):
+        return None
+    args = list(job.args)
+    if len(args) < constants.JOB_ARGS or args[1] != job.id:
+        return None
+    # apscheduler would store the instance of a bound method in the args.
+    if not job.func_ref or (inspect.ismethod(job.func) and
+                            not inspect.isclass(job.func.__self__)):
+        return None
+    timezone = _get_timezone_name(trigger.timezone)
+    pub_args = args[constants.JOB_ARGS:]
+    if not timezone or not _is_json_value(pub_args) or not _is_json_value(job.kwargs):
+        return None
+
+    state = {
+        'v': 1,
+        'id': job.id,
+        'name': job.name,
+        'func': job.func_ref,
+        'class': args[0],
+        'pub_args': pub_args,
+        'kwargs': job.kwargs,
+        'cron': dict((field.name, str(field)) for field in trigger.fields
+                     if not field.is_default),
+        'tz': timezone,
+        'executor': job.executor,
+        'misfire_grace_time': job.misfire_grace_time,
+        'coalesce': job.coalesce,
+        'max_instances': job.max_instances,
+        'next_run_time': datetime_to_utc_timestamp(job.next_run_time)}
+    if trigger.jitter:
+        state['jitter'] = trigger.jitter
+    if stagger.get_trigger_offset(trigger):
+        state['v'] = 2
+        state['stagger'] = stagger.get_trigger_offset(trigger)
+    return json.dumps(state, separators=(',', ':')).encode('utf-8')
+
+
+def loads(job_state, datastore_args):
+    """Deserializes a job state in the compact format.
+    :param bytes job_state: as returned by dumps().
+    :param tuple datastore_args: (datastore class path, db_config, table names), the arguments
+        of run_job() that aren't stored.
+    :return: the state to pass to apscheduler.job.Job.__setstate__().
+    :rtype: dict
+    :raises ValueError: if the job state is of an unknown version.
+    """
+    state = json.loads(job_state.decode('utf-8'))
+    if state['v'] > VERSION:
+        raise ValueError('Job state has version %d, but only up to %d can be handled' %
+                         (state['v'], VERSION))
+
+    trigger = _get_trigger(state['cron'], state['tz'], state.get('jitter'),
+                           state.get('stagger', 0))
+    next_run_time = state['next_run_time']
+    if next_run_time is not None:
+        next_run_time = utc_timestamp_to_datetime(next_run_time).astimezone(trigger.timezone)
+    args = [state['class'], state['id']] + list(datastore_args) + state['pub_args']
+    return {
+        'version': 1,
+        'id': state['id'],
+        'func': state['func'],
+        'trigger': trigger,
+        'executor': state['executor'],
+        'args': tuple(args),
+        'kwargs': state['kwargs'],
+        'name': state['name'],
+        'misfire_grace_time': state['misfire_grace_time'],
+        'coalesce': state['coalesce'],
+        'max_instances': state['max_instances'],
+        'next_run_time': next_run_time}
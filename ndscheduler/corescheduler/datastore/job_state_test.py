@@ -0,0 +1,139 @@
+"""Unit tests for the compact job state format."""
+
+import datetime
+import unittest
+
+from apscheduler.job import Job
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from dateutil import tz
+from sqlalchemy import select
+
+from ndscheduler.corescheduler import stagger
+from ndscheduler.corescheduler.datastore import job_state
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.corescheduler.datastore.testing import make_job
+
+DATASTORE_ARGS = ('ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite',
+                  {'file_path': '/tmp/secret.db'}, {'jobs_tablename': 'jobs'})
+
+
+class JobStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = BlockingScheduler()
+
+    def _make_job(self, trigger=None, pub_args=None, job_id='job1'):
+        if trigger is None:
+            trigger = CronTrigger(minute='*/5', hour='1', day_of_week='mon-fri', jitter=30,
+                                  timezone='America/New_York')
+        if pub_args is None:
+            pub_args = ['first', {'second': [2]}]
+        return make_job(self.scheduler, job_id, 'a job', trigger=trigger,
+                        next_run_time=datetime.datetime(2024, 1, 2, 1, 5, tzinfo=tz.tzutc()),
+                        pub_args=pub_args, datastore_args=DATASTORE_ARGS,
+                        kwargs={'languages': 'en-us'}, misfire_grace_time=60, max_instances=3)
+
+    def test_round_trip(self):
+        original = self._make_job()
+        data = job_state.dumps(original)
+        self.assertTrue(job_state.is_compact(data))
+        self.assertNotIn(b'secret', data)
+
+        job = Job.__new__(Job)
+        job.__setstate__(job_state.loads(data, DATASTORE_ARGS))
+        for attribute in ('id', 'name', 'func', 'executor', 'args', 'kwargs',
+                          'misfire_grace_time', 'coalesce', 'max_instances', 'next_run_time'):
+            self.assertEqual(getattr(job, attribute), getattr(original, attribute), attribute)
+        self.assertEqual(str(job.trigger), str(original.trigger))
+        self.assertEqual(str(job.trigger.timezone), 'America/New_York')
+        self.assertEqual(job.trigger.jitter, 30)
+
+    def test_staggered_job(self):
+        trigger = stagger.StaggeredCronTrigger(137, minute='0', timezone='UTC')
+        data = job_state.dumps(self._make_job(trigger=trigger))
+        self.assertIn(b'"v":2', data)
+        state = job_state.loads(data, DATASTORE_ARGS)
+        self.assertEqual(stagger.get_trigger_offset(state['trigger']), 137)
+        self.assertEqual(str(state['trigger']), str(trigger))
+
+        # Jobs that aren't staggered stay readable by version 1.
+        data = job_state.dumps(self._make_job(trigger=stagger.with_offset(trigger, 0)))
+        self.assertIn(b'"v":1', data)
+        self.assertIs(type(job_state.loads(data, DATASTORE_ARGS)['trigger']), CronTrigger)
+
+    def test_paused_job(self):
+        original = self._make_job()
+        original._modify(next_run_time=None)
+        state = job_state.loads(job_state.dumps(original), DATASTORE_ARGS)
+        self.assertIsNone(state['next_run_time'])
+
+    def test_not_compact(self):
+        self.assertIsNone(job_state.dumps(self._make_job(trigger=IntervalTrigger(minutes=5))))
+        self.assertIsNone(job_state.dumps(self._make_job(pub_args=[('a', 'tuple')])))
+        self.assertIsNone(job_state.dumps(self._make_job(pub_args=[datetime.datetime.now()])))
+
+    def test_unknown_version(self):
+        data = job_state.dumps(self._make_job()).replace(b'"v":1', b'"v":99')
+        self.assertRaises(ValueError, job_state.loads, data, DATASTORE_ARGS)
+
+
+class DatastoreJobStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = BlockingScheduler()
+        self.store = DatastoreSqlite({}, None)
+        self.addCleanup(self.store.engine.dispose)
+        self.store.start(self.scheduler, 'default')
+
+    def _make_job(self, job_id, trigger=None):
+        return make_job(self.scheduler, job_id, trigger=trigger,
+                        next_run_time=datetime.datetime.now(tz.tzutc()), pub_args=['arg1'],
+                        datastore_args=(self.store.get_class_path(), self.store.db_config,
+                                        self.store.table_names))
+
+    def _get_job_states(self):
+        rows = self.store.engine.execute(
+            select([self.store.jobs_t.c.id, self.store.jobs_t.c.job_state])).fetchall()
+        return dict((row.id, row.job_state) for row in rows)
+
+    def test_compact_and_pickled_jobs(self):
+        self.store.add_job(self._make_job('compact'))
+        self.store.add_job(self._make_job('interval', IntervalTrigger(minutes=5)))
+        self.store.compact_job_state = False
+        self.store.add_job(self._make_job('pickled'))
+
+        states = self._get_job_states()
+        self.assertTrue(job_state.is_compact(states['compact']))
+        self.assertFalse(job_state.is_compact(states['interval']))
+        self.assertFalse(job_state.is_compact(states['pickled']))
+
+        jobs = self.store.lookup_jobs(['compact', 'interval', 'pickled'])
+        self.assertEqual(len(jobs), 3)
+        self.assertEqual(jobs['compact'].args[2:], jobs['pickled'].args[2:])
+        self.assertEqual(jobs['compact']._jobstore_alias, 'default')
+
+    def test_migrate_job_states(self):
+        self.store.compact_job_state = False
+        self.store.add_jobs([self._make_job('job%d' % i) for i in range(5)] +
+                            [self._make_job('interval', IntervalTrigger(minutes=5))])
+        before = self.store.lookup_jobs(['job%d' % i for i in range(5)])
+
+        counts = self.store.migrate_job_states(2, dry_run=True)
+        self.assertEqual(counts, {'migrated': 5, 'compact': 0, 'skipped': 1})
+        self.assertFalse(any(job_state.is_compact(data)
+                             for data in self._get_job_states().values()))
+
+        self.assertEqual(self.store.migrate_job_states(2), counts)
+        states = self._get_job_states()
+        self.assertEqual(sorted(job_id for job_id, data in states.items()
+                                if job_state.is_compact(data)),
+                         ['job%d' % i for i in range(5)])
+        after = self.store.lookup_jobs(list(before))
+        for job_id, job in before.items():
+            self.assertEqual(after[job_id].args, job.args)
+            self.assertEqual(after[job_id].next_run_time, job.next_run_time)
+
+        self.assertEqual(self.store.migrate_job_states(2),
+                         {'migrated': 0, 'compact': 5, 'skipped': 1})
@@ -2,8 +2,6 @@
 
 import datetime
 
-import pytz
-
 from ndscheduler.corescheduler.datastore import base
 
 
@@ -24,6 +22,19 @@ class DatastoreSqlite(base.DatastoreBase):
         return 'sqlite:///' + file_path
 
     def get_time_isoformat_from_db(self, time_object):
-        date = datetime.datetime.strptime(time_object, '%Y-%m-%d %H:%M:%S.%f')
-        date = pytz.utc.localize(date)
-        return date.isoformat()
+        """Convert time object from database to iso 8601 format.
+        SQLite has no datetime type: rows hold the text SQLAlchemy stored, in UTC, e.g.,
+        '2015-12-19 01:20:23.843895'. It's turned into iso 8601 with string operations, which is
+        many times faster than parsing it into a datetime, for every time of every row.
+        :param object time_object: text of a datetime column, or a datetime if the query
+            converted it.
+        :return: iso8601 format string, e.g., '2015-12-19T01:20:23.843895+00:00'
+        :rtype: str
+        """
+        if isinstance(time_object, datetime.datetime):
+            return super(DatastoreSqlite, self).get_time_isoformat_from_db(time_object)
+        date, _, time = time_object.partition(' ')
+        # Like datetime.isoformat(), which leaves out zero microseconds.
+        if time.endswith('.000000'):
+            time = time[:-7]
+        return '%sT%s+00:00' % (date, time)
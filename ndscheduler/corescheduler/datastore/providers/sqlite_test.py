@@ -0,0 +1,32 @@
+"""Unit tests for DatastoreSqlite."""
+
+import datetime
+import unittest
+
+import pytz
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+
+
+class DatastoreSqliteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = DatastoreSqlite.get_instance()
+        self.store.start(BlockingScheduler(), None)
+
+    def test_get_time_isoformat_from_db(self):
+        for time_object in [datetime.datetime(2015, 12, 19, 1, 20, 23, 843895, pytz.utc),
+                            datetime.datetime(2015, 12, 19, 1, 20, 23, 0, pytz.utc),
+                            datetime.datetime(2015, 12, 19, 1, 20, 23, 5, pytz.utc)]:
+            eid = 'iso%d' % time_object.microsecond
+            self.store.add_execution(eid, '1', state=constants.EXECUTION_STATUS_SCHEDULED,
+                                     scheduled_time=time_object)
+            execution = self.store.get_execution(eid)
+            self.assertEqual(execution['scheduled_time'], time_object.isoformat())
+
+    def test_get_time_isoformat_from_datetime(self):
+        self.assertEqual(
+            self.store.get_time_isoformat_from_db(datetime.datetime(2015, 12, 19, 1, 20, 23)),
+            '2015-12-19T01:20:23+00:00')
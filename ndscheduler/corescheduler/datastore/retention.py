@@ -0,0 +1,257 @@
+"""Retention policies for executions and audit logs.
+
+Without them, the executions and audit logs tables grow forever. A background thread periodically
+deletes rows that fall out of the retention policies, in small batches so that no single
+transaction locks the tables for long. Purged rows can be archived to gzipped JSON lines files
+before they're deleted.
+"""
+
+import datetime
+import gzip
+import json
+import logging
+import os
+import threading
+
+from sqlalchemy import and_, desc, not_, or_, select
+
+from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler import utils
+
+logger = logging.getLogger(__name__)
+
+EXECUTIONS = 'executions'
+AUDIT_LOGS = 'audit_logs'
+
+# States of executions that may still change.
+ACTIVE_EXECUTION_STATES = [constants.EXECUTION_STATUS_SCHEDULED,
+                           constants.EXECUTION_STATUS_RUNNING,
+                           constants.EXECUTION_STATUS_STOPPING]
+
+
+class RetentionPurger(object):
+
+    # Seconds to sleep between batches, so that other writers get the tables in between.
+    BATCH_PAUSE_SECONDS = 0.1
+
+    def __init__(self, datastore, execution_retention_days=None,
+                 execution_retention_days_by_state=None, execution_retention_per_job=None,
+                 audit_log_retention_days=None,
+                 batch_size=constants.DEFAULT_RETENTION_BATCH_SIZE,
+                 interval_sec=constants.DEFAULT_RETENTION_INTERVAL_SEC, archive_dir=None):
+        """
+        :param DatastoreBase datastore: datastore whose tables are purged.
+        :param float execution_retention_days: Executions scheduled more than this many days
+            ago are deleted, unless they're scheduled, running or stopping. None keeps them
+            regardless of age.
+        :param dict execution_retention_days_by_state: Overrides execution_retention_days for
+            executions in some states, e.g., {'succeeded': 7, 'failed': 90}. It's the only way to
+            purge scheduled, running or stopping executions, e.g., stuck ones.
+        :param int execution_retention_per_job: Max number of executions kept per job. Older
+            ones are deleted, unless they're scheduled, running or stopping. None keeps them
+            regardless of number.
+        :param float audit_log_retention_days: Audit logs created more than this many days ago
+            are deleted. None keeps them regardless of age.
+        :param int batch_size: Max number of rows deleted in one transaction.
+        :param float interval_sec: Seconds between two purges.
+        :param str archive_dir: If set, purged rows are appended to gzipped JSON lines files in
+            this directory before they're deleted, one file per table and purge.
+        :raises ValueError: if execution_retention_days_by_state has an unknown state.
+        """
+        self.datastore = datastore
+        self.execution_retention_days = execution_retention_days
+        self.execution_retention_per_job = execution_retention_per_job
+        self.audit_log_retention_days = audit_log_retention_days
+        self.batch_size = batch_size
+        self.interval_sec = interval_sec
+        self.archive_dir = archive_dir
+
+        states = dict((name, state) for state, name in constants.EXECUTION_STATUS_DICT.items())
+        self.execution_retention_days_by_state = {}
+        for name, days in (execution_retention_days_by_state or {}).items():
+            if name not in states:
+                raise ValueError('Unknown execution state: %s' % name)
+            self.execution_retention_days_by_state[states[name]] = days
+
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._progress = {
+            'running': False,
+            'policy': None,
+            'started_time': None,
+            'finished_time': None,
+            'purged': {EXECUTIONS: 0, AUDIT_LOGS: 0},
+            'total_purged': {EXECUTIONS: 0, AUDIT_LOGS: 0},
+            'error': None}
+        self._archive_suffix = None
+        self._thread = threading.Thread(target=self._run, name='ndscheduler-retention')
+        self._thread.daemon = True
+
+    def has_policies(self):
+        """Returns True if any retention policy is configured.
+        :rtype: bool
+        """
+        return bool(self.execution_retention_days is not None or
+                    self.execution_retention_days_by_state or
+                    self.execution_retention_per_job is not None or
+                    self.audit_log_retention_days is not None)
+
+    def start(self):
+        """Starts the background purger thread."""
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background purger thread after its current batch.
+        This is a BLOCKING operation.
+        """
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def get_progress(self):
+        """Returns the progress of the current purge, or of the last one if none is running.
+        :return: A dictionary, e.g.,
+            {
+                'running': True,
+                'policy': 'executions older than 30 days',
+                'started_time': '2015-12-21T18:20:05.604732+00:00',
+                'finished_time': None,
+                'purged': {'executions': 1500, 'audit_logs': 0},
+                'total_purged': {'executions': 81500, 'audit_logs': 1200},
+                'error': None
+            }
+            purged counts rows deleted by the current purge, total_purged since start.
+        :rtype: dict
+        """
+        with self._lock:
+            progress = dict(self._progress)
+            progress['purged'] = dict(progress['purged'])
+            progress['total_purged'] = dict(progress['total_purged'])
+            return progress
+
+    def _update_progress(self, **kwargs):
+        with self._lock:
+            self._progress.update(kwargs)
+
+    def _run(self):
+        """Main loop of the purger thread."""
+        while not self._stop_event.is_set():
+            self.purge()
+            self._stop_event.wait(self.interval_sec)
+
+    def purge(self):
+        """Deletes everything that falls out of the retention policies.
+        This is a BLOCKING operation.
+        """
+        now = utils.get_current_datetime()
+        self._archive_suffix = now.strftime('%Y%m%dT%H%M%S')
+        with self._lock:
+            self._progress.update(running=True, started_time=now.isoformat(),
+                                  finished_time=None, error=None)
+            self._progress['purged'] = {EXECUTIONS: 0, AUDIT_LOGS: 0}
+
+        try:
+            for policy, table_name, purge_batch in self._get_policies(now):
+                self._update_progress(policy=policy)
+                while not self._stop_event.is_set():
+                    count = purge_batch(self.batch_size, self._get_archive(table_name))
+                    if not count:
+                        break
+                    with self._lock:
+                        self._progress['purged'][table_name] += count
+                        self._progress['total_purged'][table_name] += count
+                    self._stop_event.wait(self.BATCH_PAUSE_SECONDS)
+        except Exception as e:
+            logger.exception('Failed to purge old executions and audit logs')
+            self._update_progress(error=str(e))
+
+        progress = self.get_progress()
+        logger.info('Purged %d executions and %d audit logs' % (
+            progress['purged'][EXECUTIONS], progress['purged'][AUDIT_LOGS]))
+        self._update_progress(running=False, policy=None,
+                              finished_time=utils.get_current_datetime().isoformat())
+
+    def _get_policies(self, now):
+        """Yields the purge batches to run until they delete nothing.
+        Per job cutoffs are only looked up when their turn comes, so they're up to date.
+        :param datetime now: the current (timezone aware) datetime.
+        :return: Generator of (policy description, table name, function to purge a batch) tuples.
+            The function takes a batch size and an archive function, and returns the number of
+            deleted rows.
+        """
+        table = self.datastore.executions_table
+        # Executions that didn't end yet are only purged by a policy for their state.
+        not_active = not_(table.c.state.in_(ACTIVE_EXECUTION_STATES))
+
+        by_state = self.execution_retention_days_by_state
+        for state, days in sorted(by_state.items()):
+            clause = and_(table.c.state == state,
+                          table.c.scheduled_time < now - datetime.timedelta(days=days))
+            yield ('%s executions older than %s days' % (
+                constants.EXECUTION_STATUS_DICT[state], days), EXECUTIONS,
+                self._purge_executions(clause))
+
+        if self.execution_retention_days is not None:
+            days = self.execution_retention_days
+            clause = and_(table.c.scheduled_time < now - datetime.timedelta(days=days),
+                          not_active)
+            if by_state:
+                clause = and_(clause, not_(table.c.state.in_(list(by_state))))
+            yield ('executions older than %s days' % days, EXECUTIONS,
+                   self._purge_executions(clause))
+
+        if self.execution_retention_per_job is not None:
+            job_ids = select([table.c.job_id]).distinct()
+            for row in self.datastore.engine.execute(job_ids).fetchall():
+                clause = self._get_job_cutoff_clause(row.job_id)
+                if clause is not None:
+                    clause = and_(clause, not_active)
+                    yield ('executions beyond the last %d of job %s' % (
+                        self.execution_retention_per_job, row.job_id), EXECUTIONS,
+                        self._purge_executions(clause))
+
+        if self.audit_log_retention_days is not None:
+            days = self.audit_log_retention_days
+            before = now - datetime.timedelta(days=days)
+            yield ('audit logs older than %s days' % days, AUDIT_LOGS,
+                   lambda batch_size, archive: self.datastore.purge_audit_logs(
+                       before, batch_size, archive))
+
+    def _purge_executions(self, clause):
+        return lambda batch_size, archive: self.datastore.purge_executions(
+            clause, batch_size, archive)
+
+    def _get_job_cutoff_clause(self, job_id):
+        """Returns the condition matching executions of a job beyond the ones to keep.
+        :param str job_id: Job id
+        :return: SQLAlchemy condition, or None if the job doesn't have too many executions.
+        """
+        table = self.datastore.executions_table
+        selectable = select([table.c.scheduled_time, table.c.eid]).where(
+            table.c.job_id == job_id).order_by(
+                desc(table.c.scheduled_time), desc(table.c.eid)).offset(
+                    self.execution_retention_per_job).limit(1)
+        cutoff = self.datastore.engine.execute(selectable).first()
+        if not cutoff:
+            return None
+        return and_(table.c.job_id == job_id, or_(
+            table.c.scheduled_time < cutoff.scheduled_time,
+            and_(table.c.scheduled_time == cutoff.scheduled_time, table.c.eid <= cutoff.eid)))
+
+    def _get_archive(self, table_name):
+        """Returns a function appending rows to the archive file of a table for this purge.
+        :param str table_name: EXECUTIONS or AUDIT_LOGS.
+        :return: A function taking a list of dictionaries, or None if archiving is disabled.
+        """
+        if not self.archive_dir:
+            return None
+        path = os.path.join(self.archive_dir, '%s-%s.jsonl.gz' % (
+            table_name, self._archive_suffix))
+
+        def archive(rows):
+            # Appending adds a gzip member to the file, which gunzip reads as one stream. The
+            # file is closed, i.e., flushed, before the rows are deleted.
+            with gzip.open(path, 'at') as archive_file:
+                for row in rows:
+                    archive_file.write(json.dumps(row, default=str) + '\n')
+        return archive
@@ -0,0 +1,135 @@
+"""Unit tests for RetentionPurger."""
+
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler import utils
+from ndscheduler.corescheduler.datastore import retention
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+
+
+class RetentionPurgerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.store = DatastoreSqlite(
+            {'file_path': os.path.join(self.tmp_dir, 'datastore.db')}, None)
+        self.store.start(BlockingScheduler(), None)
+        self.addCleanup(self.store.engine.dispose)
+        self.now = utils.get_current_datetime()
+
+    def _add_execution(self, eid, job_id, state, days_ago):
+        self.store.add_execution(eid, job_id, state=state,
+                                 scheduled_time=self.now - datetime.timedelta(days=days_ago))
+
+    def _get_eids(self):
+        table = self.store.executions_table
+        return set(row.eid for row in self.store.engine.execute(table.select()))
+
+    def test_purge_by_age_and_state(self):
+        self._add_execution('old-succeeded', 'a', constants.EXECUTION_STATUS_SUCCEEDED, 10)
+        self._add_execution('new-succeeded', 'a', constants.EXECUTION_STATUS_SUCCEEDED, 1)
+        self._add_execution('old-failed', 'a', constants.EXECUTION_STATUS_FAILED, 10)
+        self._add_execution('older-failed', 'a', constants.EXECUTION_STATUS_FAILED, 100)
+        self._add_execution('old-running', 'a', constants.EXECUTION_STATUS_RUNNING, 40)
+        self._add_execution('new-running', 'a', constants.EXECUTION_STATUS_RUNNING, 20)
+
+        purger = retention.RetentionPurger(
+            self.store, execution_retention_days=30,
+            execution_retention_days_by_state={'succeeded': 7, 'failed': 90})
+        purger.purge()
+
+        # Executions that didn't end are kept.
+        self.assertEqual(self._get_eids(), {'new-succeeded', 'old-failed', 'old-running',
+                                            'new-running'})
+        progress = purger.get_progress()
+        self.assertFalse(progress['running'])
+        self.assertEqual(progress['purged'], {'executions': 2, 'audit_logs': 0})
+
+        # Unless their state has a policy.
+        purger = retention.RetentionPurger(
+            self.store, execution_retention_days_by_state={'running': 30})
+        purger.purge()
+        self.assertEqual(self._get_eids(), {'new-succeeded', 'old-failed', 'new-running'})
+        self.assertIsNone(progress['error'])
+
+    def test_purge_by_count_per_job(self):
+        for i in range(5):
+            self._add_execution('a%d' % i, 'a', constants.EXECUTION_STATUS_SUCCEEDED, i)
+        self._add_execution('b0', 'b', constants.EXECUTION_STATUS_SUCCEEDED, 50)
+        self._add_execution('a-scheduled', 'a', constants.EXECUTION_STATUS_SCHEDULED, 10)
+
+        purger = retention.RetentionPurger(self.store, execution_retention_per_job=2)
+        purger.purge()
+
+        self.assertEqual(self._get_eids(), {'a0', 'a1', 'b0', 'a-scheduled'})
+
+    def test_purge_in_batches(self):
+        for i in range(5):
+            self._add_execution('old%d' % i, 'a', constants.EXECUTION_STATUS_SUCCEEDED, 10)
+
+        purger = retention.RetentionPurger(self.store, execution_retention_days=1, batch_size=2)
+        with mock.patch.object(purger, 'BATCH_PAUSE_SECONDS', 0), \
+                mock.patch.object(self.store, 'purge_executions',
+                                  wraps=self.store.purge_executions) as mock_purge:
+            purger.purge()
+            purger.purge()
+
+        # 3 batches to delete 5 executions, and one finding nothing left, per purge
+        self.assertEqual(mock_purge.call_count, 5)
+        self.assertEqual(self._get_eids(), set())
+        self.assertEqual(purger.get_progress()['purged']['executions'], 0)
+        self.assertEqual(purger.get_progress()['total_purged']['executions'], 5)
+
+    def test_purge_audit_logs_with_archive(self):
+        old_time = self.now - datetime.timedelta(days=10)
+        for i in range(3):
+            self.store.add_audit_log('a', 'job a', constants.AUDIT_LOG_ADDED,
+                                     description='old%d' % i, created_time=old_time)
+        self.store.add_audit_log('a', 'job a', constants.AUDIT_LOG_MODIFIED, description='new')
+
+        archive_dir = os.path.join(self.tmp_dir, 'archive')
+        os.mkdir(archive_dir)
+        purger = retention.RetentionPurger(self.store, audit_log_retention_days=7, batch_size=2,
+                                           archive_dir=archive_dir)
+        with mock.patch.object(purger, 'BATCH_PAUSE_SECONDS', 0):
+            purger.purge()
+
+        table = self.store.auditlogs_table
+        self.assertEqual([row.description for row in self.store.engine.execute(table.select())],
+                         ['new'])
+        # Logs created at the same time are deleted in the same batch.
+        self.assertEqual(purger.get_progress()['purged']['audit_logs'], 3)
+
+        archive_files = os.listdir(archive_dir)
+        self.assertEqual(len(archive_files), 1)
+        self.assertTrue(archive_files[0].startswith('audit_logs-'))
+        with gzip.open(os.path.join(archive_dir, archive_files[0]), 'rt') as archive_file:
+            archived = [json.loads(line) for line in archive_file]
+        self.assertEqual(sorted(row['description'] for row in archived),
+                         ['old0', 'old1', 'old2'])
+
+    def test_failed_archive_keeps_rows(self):
+        self._add_execution('old', 'a', constants.EXECUTION_STATUS_SUCCEEDED, 10)
+
+        purger = retention.RetentionPurger(
+            self.store, execution_retention_days=1,
+            archive_dir=os.path.join(self.tmp_dir, 'does-not-exist'))
+        purger.purge()
+
+        self.assertEqual(self._get_eids(), {'old'})
+        self.assertTrue(purger.get_progress()['error'])
+
+    def test_unknown_state(self):
+        self.assertRaises(ValueError, retention.RetentionPurger, self.store,
+                          execution_retention_days_by_state={'done': 7})
@@ -1,6 +1,7 @@
 """Define database schemas."""
 
 import sqlalchemy
+from sqlalchemy.dialects import mysql
 
 from ndscheduler.corescheduler import utils
 
@@ -26,7 +27,25 @@ def get_execution_table(metadata, tablename):
         sqlalchemy.Column('description', sqlalchemy.Text, nullable=True),
         sqlalchemy.Column('result', sqlalchemy.Text, nullable=True),
         sqlalchemy.Column('job_id', sqlalchemy.Text, nullable=False),
-        sqlalchemy.Column('task_id', sqlalchemy.Text, nullable=True))
+        sqlalchemy.Column('task_id', sqlalchemy.Text, nullable=True),
+        # For filtering by time range
+        sqlalchemy.Index('ix_%s_scheduled_time' % tablename, 'scheduled_time'),
+        # For sorting and keyset pagination
+        sqlalchemy.Index('ix_%s_updated_time_eid' % tablename, 'updated_time', 'eid'),
+        # MySQL can only index a prefix of TEXT columns
+        sqlalchemy.Index('ix_%s_job_id' % tablename, 'job_id', mysql_length=191))
+
+
+def get_execution_results_table(metadata, tablename):
+    return sqlalchemy.Table(
+        tablename, metadata,
+        sqlalchemy.Column('eid', sqlalchemy.Unicode(191, _warn_on_bytestring=False),
+                          primary_key=True),
+        # zlib compressed, utf-8 encoded result. BLOB only holds 64KB on MySQL.
+        sqlalchemy.Column('result', sqlalchemy.LargeBinary().with_variant(mysql.LONGBLOB, 'mysql'),
+                          nullable=False),
+        # Size of the uncompressed result in bytes
+        sqlalchemy.Column('size', sqlalchemy.Integer, nullable=False))
 
 
 def get_auditlogs_table(metadata, tablename):
@@ -38,4 +57,29 @@ def get_auditlogs_table(metadata, tablename):
         sqlalchemy.Column('user', sqlalchemy.Text, nullable=True),
         sqlalchemy.Column('created_time', sqlalchemy.DateTime(timezone=True), nullable=False,
                           default=utils.get_current_datetime),
-        sqlalchemy.Column('description', sqlalchemy.Text, nullable=True))
+        sqlalchemy.Column('description', sqlalchemy.Text, nullable=True),
+        sqlalchemy.Index('ix_%s_created_time' % tablename, 'created_time'),
+        sqlalchemy.Index('ix_%s_job_id' % tablename, 'job_id', mysql_length=191))
+
+
+def get_leases_table(metadata, tablename):
+    # token has to come before holder: SQLAlchemy orders the SET clause of an UPDATE by columns,
+    # and MySQL evaluates assignments left to right, so DatastoreBase.acquire_lease() has to
+    # compute the new token while holder still has its old value.
+    return sqlalchemy.Table(
+        tablename, metadata,
+        sqlalchemy.Column('name', sqlalchemy.Unicode(191, _warn_on_bytestring=False),
+                          primary_key=True),
+        sqlalchemy.Column('token', sqlalchemy.Integer, nullable=False),
+        sqlalchemy.Column('holder', sqlalchemy.Text, nullable=False),
+        # Unix timestamp, like next_run_time of the jobs table.
+        sqlalchemy.Column('expires_at', sqlalchemy.Float(25), nullable=False))
+
+
+def get_nodes_table(metadata, tablename):
+    return sqlalchemy.Table(
+        tablename, metadata,
+        sqlalchemy.Column('node_id', sqlalchemy.Unicode(191, _warn_on_bytestring=False),
+                          primary_key=True),
+        # Unix timestamp of the last heartbeat
+        sqlalchemy.Column('heartbeat_at', sqlalchemy.Float(25), nullable=False))
@@ -0,0 +1,38 @@
+"""Helpers shared by the unit tests of the datastore and the code built on it."""
+
+from apscheduler.job import Job
+from apscheduler.triggers.cron import CronTrigger
+
+from ndscheduler.corescheduler.core.base import BaseScheduler
+
+
+def make_job(scheduler, job_id, name=None, trigger=None, next_run_time=None, pub_args=(),
+             datastore_args=(None, None, None), job_class_string='hello.world', **kwargs):
+    """Returns a job running a job class every 5 minutes, for tests.
+    :param BaseScheduler scheduler: scheduler the job belongs to.
+    :param str job_id: Job id
+    :param str name: Job name. Defaults to the job id.
+    :param BaseTrigger trigger: Defaults to every 5 minutes.
+    :param datetime next_run_time: Defaults to None, i.e., paused.
+    :param list pub_args: Arguments passed to the job class.
+    :param tuple datastore_args: Datastore class path, config and table names passed to
+        BaseScheduler.run_job().
+    :param str job_class_string: Import path of the job class.
+    :param kwargs: Any other attribute of apscheduler.job.Job to override.
+    :rtype: Job
+    """
+    attributes = {
+        'id': job_id,
+        'name': job_id if name is None else name,
+        'func': BaseScheduler.run_job,
+        'trigger': trigger or CronTrigger(minute='*/5'),
+        'executor': 'default',
+        'args': (job_class_string, job_id) + tuple(datastore_args) + tuple(pub_args),
+        'kwargs': {},
+        'misfire_grace_time': 1,
+        'coalesce': True,
+        'max_instances': 1,
+        'next_run_time': next_run_time,
+    }
+    attributes.update(kwargs)
+    return Job(scheduler, **attributes)
@@ -0,0 +1,164 @@
+"""Write-behind queue for execution states.
+
+Instead of blocking a worker thread on the database for every state change of an execution,
+inserts and updates are queued in memory and written by a background thread in batches.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from sqlalchemy import bindparam
+
+logger = logging.getLogger(__name__)
+
+INSERT = 'insert'
+UPDATE = 'update'
+
+# A batch that fails to write is retried this many times, waiting RETRY_BACKOFF_SEC, then twice as
+# long, and so on, e.g., while the database fails over.
+WRITE_RETRIES = 3
+RETRY_BACKOFF_SEC = 0.5
+
+
+class ExecutionWriteBehindQueue(object):
+
+    def __init__(self, datastore, batch_size, flush_interval_sec):
+        """
+        :param DatastoreBase datastore: datastore whose executions table is written.
+        :param int batch_size: Number of queued writes that triggers a flush right away.
+        :param float flush_interval_sec: Max number of seconds a write stays in the queue.
+        """
+        self.datastore = datastore
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self._condition = threading.Condition()
+        self._pending = []
+        self._stopped = False
+        # Number of writes queued, and written (or dropped), so far. See flush().
+        self._queued_count = 0
+        self._written_count = 0
+        self._flush_requested = False
+        self._thread = threading.Thread(target=self._run, name='ndscheduler-write-behind')
+        self._thread.daemon = True
+
+    def start(self):
+        """Starts the background flusher thread."""
+        self._thread.start()
+
+    def stop(self):
+        """Flushes everything still queued and stops the flusher thread.
+        This is a BLOCKING operation.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def flush(self):
+        """Waits until every write queued so far is written, flushing them right away.
+        This is a BLOCKING operation.
+        """
+        with self._condition:
+            queued_count = self._queued_count
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._written_count < queued_count and self._thread.is_alive():
+                self._condition.wait(self.flush_interval_sec)
+
+    def put(self, operation, execution_id, values):
+        """Queues a write.
+        :param str operation: INSERT or UPDATE.
+        :param str execution_id: Execution id.
+        :param dict values: Column values to write.
+        """
+        with self._condition:
+            self._pending.append((operation, execution_id, values))
+            self._queued_count += 1
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify_all()
+
+    def _run(self):
+        """Main loop of the flusher thread.
+        It's the only thread writing batches, so batches are written in the order they're queued.
+        """
+        while True:
+            with self._condition:
+                if (not self._stopped and not self._flush_requested and
+                        len(self._pending) < self.batch_size):
+                    self._condition.wait(self.flush_interval_sec)
+                batch, self._pending = self._pending, []
+                self._flush_requested = False
+                stopped = self._stopped
+            if batch:
+                self._flush(batch)
+                with self._condition:
+                    self._written_count += len(batch)
+                    self._condition.notify_all()
+            if stopped:
+                return
+
+    def _flush(self, batch):
+        """Writes a batch, retrying with backoff.
+        If it still fails, e.g., because of a row the database rejects, the writes of each
+        execution are tried on their own, so that only the executions that fail are dropped.
+        :param list batch: A list of (operation, execution_id, values) tuples.
+        """
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                self.write(batch)
+                return
+            except Exception:
+                if attempt == WRITE_RETRIES:
+                    logger.exception('Failed to write %d execution changes, writing them one '
+                                     'execution at a time.' % len(batch))
+                else:
+                    logger.warning('Failed to write %d execution changes, retrying.' %
+                                   len(batch), exc_info=True)
+                    time.sleep(RETRY_BACKOFF_SEC * 2 ** attempt)
+
+        per_execution = collections.OrderedDict()
+        for write in batch:
+            per_execution.setdefault(write[1], []).append(write)
+        for execution_id, writes in per_execution.items():
+            try:
+                self.write(writes)
+            except Exception:
+                logger.exception('Dropped %d changes of execution %s.' %
+                                 (len(writes), execution_id))
+
+    def write(self, batch):
+        """Writes a batch of queued writes in one transaction.
+        Writes to the same execution are merged first, e.g., an insert followed by updates
+        becomes a single insert of the final state. Then inserts, and updates, that set the same
+        columns are sent as multi-row statements.
+        :param list batch: A list of (operation, execution_id, values) tuples.
+        """
+        merged = collections.OrderedDict()
+        for operation, execution_id, values in batch:
+            if execution_id in merged:
+                merged[execution_id][1].update(values)
+            else:
+                merged[execution_id] = (operation, dict(values))
+
+        inserts = collections.OrderedDict()
+        updates = collections.OrderedDict()
+        for execution_id, (operation, values) in merged.items():
+            columns = tuple(sorted(values))
+            if operation == INSERT:
+                inserts.setdefault(columns, []).append(values)
+            else:
+                # Bind parameters can't be named after the columns they set.
+                params = dict(('_' + column, value) for column, value in values.items())
+                params['_eid'] = execution_id
+                updates.setdefault(columns, []).append(params)
+
+        table = self.datastore.executions_table
+        with self.datastore.engine.begin() as connection:
+            for rows in inserts.values():
+                connection.execute(table.insert(), rows)
+            for columns, rows in updates.items():
+                update = table.update().where(table.c.eid == bindparam('_eid')).values(
+                    dict((column, bindparam('_' + column)) for column in columns))
+                connection.execute(update, rows)
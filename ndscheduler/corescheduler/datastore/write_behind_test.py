@@ -0,0 +1,142 @@
+"""Unit tests for ExecutionWriteBehindQueue."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import mock
+import sqlalchemy
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler.datastore import write_behind
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+
+
+class ExecutionWriteBehindQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        # Writes happen on the flusher thread, which wouldn't see a thread-local in-memory db.
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.store = DatastoreSqlite({'file_path': os.path.join(tmp_dir, 'datastore.db')}, None)
+        self.store.start(BlockingScheduler(), None)
+        self.addCleanup(self.store.engine.dispose)
+        # Large batch size and interval, so that nothing is written until the queue is stopped.
+        self.store.enable_write_behind(1000, 3600)
+        self.addCleanup(self.store.disable_write_behind)
+
+        self.statements = []
+        sqlalchemy.event.listen(self.store.engine, 'before_cursor_execute',
+                                self._before_cursor_execute)
+        self.addCleanup(sqlalchemy.event.remove, self.store.engine, 'before_cursor_execute',
+                        self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_writes_are_queued(self):
+        self.store.add_execution('wb1', '34', state=constants.EXECUTION_STATUS_RUNNING)
+        self.store.update_execution('wb1', state=constants.EXECUTION_STATUS_SUCCEEDED)
+        self.assertEqual(self.statements, [])
+
+        self.store.disable_write_behind()
+        execution = self.store.get_execution('wb1')
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_SUCCEEDED])
+
+    def test_writes_are_merged_and_batched(self):
+        for i in range(10):
+            eid = 'wb-batch%d' % i
+            self.store.add_execution(eid, '34', state=constants.EXECUTION_STATUS_RUNNING,
+                                     hostname='host')
+            self.store.update_execution(eid, state=constants.EXECUTION_STATUS_SUCCEEDED,
+                                        result='"ok"')
+        self.store.disable_write_behind()
+
+        # All 20 changes end up as one multi-row insert.
+        writes = [statement for statement in self.statements
+                  if statement.startswith('INSERT') or statement.startswith('UPDATE')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+
+        execution = self.store.get_execution('wb-batch7')
+        self.assertEqual(execution['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_SUCCEEDED])
+        self.assertEqual(execution['hostname'], 'host')
+        self.assertEqual(execution['result'], '"ok"')
+
+    def test_updates_of_flushed_executions(self):
+        self.store.add_execution('wb-old1', '34', state=constants.EXECUTION_STATUS_RUNNING)
+        self.store.add_execution('wb-old2', '34', state=constants.EXECUTION_STATUS_RUNNING)
+        self.store.disable_write_behind()
+
+        self.store.enable_write_behind(1000, 3600)
+        self.store.update_execution('wb-old1', state=constants.EXECUTION_STATUS_FAILED,
+                                    result='trace')
+        self.store.update_execution('wb-old2', state=constants.EXECUTION_STATUS_FAILED,
+                                    result='trace')
+        self.store.update_execution('wb-old2', state=constants.EXECUTION_STATUS_SUCCEEDED,
+                                    result='"ok"')
+        self.statements = []
+        self.store.disable_write_behind()
+
+        updates = [statement for statement in self.statements if statement.startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.store.get_execution('wb-old1')['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_FAILED])
+        self.assertEqual(self.store.get_execution('wb-old2')['result'], '"ok"')
+
+    def test_flush_on_batch_size(self):
+        self.store.disable_write_behind()
+        self.store.enable_write_behind(2, 3600)
+        self.store.add_execution('wb-size1', '34', state=constants.EXECUTION_STATUS_RUNNING)
+        self.store.add_execution('wb-size2', '34', state=constants.EXECUTION_STATUS_RUNNING)
+
+        # Wait for the flusher thread without stopping it.
+        for _ in range(500):
+            if self.store.get_execution('wb-size2'):
+                break
+            time.sleep(0.01)
+        self.assertTrue(self.store.get_execution('wb-size1'))
+        self.assertTrue(self.store.get_execution('wb-size2'))
+
+    def test_flush(self):
+        self.store.add_execution('wb-flush', '34', state=constants.EXECUTION_STATUS_RUNNING)
+        self.store.flush_execution_writes()
+        self.assertTrue(self.store.get_execution('wb-flush'))
+
+        # The queue keeps going after a flush, and flushing an empty queue doesn't wait.
+        self.store.update_execution('wb-flush', state=constants.EXECUTION_STATUS_SUCCEEDED)
+        self.store.flush_execution_writes()
+        self.store.flush_execution_writes()
+        self.assertEqual(self.store.get_execution_state('wb-flush'),
+                         constants.EXECUTION_STATUS_SUCCEEDED)
+
+    def test_failed_write_only_drops_bad_rows(self):
+        self.store.disable_write_behind()
+        self.store.add_execution('wb-dup', '34', state=constants.EXECUTION_STATUS_RUNNING)
+
+        self.store.enable_write_behind(1000, 3600)
+        self.store.add_execution('wb-good1', '34', state=constants.EXECUTION_STATUS_RUNNING)
+        # Already in the table, so the batch fails to insert.
+        self.store.add_execution('wb-dup', '34', state=constants.EXECUTION_STATUS_SUCCEEDED)
+        self.store.add_execution('wb-good2', '34', state=constants.EXECUTION_STATUS_RUNNING)
+        with mock.patch.object(write_behind, 'RETRY_BACKOFF_SEC', 0):
+            self.store.disable_write_behind()
+
+        self.assertTrue(self.store.get_execution('wb-good1'))
+        self.assertTrue(self.store.get_execution('wb-good2'))
+        self.assertEqual(self.store.get_execution('wb-dup')['state'],
+                         constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_RUNNING])
+
+    def test_failed_write_is_retried(self):
+        queue = self.store.write_behind_queue
+        queue.write = mock.Mock(side_effect=[sqlalchemy.exc.OperationalError('', {}, None),
+                                             queue.write])
+        self.store.add_execution('wb-retry', '34', state=constants.EXECUTION_STATUS_RUNNING)
+        with mock.patch.object(write_behind, 'RETRY_BACKOFF_SEC', 0):
+            self.store.disable_write_behind()
+        self.assertEqual(queue.write.call_count, 2)
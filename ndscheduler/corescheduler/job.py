@@ -47,6 +47,18 @@ class JobBase:
         pid = os.getpid()
         return 'hostname: %s | pid: %s' % (hostname, pid)
 
+    @classmethod
+    def get_timeout_description(cls):
+        hostname = socket.gethostname()
+        pid = os.getpid()
+        return 'hostname: %s | pid: %s' % (hostname, pid)
+
+    @classmethod
+    def get_stopped_description(cls):
+        hostname = socket.gethostname()
+        pid = os.getpid()
+        return 'hostname: %s | pid: %s' % (hostname, pid)
+
     @classmethod
     def get_scheduled_error_result(cls):
         return utils.get_stacktrace()
@@ -55,6 +67,14 @@ class JobBase:
     def get_failed_result(cls):
         return utils.get_stacktrace()
 
+    @classmethod
+    def get_timeout_result(cls, timeout):
+        return 'Killed after running for more than %s seconds' % timeout
+
+    @classmethod
+    def get_stopped_result(cls):
+        return 'Killed on request'
+
     @classmethod
     def meta_info(cls):
         """Returns meta info for this job class.
@@ -70,6 +90,12 @@ class JobBase:
                 'notes': 'need to specify environment variable API_KEY first'
             }
         The arguments property should be consistent with the run() method.
+        Optionally, 'executor' picks the kind of pool that runs this job, 'thread' or 'process',
+        e.g., 'process' for CPU bound jobs. A job running in a process pool has to be picklable,
+        i.e., its arguments and module level things it uses.
+        Optionally, 'timeout_sec' is the number of seconds after which a run of this job is
+        killed. A job with a timeout runs in a child process of the worker, and can also be
+        stopped through the API.
         This info will be used in web ui for explaining what kind of arguments is needed for a job.
         You should override this function if you want to make your scheduler web ui informative :)
         :return: meta info for this job class.
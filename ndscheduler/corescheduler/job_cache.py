@@ -0,0 +1,136 @@
+"""In-memory cache of the job listing served by GET /api/v1/jobs.
+
+Loading all jobs from the jobstore unpickles every one of them, which takes seconds with tens of
+thousands of jobs. Instead, the cache loads them once, then only reloads the jobs that apscheduler
+reports as changed, plus the ones whose next run time has passed, since apscheduler moves the next
+run time of a job after running it without a modified event.
+"""
+
+import json
+import threading
+import time
+
+from apscheduler import events
+
+from ndscheduler.corescheduler import utils
+
+# Events after which a job has to be reloaded.
+JOB_EVENTS = (events.EVENT_JOB_ADDED | events.EVENT_JOB_MODIFIED | events.EVENT_JOB_REMOVED |
+              events.EVENT_JOB_EXECUTED | events.EVENT_JOB_ERROR | events.EVENT_JOB_MISSED |
+              events.EVENT_JOB_MAX_INSTANCES | events.EVENT_ALL_JOBS_REMOVED)
+
+
+class JobCache(object):
+
+    def __init__(self, datastore, max_age_sec):
+        """
+        :param DatastoreBase datastore: datastore to load jobs from.
+        :param float max_age_sec: Seconds after which all jobs are reloaded, to pick up changes
+            made by other scheduler processes. None never reloads them.
+        """
+        self.datastore = datastore
+        self.max_age_sec = max_age_sec
+        # Protects _changed_job_ids and _reload, which scheduler threads update.
+        self._lock = threading.Lock()
+        # Only one thread refreshes the cache at a time.
+        self._refresh_lock = threading.Lock()
+        self._changed_job_ids = set()
+        self._reload = True
+        self._loaded_time = None
+        # job id -> (next run time, job dict)
+        self._jobs = {}
+        self._earliest_next_run_time = None
+        self._version = 0
+        self._etag_prefix = utils.generate_uuid()
+        self._listing = None
+
+    def on_job_event(self, event):
+        """Listener for apscheduler job events. Marks the job as changed.
+        :param JobEvent event: apscheduler event.
+        """
+        with self._lock:
+            if event.code == events.EVENT_ALL_JOBS_REMOVED:
+                self._reload = True
+            else:
+                self._changed_job_ids.add(event.job_id)
+
+    def get_listing(self):
+        """Returns all jobs, serialized, sorted by next run time. Paused jobs are last.
+        This is a BLOCKING operation if jobs changed since the last call; otherwise, it doesn't
+        touch the database.
+        :return: a tuple of (etag, json string of {'jobs': [...]}). The etag changes whenever
+            the listing does.
+        :rtype: tuple
+        """
+        with self._refresh_lock:
+            self._refresh()
+            if not self._listing:
+                listing = sorted(self._jobs.values(),
+                                 key=lambda entry: (entry[0] is None, entry[0] or 0))
+                self._listing = ('"%s-%d"' % (self._etag_prefix, self._version),
+                                 json.dumps({'jobs': [job_dict for _, job_dict in listing]}))
+            return self._listing
+
+    def _refresh(self):
+        """Reloads all jobs, or the changed ones."""
+        now = time.time()
+        with self._lock:
+            reload_all = self._reload or (self.max_age_sec is not None and
+                                          now - self._loaded_time >= self.max_age_sec)
+            self._reload = False
+            job_ids = self._changed_job_ids
+            self._changed_job_ids = set()
+
+        try:
+            self._load(reload_all, job_ids)
+        except Exception:
+            # Try again next time, along with the jobs that changed in the meantime.
+            with self._lock:
+                self._reload = self._reload or reload_all
+                self._changed_job_ids.update(job_ids)
+            raise
+        if reload_all:
+            self._loaded_time = now
+
+    def _load(self, reload_all, job_ids):
+        """Reloads jobs from the datastore.
+        :param bool reload_all: True to reload all jobs.
+        :param set job_ids: ids of the jobs to reload otherwise. Jobs that were due are added.
+        """
+        if reload_all:
+            jobs = dict((job.id, self._get_entry(job)) for job in self.datastore.get_all_jobs())
+            if jobs != self._jobs:
+                self._jobs = jobs
+                self._changed()
+            return
+
+        # Jobs that were due have likely run, and have a new next run time by now.
+        current_time = utils.get_current_datetime()
+        if (self._earliest_next_run_time is not None and
+                self._earliest_next_run_time <= current_time):
+            job_ids.update(job_id for job_id, (next_run_time, _) in self._jobs.items()
+                           if next_run_time is not None and next_run_time <= current_time)
+        if not job_ids:
+            return
+
+        changed = False
+        jobs = self.datastore.lookup_jobs(job_ids)
+        for job_id in job_ids:
+            entry = self._get_entry(jobs[job_id]) if job_id in jobs else None
+            if entry != self._jobs.get(job_id):
+                changed = True
+                if entry:
+                    self._jobs[job_id] = entry
+                else:
+                    del self._jobs[job_id]
+        if changed:
+            self._changed()
+
+    def _get_entry(self, job):
+        return job.next_run_time, utils.get_job_dict(job)
+
+    def _changed(self):
+        self._version += 1
+        self._listing = None
+        next_run_times = [entry[0] for entry in self._jobs.values() if entry[0] is not None]
+        self._earliest_next_run_time = min(next_run_times) if next_run_times else None
@@ -0,0 +1,105 @@
+"""Unit tests for JobCache."""
+
+import datetime
+import json
+import unittest
+
+import mock
+from apscheduler import events
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from ndscheduler.corescheduler import utils
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.corescheduler.datastore.testing import make_job
+from ndscheduler.corescheduler.job_cache import JobCache
+
+
+class JobCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fake_scheduler = BlockingScheduler()
+        self.store = DatastoreSqlite({}, None)
+        self.store.start(self.fake_scheduler, None)
+        self.addCleanup(self.store.engine.dispose)
+        self.cache = JobCache(self.store, None)
+
+    def _make_job(self, job_id, name, next_run_time):
+        return make_job(self.fake_scheduler, job_id, name, next_run_time=next_run_time)
+
+    def _get_jobs(self):
+        etag, body = self.cache.get_listing()
+        return etag, json.loads(body)['jobs']
+
+    def test_only_changed_jobs_are_reloaded(self):
+        later = utils.get_current_datetime() + datetime.timedelta(hours=1)
+        self.store.add_job(self._make_job('a', 'job a', later))
+        self.store.add_job(self._make_job('b', 'job b', later + datetime.timedelta(minutes=1)))
+        self.store.add_job(self._make_job('paused', 'paused job', None))
+        etag, jobs = self._get_jobs()
+        self.assertEqual([job['job_id'] for job in jobs], ['a', 'b', 'paused'])
+
+        with mock.patch.object(self.store, 'get_all_jobs') as mock_get_all_jobs, \
+                mock.patch.object(self.store, 'lookup_jobs') as mock_lookup_jobs:
+            self.assertEqual(self._get_jobs(), (etag, jobs))
+            self.assertFalse(mock_get_all_jobs.called)
+            self.assertFalse(mock_lookup_jobs.called)
+
+        self.store.update_job(self._make_job('a', 'renamed job a', later))
+        self.store.remove_job('b')
+        self.cache.on_job_event(events.JobEvent(events.EVENT_JOB_MODIFIED, 'a', 'default'))
+        self.cache.on_job_event(events.JobEvent(events.EVENT_JOB_REMOVED, 'b', 'default'))
+        with mock.patch.object(self.store, 'get_all_jobs') as mock_get_all_jobs, \
+                mock.patch.object(self.store, 'lookup_jobs',
+                                  wraps=self.store.lookup_jobs) as mock_lookup_jobs:
+            new_etag, jobs = self._get_jobs()
+            self.assertFalse(mock_get_all_jobs.called)
+            mock_lookup_jobs.assert_called_once_with({'a', 'b'})
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual([job['name'] for job in jobs], ['renamed job a', 'paused job'])
+
+    def test_due_jobs_are_reloaded(self):
+        now = utils.get_current_datetime()
+        self.store.add_job(self._make_job('due', 'due job', now - datetime.timedelta(seconds=1)))
+        self.store.add_job(self._make_job('later', 'job', now + datetime.timedelta(hours=1)))
+        etag, _ = self._get_jobs()
+
+        # apscheduler moves the next run time after running a job without a modified event.
+        self.store.update_job(self._make_job('due', 'due job', now + datetime.timedelta(hours=2)))
+        with mock.patch.object(self.store, 'lookup_jobs',
+                               wraps=self.store.lookup_jobs) as mock_lookup_jobs:
+            new_etag, jobs = self._get_jobs()
+            mock_lookup_jobs.assert_called_once_with({'due'})
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual([job['job_id'] for job in jobs], ['later', 'due'])
+
+    def test_reload_all_jobs(self):
+        self.store.add_job(self._make_job('a', 'job a', None))
+        etag, _ = self._get_jobs()
+        self.store.remove_all_jobs()
+
+        self.cache.on_job_event(events.SchedulerEvent(events.EVENT_ALL_JOBS_REMOVED))
+        new_etag, jobs = self._get_jobs()
+        self.assertEqual(jobs, [])
+        self.assertNotEqual(new_etag, etag)
+
+    def test_max_age(self):
+        self.cache.max_age_sec = 0
+        self.store.add_job(self._make_job('a', 'job a', None))
+        etag, _ = self._get_jobs()
+        self.assertEqual(self._get_jobs()[0], etag)
+
+        # Added by another scheduler process, so without event.
+        self.store.add_job(self._make_job('b', 'job b', None))
+        self.assertEqual(len(self._get_jobs()[1]), 2)
+
+    def test_failed_load_is_retried(self):
+        with mock.patch.object(self.store, 'get_all_jobs', side_effect=RuntimeError):
+            self.assertRaises(RuntimeError, self._get_jobs)
+        self.store.add_job(self._make_job('a', 'job a', None))
+        self.assertEqual(len(self._get_jobs()[1]), 1)
+
+        self.store.add_job(self._make_job('b', 'job b', None))
+        self.cache.on_job_event(events.JobEvent(events.EVENT_JOB_ADDED, 'b', 'default'))
+        with mock.patch.object(self.store, 'lookup_jobs', side_effect=RuntimeError):
+            self.assertRaises(RuntimeError, self._get_jobs)
+        self.assertEqual(len(self._get_jobs()[1]), 2)
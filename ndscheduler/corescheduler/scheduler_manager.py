@@ -4,7 +4,11 @@
 from apscheduler.executors import pool
 
 from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler import job_cache
 from ndscheduler.corescheduler import utils
+from ndscheduler.corescheduler.core import leader
+from ndscheduler.corescheduler.core import sharded
+from ndscheduler.corescheduler.datastore import retention
 
 
 class SchedulerManager:
@@ -17,47 +21,202 @@ class SchedulerManager:
                  job_misfire_grace_sec=constants.DEFAULT_JOB_MISFIRE_GRACE_SEC,
                  job_max_instances=constants.DEFAULT_JOB_MAX_INSTANCES,
                  thread_pool_size=constants.DEFAULT_THREAD_POOL_SIZE,
-                 timezone=constants.DEFAULT_TIMEZONE):
+                 process_pool_size=constants.DEFAULT_PROCESS_POOL_SIZE,
+                 executor_type=constants.DEFAULT_EXECUTOR_TYPE,
+                 executor_pools=None,
+                 job_class_reload_on_change=False,
+                 timezone=constants.DEFAULT_TIMEZONE,
+                 execution_write_behind=constants.DEFAULT_EXECUTION_WRITE_BEHIND,
+                 execution_write_batch_size=constants.DEFAULT_EXECUTION_WRITE_BATCH_SIZE,
+                 execution_write_flush_interval_sec=(
+                     constants.DEFAULT_EXECUTION_WRITE_FLUSH_INTERVAL_SEC),
+                 job_index=constants.DEFAULT_JOB_INDEX,
+                 compact_job_state=constants.DEFAULT_COMPACT_JOB_STATE,
+                 job_stagger_window_sec=None,
+                 execution_retention_days=None,
+                 execution_retention_days_by_state=None,
+                 execution_retention_per_job=None,
+                 audit_log_retention_days=None,
+                 retention_batch_size=constants.DEFAULT_RETENTION_BATCH_SIZE,
+                 retention_interval_sec=constants.DEFAULT_RETENTION_INTERVAL_SEC,
+                 retention_archive_dir=None,
+                 job_cache_max_age_sec=constants.DEFAULT_JOB_CACHE_MAX_AGE_SEC,
+                 execution_result_inline_max_bytes=(
+                     constants.DEFAULT_EXECUTION_RESULT_INLINE_MAX_BYTES),
+                 async_datastore=False):
         """
         :param str scheduler_class_path: string path for scheduler, e.g. 'mysched.FancyScheduler'
         :param str datastore_class_path: string path for datastore, e.g. 'datastore.SQLDatastore'
         :param dict db_config: dictionary containing values for db connection
         :param dict db_tablenames: dictionary containing the names for the jobs,
-        executions, or audit logs table, e.g. {
+        executions, audit logs, leases, nodes, or execution results table, e.g. {
             'executions_tablename': 'scheduler_executions',
             'jobs_tablename': 'scheduler_jobs',
-            'auditlogs_tablename': 'scheduler_auditlogs'
+            'auditlogs_tablename': 'scheduler_auditlogs',
+            'leases_tablename': 'scheduler_leases',
+            'nodes_tablename': 'scheduler_nodes',
+            'execution_results_tablename': 'scheduler_execution_result'
         }
         If any of these keys is not provided, the default table name is selected from constants.py
         :param bool job_coalesce: True by default
         :param int job_misfire_grace_sec: Integer number of seconds
         :param int job_max_instances: Int number of instances
         :param int thread_pool_size: Int thread pool size
+        :param int process_pool_size: Int process pool size
+        :param str executor_type: 'thread' or 'process', the kind of pool that runs jobs whose
+        class doesn't pick one
+        :param dict executor_pools: Named pools of workers, in addition to the pools of threads
+        and processes, e.g. {'http': {'type': 'thread', 'size': 20}}. 'type' defaults to
+        'thread'. A job runs in one of them if it's added with executor set to its name, or if
+        the 'executor' key of the meta_info() of its class names it
+        :param bool job_class_reload_on_change: If True, a job class whose module file changed
+        is reloaded before its next run. Meant for development. False by default
         :param str timezone: str timezone to schedule jobs in, e.g. 'UTC'
+        :param bool execution_write_behind: If True, execution state changes are queued and
+        written to the datastore in batches by a background thread. False by default
+        :param int execution_write_batch_size: Number of queued changes that triggers a write
+        :param float execution_write_flush_interval_sec: Max seconds a change stays queued
+        :param bool job_index: If True, jobs are kept in memory, and only read from the datastore
+        on start. Changes made by other scheduler processes aren't seen, so it can't be used with
+        schedulers sharing the datastore, e.g., LeaderScheduler or ShardedScheduler. False by
+        default
+        :param bool compact_job_state: If True, jobs are stored as compact JSON rather than
+        pickled, when they can be. True by default
+        :param int job_stagger_window_sec: If set, jobs added without a stagger window of their
+        own run up to this many seconds after their cron schedule, by an offset hashed from their
+        id, so that jobs sharing a schedule don't all run in the same second. None by default
+        :param float execution_retention_days: Executions scheduled more than this many days ago
+        are purged. None by default, i.e., kept forever
+        :param dict execution_retention_days_by_state: Overrides execution_retention_days for
+        some states, e.g., {'succeeded': 7, 'failed': 90}
+        :param int execution_retention_per_job: Max number of executions kept per job
+        :param float audit_log_retention_days: Audit logs created more than this many days ago
+        are purged
+        :param int retention_batch_size: Max number of rows purged in one transaction
+        :param float retention_interval_sec: Seconds between two purges
+        :param str retention_archive_dir: If set, purged rows are archived to gzipped JSON lines
+        files in this directory
+        :param float job_cache_max_age_sec: Seconds after which the job listing cache reloads all
+        jobs. None never reloads them
+        :param int execution_result_inline_max_bytes: Results larger than this many bytes are
+        stored compressed in the execution results table, and listings only return a preview of
+        them. None keeps all results in the executions table
+        :param bool async_datastore: If True, API handlers read executions and audit logs through
+        an asyncio datastore. Requires Python 3.6+ and an asyncio driver for the database.
+        :raises ValueError: if job_index is set for a scheduler class that shares the datastore
+        with other scheduler processes.
         """
+        scheduler_class = utils.import_from_path(scheduler_class_path)
+        if job_index and issubclass(scheduler_class,
+                                    (leader.LeaderScheduler, sharded.ShardedScheduler)):
+            raise ValueError('job_index can only be used with a single scheduler process, not '
+                             'with %s' % scheduler_class_path)
+
+        utils.set_import_reload_on_change(job_class_reload_on_change)
+
         datastore = utils.get_datastore_instance(datastore_class_path, db_config, db_tablenames)
+        datastore.result_inline_max_bytes = execution_result_inline_max_bytes
+        datastore.compact_job_state = compact_job_state
+        if execution_write_behind:
+            datastore.enable_write_behind(execution_write_batch_size,
+                                          execution_write_flush_interval_sec)
+        if job_index:
+            datastore.enable_job_index()
         job_stores = {
             'default': datastore
         }
 
+        self.async_datastore = None
+        if async_datastore:
+            # Python 3 only, so it's only imported if enabled.
+            from ndscheduler.corescheduler.datastore.async_datastore import AsyncDatastore
+            self.async_datastore = AsyncDatastore(datastore)
+
+        self.retention_purger = retention.RetentionPurger(
+            datastore, execution_retention_days, execution_retention_days_by_state,
+            execution_retention_per_job, audit_log_retention_days, retention_batch_size,
+            retention_interval_sec, retention_archive_dir)
+        if not self.retention_purger.has_policies():
+            self.retention_purger = None
+
         job_default = {
             'coalesce': job_coalesce,
             'misfire_grace_time': job_misfire_grace_sec,
             'max_instances': job_max_instances
         }
 
-        executors = {
-            'default': pool.ThreadPoolExecutor(thread_pool_size)
+        if executor_type not in constants.EXECUTOR_TYPES:
+            raise ValueError('Unknown executor type: %s' % executor_type)
+        pool_classes = {
+            constants.EXECUTOR_TYPE_THREAD: (pool.ThreadPoolExecutor, thread_pool_size),
+            constants.EXECUTOR_TYPE_PROCESS: (pool.ProcessPoolExecutor, process_pool_size)
         }
+        # The other kind of pool is available under its type name for job classes picking it.
+        # Pools start their workers lazily, so an unused one costs nothing.
+        self.executor_pools = {}
+        for pool_type, (pool_class, pool_size) in pool_classes.items():
+            alias = 'default' if pool_type == executor_type else pool_type
+            self.executor_pools[alias] = {'type': pool_type, 'size': pool_size}
+        for alias, pool_config in (executor_pools or {}).items():
+            if alias in self.executor_pools:
+                raise ValueError('Reserved executor pool name: %s' % alias)
+            pool_type = pool_config.get('type', constants.EXECUTOR_TYPE_THREAD)
+            if pool_type not in constants.EXECUTOR_TYPES:
+                raise ValueError('Unknown executor type: %s' % pool_type)
+            self.executor_pools[alias] = {'type': pool_type, 'size': int(pool_config['size'])}
+        executors = dict((alias, pool_classes[pool_info['type']][0](pool_info['size']))
+                         for alias, pool_info in self.executor_pools.items())
 
-        scheduler_class = utils.import_from_path(scheduler_class_path)
         self.sched = scheduler_class(datastore_class_path, jobstores=job_stores,
                                      executors=executors, job_defaults=job_default,
-                                     timezone=timezone)
+                                     timezone=timezone,
+                                     job_stagger_window_sec=job_stagger_window_sec)
+
+        self.job_cache = job_cache.JobCache(datastore, job_cache_max_age_sec)
+        self.sched.add_listener(self.job_cache.on_job_event, job_cache.JOB_EVENTS)
 
     def get_datastore(self):
         return self.sched._lookup_jobstore('default')
 
+    def get_async_datastore(self):
+        """Returns the asyncio datastore for executions and audit logs.
+        :return: An AsyncDatastore instance, or None if it isn't enabled.
+        :rtype: AsyncDatastore
+        """
+        return self.async_datastore
+
+    def get_executor_stats(self):
+        """Returns the utilization of each pool of workers.
+        :return: A dictionary mapping pool name to its stats, e.g.,
+            {
+                'default': {'type': 'thread', 'size': 4, 'running': 4, 'queued': 2,
+                            'utilization': 1.0},
+                'http': {'type': 'thread', 'size': 20, 'running': 5, 'queued': 0,
+                         'utilization': 0.25}
+            }
+            'running' counts runs taking up a worker, and 'queued' the ones waiting for one.
+        :rtype: dict
+        """
+        stats = {}
+        for alias, pool_info in self.executor_pools.items():
+            executor = self.sched._lookup_executor(alias)
+            with executor._lock:
+                submitted = sum(executor._instances.values())
+            running = min(submitted, pool_info['size'])
+            stats[alias] = dict(pool_info, running=running, queued=submitted - running,
+                                utilization=round(float(running) / pool_info['size'], 3))
+        return stats
+
+    def get_retention_progress(self):
+        """Returns the progress of purging executions and audit logs.
+        :return: A dictionary as returned by RetentionPurger.get_progress(), or None if no
+            retention policy is configured.
+        :rtype: dict
+        """
+        if not self.retention_purger:
+            return None
+        return self.retention_purger.get_progress()
+
     #
     # Manage the entire scheduler
     #
@@ -67,20 +226,27 @@ class SchedulerManager:
         call wakeup() that is async.
         """
         self.sched.start()
+        if self.retention_purger:
+            self.retention_purger.start()
 
     def stop(self):
         """Stop scheduler daemon.
         This is a BLOCKING operation, as internally, apscheduler doesn't
         call wakeup() that is async.
         """
+        if self.retention_purger:
+            self.retention_purger.stop()
         self.sched.shutdown()
+        # Running jobs are done by now, so no more execution changes will be queued.
+        self.get_datastore().disable_write_behind()
         self.get_datastore().destroy_instance()
 
     #
     # Manage jobs
     #
     def add_job(self, job_class_string, name, pub_args=None, month=None,
-                day_of_week=None, day=None, hour=None, minute=None, **kwargs):
+                day_of_week=None, day=None, hour=None, minute=None, executor=None,
+                stagger_window_sec=None, **kwargs):
         """Add a job. Job infomation will be persistent in the datastore.
         This is a NON-BLOCKING operation, as internally, apscheduler calls wakeup()
         that is async.
@@ -92,12 +258,28 @@ class SchedulerManager:
         :param str day: String for day cron string, e.g., */1
         :param str hour: String for hour cron string, e.g., */2
         :param str minute: String for minute cron string, e.g., */3
+        :param str executor: Name of the pool of workers running the job. By default, the one
+            picked by the job class.
+        :param int stagger_window_sec: The job runs up to this many seconds after its cron
+            schedule. 0 doesn't stagger it. By default, job_stagger_window_sec.
         :param kwargs: Other keyword arguments passed to run_job function.
         :return: String of job id, e.g., 6bca19736d374ef2b3df23eb278b512e
         :rtype: str
         """
         return self.sched.add_scheduler_job(job_class_string, name, pub_args, month, day_of_week,
-                                            day, hour, minute, **kwargs)
+                                            day, hour, minute, executor, stagger_window_sec,
+                                            **kwargs)
+
+    def add_jobs(self, jobs):
+        """Adds multiple jobs in one transaction, waking up the scheduler once.
+        This is a BLOCKING operation.
+        :param list jobs: Dictionaries of the arguments of add_job(), e.g.,
+            [{'job_class_string': 'myscheduler.jobs.a_job.NiceJob', 'name': 'Nice job',
+              'minute': '*/5'}, ...]
+        :return: List of job ids, in the order of jobs.
+        :rtype: list
+        """
+        return self.sched.add_scheduler_jobs(jobs)
 
     def pause_job(self, job_id):
         """Pauses the schedule of a job.
@@ -107,6 +289,16 @@ class SchedulerManager:
         """
         self.sched.pause_job(job_id)
 
+    def run_job_now(self, job):
+        """Runs a job right away on its executor, without waiting for the run to end.
+        This is a BLOCKING operation, as it records the execution.
+        :param Job job: An apscheduler.job.Job instance.
+        :return: String of execution id
+        :rtype: str
+        :raises MaxInstancesReachedError: if the job already has max_instances runs.
+        """
+        return self.sched.run_scheduler_job_now(job)
+
     def get_job(self, job_id):
         """Returns an apscheduler.job.Job instance.
         This is a BLOCKING operation, as internally, apscheduler doesn't
@@ -126,6 +318,14 @@ class SchedulerManager:
         """
         return self.sched.get_jobs()
 
+    def get_job_listing(self):
+        """Returns all jobs as served by GET /api/v1/jobs, from an in-memory cache.
+        This is a BLOCKING operation if jobs changed since the last call.
+        :return: a tuple of (etag, json string of {'jobs': [...]}).
+        :rtype: tuple
+        """
+        return self.job_cache.get_listing()
+
     def get_job_task_class(self, job):
         """Shortcut to get task class.
         :param Job job: Instance of apscheduler.job.Job.
@@ -142,6 +342,14 @@ class SchedulerManager:
         """
         self.sched.remove_job(job_id)
 
+    def remove_jobs(self, job_ids):
+        """Removes multiple jobs in one transaction.
+        This is a BLOCKING operation.
+        :param list job_ids: Job ids.
+        :raises JobLookupError: if a job doesn't exist, in which case no job is removed.
+        """
+        self.sched.remove_scheduler_jobs(job_ids)
+
     def resume_job(self, job_id):
         """Removes a job.
         This is a NON-BLOCKING operation, as internally, apscheduler calls wakeup()
@@ -153,7 +361,7 @@ class SchedulerManager:
     def modify_job(self, job_id, **kwargs):
         """Modifies a job.
         This is a BLOCKING operation, because it calls get_job() that is blocking, even though
-        reschedule() and modify() are both non-blocking.
+        modify_job() is non-blocking.
         :param str job_id: String for job id to be modified.
         :param kwargs: keyword arguments, including:
             - name: String for job name
@@ -165,5 +373,16 @@ class SchedulerManager:
             - day: String for day cron string, e.g., */1
             - hour: String for hour cron string, e.g., */2
             - minute: String for minute cron string, e.g., */3
+            - executor: Name of the pool of workers running the job
+            - stagger_window_sec: Seconds the job may run after its cron schedule. None
+                goes back to job_stagger_window_sec, and 0 doesn't stagger it.
         """
         self.sched.modify_scheduler_job(job_id, **kwargs)
+
+    def modify_jobs(self, changes):
+        """Modifies multiple jobs in one transaction, waking up the scheduler once.
+        This is a BLOCKING operation.
+        :param dict changes: Dictionary mapping job id to the keyword arguments of modify_job().
+        :raises JobLookupError: if a job doesn't exist, in which case no job is modified.
+        """
+        self.sched.modify_scheduler_jobs(changes)
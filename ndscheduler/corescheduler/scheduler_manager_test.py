@@ -3,9 +3,29 @@
 from builtins import str
 
 import tornado.testing
+from apscheduler.executors import pool
 
 from ndscheduler.corescheduler import scheduler_manager
 from ndscheduler.corescheduler import utils
+from ndscheduler.corescheduler.job import JobBase
+
+
+class CPUBoundJob(JobBase):
+
+    @classmethod
+    def meta_info(cls):
+        meta_info = super(CPUBoundJob, cls).meta_info()
+        meta_info['executor'] = 'process'
+        return meta_info
+
+
+class HTTPJob(JobBase):
+
+    @classmethod
+    def meta_info(cls):
+        meta_info = super(HTTPJob, cls).meta_info()
+        meta_info['executor'] = 'http'
+        return meta_info
 
 
 class SchedulerManagerTest(tornado.testing.AsyncTestCase):
@@ -100,3 +120,159 @@ class SchedulerManagerTest(tornado.testing.AsyncTestCase):
         arguments += args
         self.assertEqual(list(job.args), arguments)
         self.assertEqual(str(job.trigger.fields[1]), month)
+
+    @tornado.testing.gen_test
+    def test_add_job_executor(self):
+        self.assertIsInstance(self.scheduler.sched._executors['default'], pool.ThreadPoolExecutor)
+        self.assertIsInstance(self.scheduler.sched._executors['process'],
+                              pool.ProcessPoolExecutor)
+
+        job_id = self.scheduler.add_job('ndscheduler.corescheduler.scheduler_manager_test.'
+                                        'CPUBoundJob', 'cpu bound', minute='*/1')
+        self.assertEqual(self.scheduler.get_job(job_id).executor, 'process')
+
+        job_id = self.scheduler.add_job('hello.world', 'not importable', minute='*/1')
+        self.assertEqual(self.scheduler.get_job(job_id).executor, 'default')
+
+        self.scheduler.modify_job(job_id, job_class_string=(
+            'ndscheduler.corescheduler.scheduler_manager_test.CPUBoundJob'))
+        self.assertEqual(self.scheduler.get_job(job_id).executor, 'process')
+
+
+class ProcessSchedulerManagerTest(tornado.testing.AsyncTestCase):
+
+    def test_process_executor_type(self):
+        scheduler_class = 'ndscheduler.corescheduler.core.base.BaseScheduler'
+        datastore_class = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        scheduler = scheduler_manager.SchedulerManager(scheduler_class, datastore_class,
+                                                       executor_type='process')
+        scheduler.start()
+        try:
+            self.assertIsInstance(scheduler.sched._executors['default'],
+                                  pool.ProcessPoolExecutor)
+            self.assertIsInstance(scheduler.sched._executors['thread'], pool.ThreadPoolExecutor)
+            self.assertNotIn('process', scheduler.sched._executors)
+
+            # Job classes picking the default executor type run on the default executor.
+            job_id = scheduler.add_job('ndscheduler.corescheduler.scheduler_manager_test.'
+                                       'CPUBoundJob', 'cpu bound', minute='*/1')
+            self.assertEqual(scheduler.get_job(job_id).executor, 'default')
+        finally:
+            scheduler.stop()
+
+    def test_unknown_executor_type(self):
+        scheduler_class = 'ndscheduler.corescheduler.core.base.BaseScheduler'
+        datastore_class = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        self.assertRaises(ValueError, scheduler_manager.SchedulerManager, scheduler_class,
+                          datastore_class, executor_type='fiber')
+
+    def test_job_index_with_other_scheduler_processes(self):
+        datastore_class = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        for scheduler_class in ('ndscheduler.corescheduler.core.leader.LeaderScheduler',
+                                'ndscheduler.corescheduler.core.sharded.ShardedScheduler'):
+            self.assertRaises(ValueError, scheduler_manager.SchedulerManager, scheduler_class,
+                              datastore_class, job_index=True)
+
+
+class ExecutorPoolsSchedulerManagerTest(tornado.testing.AsyncTestCase):
+
+    def setUp(self, *args, **kwargs):
+        super(ExecutorPoolsSchedulerManagerTest, self).setUp(*args, **kwargs)
+        scheduler_class = 'ndscheduler.corescheduler.core.base.BaseScheduler'
+        datastore_class = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        self.scheduler = scheduler_manager.SchedulerManager(
+            scheduler_class, datastore_class, thread_pool_size=4,
+            executor_pools={'http': {'size': 2}, 'crunch': {'type': 'process', 'size': 1}})
+        self.scheduler.start()
+
+    def tearDown(self, *args, **kwargs):
+        self.scheduler.stop()
+        super(ExecutorPoolsSchedulerManagerTest, self).tearDown(*args, **kwargs)
+
+    def test_executor_pools(self):
+        self.assertIsInstance(self.scheduler.sched._executors['http'], pool.ThreadPoolExecutor)
+        self.assertIsInstance(self.scheduler.sched._executors['crunch'],
+                              pool.ProcessPoolExecutor)
+
+        job_id = self.scheduler.add_job('ndscheduler.corescheduler.scheduler_manager_test.'
+                                        'HTTPJob', 'http', minute='*/1')
+        self.assertEqual(self.scheduler.get_job(job_id).executor, 'http')
+
+        # A job can pick a pool other than the one of its class.
+        job_id = self.scheduler.add_job('ndscheduler.corescheduler.scheduler_manager_test.'
+                                        'HTTPJob', 'http', minute='*/1', executor='crunch')
+        self.assertEqual(self.scheduler.get_job(job_id).executor, 'crunch')
+        self.scheduler.modify_job(job_id, executor='default')
+        self.assertEqual(self.scheduler.get_job(job_id).executor, 'default')
+
+        self.assertRaises(ValueError, self.scheduler.add_job, 'hello.world', 'hello',
+                          minute='*/1', executor='missing')
+        self.assertRaises(ValueError, self.scheduler.modify_job, job_id, executor='missing')
+
+    def test_get_executor_stats(self):
+        stats = self.scheduler.get_executor_stats()
+        self.assertEqual(sorted(stats), ['crunch', 'default', 'http', 'process'])
+        self.assertEqual(stats['http'], {'type': 'thread', 'size': 2, 'running': 0, 'queued': 0,
+                                         'utilization': 0.0})
+
+        # Three runs submitted to a pool of two workers.
+        self.scheduler.sched._executors['http']._instances['job'] = 3
+        stats = self.scheduler.get_executor_stats()
+        self.assertEqual(stats['http']['running'], 2)
+        self.assertEqual(stats['http']['queued'], 1)
+        self.assertEqual(stats['http']['utilization'], 1.0)
+        self.scheduler.sched._executors['http']._instances.clear()
+
+    def test_reserved_pool_name(self):
+        scheduler_class = 'ndscheduler.corescheduler.core.base.BaseScheduler'
+        datastore_class = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        self.assertRaises(ValueError, scheduler_manager.SchedulerManager, scheduler_class,
+                          datastore_class, executor_pools={'process': {'size': 1}})
+
+
+class StaggerSchedulerManagerTest(tornado.testing.AsyncTestCase):
+
+    def setUp(self, *args, **kwargs):
+        super(StaggerSchedulerManagerTest, self).setUp(*args, **kwargs)
+        scheduler_class = 'ndscheduler.corescheduler.core.base.BaseScheduler'
+        datastore_class = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        self.scheduler = scheduler_manager.SchedulerManager(scheduler_class, datastore_class,
+                                                            job_stagger_window_sec=300)
+        self.scheduler.start()
+
+    def tearDown(self, *args, **kwargs):
+        self.scheduler.stop()
+        super(StaggerSchedulerManagerTest, self).tearDown(*args, **kwargs)
+
+    def _get_offset(self, job):
+        """Returns the seconds the next run time of job is after its cron schedule."""
+        next_run_time = job.next_run_time
+        return (next_run_time - next_run_time.replace(minute=0, second=0)).seconds
+
+    def test_stagger(self):
+        job_id = self.scheduler.add_job('hello.world', 'hello', minute='0')
+        offset = self.scheduler.sched.get_stagger_offset(job_id)
+        job = self.scheduler.get_job(job_id)
+        self.assertEqual(self._get_offset(job), offset)
+        self.assertEqual(utils.get_job_dict(job)['stagger_sec'], offset)
+        self.assertEqual(utils.get_job_dict(job)['minute'], '0')
+
+        # Changing the schedule keeps the offset.
+        self.scheduler.modify_job(job_id, minute='0', hour='*/2')
+        self.assertEqual(self._get_offset(self.scheduler.get_job(job_id)), offset)
+
+        self.scheduler.modify_job(job_id, stagger_window_sec=0)
+        job = self.scheduler.get_job(job_id)
+        self.assertEqual(self._get_offset(job), 0)
+        self.assertEqual(utils.get_job_dict(job)['stagger_sec'], 0)
+        self.assertEqual(utils.get_job_dict(job)['hour'], '*/2')
+
+    def test_stagger_window_of_job(self):
+        job_ids = [self.scheduler.add_job('hello.world', 'hello', minute='0',
+                                          stagger_window_sec=0),
+                   self.scheduler.add_jobs([{'job_class_string': 'hello.world', 'name': 'hello',
+                                             'minute': '0', 'stagger_window_sec': 30}])[0]]
+        self.assertEqual(self._get_offset(self.scheduler.get_job(job_ids[0])), 0)
+        self.assertLess(self._get_offset(self.scheduler.get_job(job_ids[1])), 30)
+        self.assertEqual(self._get_offset(self.scheduler.get_job(job_ids[1])),
+                         self.scheduler.sched.get_stagger_offset(job_ids[1], 30))
@@ -0,0 +1,126 @@
+"""Deterministic staggering of jobs that share a cron schedule.
+
+Most jobs run at minute 0 or every 5 minutes, so hundreds of runs are due in the same second.
+They all wait for a worker at once, runs get skipped for max_instances or misfire, and the
+datastore takes a burst of execution writes. A staggered job runs a fixed number of seconds after
+its cron schedule instead, hashed from its job id within a window, so that jobs sharing a schedule
+spread over the window. Unlike the jitter of apscheduler, the offset is the same on every run and
+on every scheduler process, and it shows in the next run time of the job.
+"""
+
+import collections
+import datetime
+import hashlib
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.util import datetime_to_utc_timestamp
+from dateutil import tz
+
+
+def get_offset(job_id, window_sec):
+    """Returns the stagger offset of a job.
+    :param str job_id: Job id.
+    :param int window_sec: Seconds the offsets are spread over. 0 or None doesn't stagger.
+    :return: Seconds in [0, window_sec).
+    :rtype: int
+    """
+    if not window_sec:
+        return 0
+    return int(hashlib.md5(job_id.encode('utf-8')).hexdigest(), 16) % int(window_sec)
+
+
+def _shift(dateval, seconds):
+    """Adds seconds to an aware datetime, in absolute time rather than wall clock time."""
+    return (dateval.astimezone(tz.tzutc()) +
+            datetime.timedelta(seconds=seconds)).astimezone(dateval.tzinfo)
+
+
+class StaggeredCronTrigger(CronTrigger):
+    """Fires offset_sec seconds after each fire time of a cron trigger."""
+
+    def __init__(self, offset_sec=0, **kwargs):
+        """
+        :param int offset_sec: Seconds to fire after the cron schedule.
+        :param kwargs: Arguments of CronTrigger.
+        """
+        super(StaggeredCronTrigger, self).__init__(**kwargs)
+        self.offset_sec = offset_sec
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        if previous_fire_time:
+            previous_fire_time = _shift(previous_fire_time, -self.offset_sec)
+        fire_time = super(StaggeredCronTrigger, self).get_next_fire_time(
+            previous_fire_time, _shift(now, -self.offset_sec))
+        if fire_time:
+            fire_time = _shift(fire_time, self.offset_sec)
+        return fire_time
+
+    def __getstate__(self):
+        state = super(StaggeredCronTrigger, self).__getstate__()
+        state['offset_sec'] = self.offset_sec
+        return state
+
+    def __setstate__(self, state):
+        super(StaggeredCronTrigger, self).__setstate__(state)
+        self.offset_sec = state.get('offset_sec', 0)
+
+    def __str__(self):
+        return '%s+%ds' % (super(StaggeredCronTrigger, self).__str__(), self.offset_sec)
+
+    def __repr__(self):
+        return '%s, offset_sec=%d>' % (super(StaggeredCronTrigger, self).__repr__()[:-1],
+                                       self.offset_sec)
+
+
+def get_trigger_offset(trigger):
+    """Returns the stagger offset of a trigger, 0 if it isn't staggered.
+    :rtype: int
+    """
+    return getattr(trigger, 'offset_sec', 0)
+
+
+def with_offset(trigger, offset_sec):
+    """Returns a trigger with the same cron schedule as trigger, staggered by offset_sec.
+    Triggers other than cron are returned as is.
+    :param BaseTrigger trigger: apscheduler trigger.
+    :param int offset_sec: Seconds to fire after the cron schedule. 0 doesn't stagger.
+    :rtype: BaseTrigger
+    """
+    if not isinstance(trigger, CronTrigger) or get_trigger_offset(trigger) == offset_sec:
+        return trigger
+    trigger_class = StaggeredCronTrigger if offset_sec else CronTrigger
+    new_trigger = trigger_class.__new__(trigger_class)
+    new_trigger.__setstate__(dict(trigger.__getstate__(), offset_sec=offset_sec))
+    return new_trigger
+
+
+def get_dispatch_load(triggers, start, end):
+    """Counts the runs triggers fire in each second of a time range.
+    :param list triggers: apscheduler triggers.
+    :param datetime start: Start of the time range, aware.
+    :param datetime end: End of the time range, aware, excluded.
+    :return: A Counter mapping UTC timestamp, in whole seconds, to number of runs.
+    :rtype: collections.Counter
+    """
+    counts = collections.Counter()
+    for trigger in triggers:
+        fire_time = trigger.get_next_fire_time(None, start)
+        while fire_time and fire_time < end:
+            counts[int(datetime_to_utc_timestamp(fire_time))] += 1
+            fire_time = trigger.get_next_fire_time(fire_time, fire_time)
+    return counts
+
+
+def summarize_dispatch_load(counts):
+    """Summarizes the counts returned by get_dispatch_load().
+    :return: A dictionary of the total number of 'runs', the number of 'busy_seconds' with at
+        least one run, and the 'max' and 'p99' runs in a busy second.
+    :rtype: dict
+    """
+    per_second = sorted(counts.values())
+    if not per_second:
+        return {'runs': 0, 'busy_seconds': 0, 'max': 0, 'p99': 0}
+    return {'runs': sum(per_second),
+            'busy_seconds': len(per_second),
+            'max': per_second[-1],
+            'p99': per_second[min(len(per_second) - 1, int(len(per_second) * 0.99))]}
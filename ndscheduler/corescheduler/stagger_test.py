@@ -0,0 +1,70 @@
+"""Unit tests for stagger module."""
+
+import datetime
+import pickle
+import unittest
+
+from apscheduler.triggers.cron import CronTrigger
+from dateutil import tz
+
+from ndscheduler.corescheduler import stagger
+
+
+class StaggerTest(unittest.TestCase):
+
+    def test_get_offset(self):
+        offsets = [stagger.get_offset('job%d' % i, 300) for i in range(1000)]
+        self.assertEqual(offsets, [stagger.get_offset('job%d' % i, 300) for i in range(1000)])
+        self.assertTrue(all(0 <= offset < 300 for offset in offsets))
+        # Spread over the window.
+        self.assertGreater(len(set(offsets)), 250)
+        self.assertEqual(stagger.get_offset('job1', 0), 0)
+        self.assertEqual(stagger.get_offset('job1', None), 0)
+
+    def test_staggered_cron_trigger(self):
+        trigger = stagger.StaggeredCronTrigger(137, minute='0', timezone='UTC')
+        now = datetime.datetime(2024, 1, 1, 12, 1, tzinfo=tz.tzutc())
+        fire_time = trigger.get_next_fire_time(None, now)
+        # The run of 12:00 isn't due until 12:02:17.
+        self.assertEqual(fire_time, datetime.datetime(2024, 1, 1, 12, 2, 17, tzinfo=tz.tzutc()))
+        self.assertEqual(trigger.get_next_fire_time(fire_time, fire_time),
+                         datetime.datetime(2024, 1, 1, 13, 2, 17, tzinfo=tz.tzutc()))
+        self.assertEqual(str(trigger), "cron[minute='0']+137s")
+
+    def test_daylight_saving_time(self):
+        trigger = stagger.StaggeredCronTrigger(600, hour='1', minute='55',
+                                               timezone='America/New_York')
+        # Clocks go from 2:00 to 3:00 on that night; the run 10 minutes after 1:55 is at 3:05.
+        now = datetime.datetime(2024, 3, 10, 0, 0, tzinfo=tz.gettz('America/New_York'))
+        fire_time = trigger.get_next_fire_time(None, now)
+        self.assertEqual(fire_time.astimezone(tz.tzutc()),
+                         datetime.datetime(2024, 3, 10, 7, 5, tzinfo=tz.tzutc()))
+
+    def test_with_offset(self):
+        trigger = CronTrigger(minute='*/5', timezone='UTC')
+        staggered = stagger.with_offset(trigger, 42)
+        self.assertIsInstance(staggered, stagger.StaggeredCronTrigger)
+        self.assertEqual(stagger.get_trigger_offset(staggered), 42)
+        self.assertEqual(str(staggered), "cron[minute='*/5']+42s")
+        self.assertIs(stagger.with_offset(staggered, 42), staggered)
+
+        unstaggered = stagger.with_offset(staggered, 0)
+        self.assertIs(type(unstaggered), CronTrigger)
+        self.assertEqual(str(unstaggered), str(trigger))
+
+        restored = pickle.loads(pickle.dumps(staggered))
+        self.assertEqual(stagger.get_trigger_offset(restored), 42)
+
+    def test_get_dispatch_load(self):
+        start = datetime.datetime(2024, 1, 1, 12, 0, tzinfo=tz.tzutc())
+        end = start + datetime.timedelta(hours=1)
+        triggers = [CronTrigger(minute='*/5', timezone='UTC') for _ in range(10)]
+        summary = stagger.summarize_dispatch_load(
+            stagger.get_dispatch_load(triggers, start, end))
+        self.assertEqual(summary, {'runs': 120, 'busy_seconds': 12, 'max': 10, 'p99': 10})
+
+        triggers = [stagger.with_offset(trigger, i) for i, trigger in enumerate(triggers)]
+        summary = stagger.summarize_dispatch_load(
+            stagger.get_dispatch_load(triggers, start, end))
+        self.assertEqual(summary['max'], 1)
+        self.assertEqual(summary['busy_seconds'], 120)
@@ -1,29 +1,90 @@
 """Some convenient utils functions."""
 
 import datetime
+import importlib
 import os
 import socket
 import sys
 import traceback
+import types
 import uuid
 
 import pytz
 
 from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler import stagger
+
+
+# Objects resolved by import_from_path(), keyed by path.
+# Values are tuples of (object, module the object was found in, modification time of its file).
+_import_cache = {}
+
+# If True, import_from_path() reloads a module whose file changed since it was cached.
+_import_reload_on_change = False
 
 
 def import_from_path(path):
     """Import a module / class from a path string.
+    Resolved objects are cached, as this is called every time a job runs.
     :param str path: class path, e.g., ndscheduler.corescheduler.job
     :return: class object
     :rtype: class
     """
+    cached = _import_cache.get(path)
+    if cached:
+        obj, module, mtime = cached
+        if not _import_reload_on_change or _get_module_mtime(module) == mtime:
+            return obj
+        reload_module(module)
 
     components = path.split('.')
     module = __import__('.'.join(components[:-1]))
     for comp in components[1:-1]:
         module = getattr(module, comp)
-    return getattr(module, components[-1])
+    obj = getattr(module, components[-1])
+    if isinstance(obj, types.ModuleType):
+        module = obj
+    _import_cache[path] = (obj, module, _get_module_mtime(module))
+    return obj
+
+
+def reload_module(module):
+    """Re-executes the code of an imported module, on Python 2 as well as 3.
+    :param module module: module to reload.
+    :return: the reloaded module.
+    :rtype: module
+    """
+    if hasattr(importlib, 'reload'):
+        return importlib.reload(module)
+    # Python 2 has no importlib.reload(), but a builtin instead.
+    return reload(module)  # noqa: F821
+
+
+def invalidate_import_cache(path=None):
+    """Drops objects cached by import_from_path().
+    :param str path: path to drop, e.g., myscheduler.jobs.a_job.NiceJob. Drop all if None.
+    """
+    if path is None:
+        _import_cache.clear()
+    else:
+        _import_cache.pop(path, None)
+
+
+def set_import_reload_on_change(enabled):
+    """Makes import_from_path() reload modules whose files changed, e.g., in DEBUG mode.
+    This costs a stat() call per import_from_path() call.
+    :param bool enabled: True to reload changed modules.
+    """
+    global _import_reload_on_change
+    _import_reload_on_change = enabled
+
+
+def _get_module_mtime(module):
+    """Returns the modification time of a module's file, or None if it has no file."""
+    try:
+        return os.path.getmtime(module.__file__)
+    except (AttributeError, TypeError, OSError):
+        return None
 
 
 def get_current_datetime():
@@ -76,6 +137,29 @@ def get_cron_strings(job):
         'minute': str(job.trigger.fields[6])}
 
 
+def get_job_dict(job):
+    """Transforms apscheduler's job structure to a python dictionary, as returned by the api.
+    :param Job job: An apscheduler.job.Job instance.
+    :return: dictionary for job info
+    :rtype: dict
+    """
+    if job.next_run_time:
+        next_run_time = job.next_run_time.isoformat()
+    else:
+        next_run_time = ''
+    return_dict = {
+        'job_id': job.id,
+        'name': job.name,
+        'next_run_time': next_run_time,
+        'job_class_string': get_job_name(job),
+        'pub_args': get_job_args(job),
+        'executor': job.executor,
+        'stagger_sec': stagger.get_trigger_offset(job.trigger)}
+
+    return_dict.update(get_cron_strings(job))
+    return return_dict
+
+
 def generate_uuid():
     """Generates 32-digit hex uuid.
     Example: d8f376e858a411e4b6ae22001ac68d05
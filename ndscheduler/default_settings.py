@@ -11,6 +11,10 @@ import os
 #
 DEBUG = True
 
+# If True, a job class whose module file changed is reloaded before its next run, so that
+# changes to jobs take effect without restarting the server. It costs a stat() per job run.
+JOB_CLASS_RELOAD_ON_CHANGE = False
+
 #
 # Static Assets
 #
@@ -28,10 +32,37 @@ HTTP_ADDRESS = '127.0.0.1'
 
 TORNADO_MAX_WORKERS = 8
 
+# If True, API handlers read executions and audit logs with an asyncio database driver on the
+# IOLoop, rather than with blocking calls on TORNADO_MAX_WORKERS threads. Requires Python 3.6+ and
+# aiosqlite, asyncpg or aiomysql, depending on the database.
+ASYNC_DATASTORE = False
+
+# Max number of executions returned by one GET /api/v1/executions call.
+# Clients page through wider time ranges with the returned next_cursor.
+EXECUTIONS_MAX_LIMIT = 1000
+
+# Execution results larger than this many bytes are stored compressed in a table of their own.
+# Listings of executions only return a preview of them, and GET /api/v1/executions/<id> returns
+# the full result. None keeps all results in the executions table.
+EXECUTION_RESULT_INLINE_MAX_BYTES = 4096
+
+# Number of rows fetched and written at a time by GET /api/v1/executions/export and
+# GET /api/v1/logs/export.
+EXPORT_CHUNK_SIZE = 1000
+
 #
 # ApScheduler settings
 #
 THREAD_POOL_SIZE = 4
+PROCESS_POOL_SIZE = 4
+# Jobs run in a pool of threads ('thread') or, for CPU bound jobs, a pool of processes ('process').
+# A job class can pick the other kind of pool with the 'executor' key of its meta_info().
+EXECUTOR_TYPE = 'thread'
+# Named pools of workers, so that slow jobs don't hold up the others, e.g.,
+# {'http': {'type': 'thread', 'size': 20}, 'critical': {'type': 'thread', 'size': 2}}
+# A job class runs in one with the 'executor' key of its meta_info(), and a job with the 'executor'
+# field of the API. GET /api/v1/executors returns the utilization of each pool.
+EXECUTOR_POOLS = {}
 JOB_MAX_INSTANCES = 3
 JOB_COALESCE = True
 TIMEZONE = 'UTC'
@@ -43,17 +74,79 @@ TIMEZONE = 'UTC'
 # Otherwise, if it's misfired over 1 hour, the scheduler will not rerun it.
 JOB_MISFIRE_GRACE_SEC = 3600
 
+# Jobs sharing a cron schedule, e.g., minute=0, all become due in the same second. If set, each job
+# runs a fixed number of seconds after its schedule instead, hashed from its job id within this
+# window, e.g., 300 spreads jobs at minute=0 over the first 5 minutes of the hour. The offset shows
+# in the next run time of the job. It applies to jobs added from then on; the
+# `stagger_window_sec` field of a job overrides it, and 0 turns it off for the job.
+# `python -m ndscheduler.dispatch_load` reports how runs spread over the seconds of the next hour.
+JOB_STAGGER_WINDOW_SEC = None
+
+# If True, execution state changes are queued in memory and written to the database in batches
+# by a background thread, so that short jobs don't wait on the database.
+# A batch is written once EXECUTION_WRITE_BATCH_SIZE changes are queued, or
+# EXECUTION_WRITE_FLUSH_INTERVAL_SEC seconds later, whichever comes first.
+EXECUTION_WRITE_BEHIND = False
+EXECUTION_WRITE_BATCH_SIZE = 100
+EXECUTION_WRITE_FLUSH_INTERVAL_SEC = 1
+
+# If True, jobs are stored in the jobs table as compact JSON of their class, arguments and cron
+# fields, instead of a pickle that also holds DATABASE_CONFIG_DICT. Jobs pickled before are still
+# read, and can be rewritten with `python -m ndscheduler.migrate_job_states`. Versions of
+# ndscheduler before the compact format can't read it, so keep this False until all scheduler
+# processes sharing the database are upgraded.
+COMPACT_JOB_STATE = True
+
+# If True, the scheduler keeps all jobs in memory, and finds the due ones without querying the
+# database and unpickling them on every wakeup. Job changes are still written to the database right
+# away, but jobs are only read from it on start, so changes made by other scheduler processes
+# sharing the database are never seen. Only enable it with a single scheduler process; it can't be
+# used with LeaderScheduler or ShardedScheduler.
+JOB_INDEX = False
+
+# GET /api/v1/jobs is served from an in-memory cache that is updated as jobs change. It reloads all
+# jobs every JOB_CACHE_MAX_AGE_SEC seconds, to pick up changes made by other scheduler processes
+# sharing the database. None never reloads them, which is fine with a single scheduler process.
+JOB_CACHE_MAX_AGE_SEC = 60
+
+#
+# Retention policies
+#
+# By default, executions and audit logs are kept forever. If any of these is set, a background
+# thread deletes the rows that fall out of the policies every RETENTION_INTERVAL_SEC seconds,
+# at most RETENTION_BATCH_SIZE rows per transaction.
+#
+# Executions scheduled more than this many days ago are deleted. Executions that are scheduled,
+# running or stopping are only deleted by EXECUTION_RETENTION_DAYS_BY_STATE.
+EXECUTION_RETENTION_DAYS = None
+# Overrides EXECUTION_RETENTION_DAYS for some states, e.g., {'succeeded': 7, 'failed': 90}
+EXECUTION_RETENTION_DAYS_BY_STATE = {}
+# Only this many of the latest executions of each job are kept, and the ones that didn't end.
+EXECUTION_RETENTION_PER_JOB = None
+# Audit logs created more than this many days ago are deleted.
+AUDIT_LOG_RETENTION_DAYS = None
+RETENTION_BATCH_SIZE = 500
+RETENTION_INTERVAL_SEC = 3600
+# If set, purged rows are first appended to gzipped JSON lines files in this directory.
+RETENTION_ARCHIVE_DIR = None
+
 #
 # Database settings
 #
 JOBS_TABLENAME = 'scheduler_jobs'
 EXECUTIONS_TABLENAME = 'scheduler_execution'
 AUDIT_LOGS_TABLENAME = 'scheduler_jobauditlog'
+LEASES_TABLENAME = 'scheduler_lease'
+NODES_TABLENAME = 'scheduler_node'
+EXECUTION_RESULTS_TABLENAME = 'scheduler_execution_result'
 
 DATABASE_TABLENAMES = {
     'jobs_tablename': JOBS_TABLENAME,
     'executions_tablename': EXECUTIONS_TABLENAME,
-    'auditlogs_tablename': AUDIT_LOGS_TABLENAME
+    'auditlogs_tablename': AUDIT_LOGS_TABLENAME,
+    'leases_tablename': LEASES_TABLENAME,
+    'nodes_tablename': NODES_TABLENAME,
+    'execution_results_tablename': EXECUTION_RESULTS_TABLENAME
 }
 
 # See different database providers in ndscheduler/core/datastore/providers/
@@ -92,6 +185,16 @@ DATABASE_CONFIG_DICT = {
 # Please see ndscheduler/core/scheduler/base.py
 SCHEDULER_CLASS = 'ndscheduler.corescheduler.core.base.BaseScheduler'
 
+# To run hot standby scheduler processes, use this scheduler class instead. Only the process
+# holding a lease in the datastore schedules jobs.
+# Please see ndscheduler/corescheduler/core/leader.py
+# SCHEDULER_CLASS = 'ndscheduler.corescheduler.core.leader.LeaderScheduler'
+
+# Or, to spread jobs over several scheduler processes, use this scheduler class. Each process
+# only runs the jobs in its partition of job ids.
+# Please see ndscheduler/corescheduler/core/sharded.py
+# SCHEDULER_CLASS = 'ndscheduler.corescheduler.core.sharded.ShardedScheduler'
+
 #
 # Set logging level
 #
@@ -100,3 +203,8 @@ logging.getLogger().setLevel(logging.INFO)
 
 # Packages that contains job classes, e.g., simple_scheduler.jobs
 JOB_CLASS_PACKAGES = []
+
+# Seconds for which /api/v1/job_classes serves the job classes without looking for modules of
+# JOB_CLASS_PACKAGES that were added, removed or modified, which costs a stat() per module.
+# 0 looks on every request.
+JOB_CLASSES_RESCAN_INTERVAL_SEC = 5
@@ -0,0 +1,57 @@
+"""Reports how many job runs become due in each second, with and without staggering.
+
+Run it with the settings of the scheduler, e.g.,
+
+    NDSCHEDULER_SETTINGS_MODULE=simple_scheduler.settings \\
+        python -m ndscheduler.dispatch_load --window-sec 300
+
+"before" is the load of the cron schedules of the jobs without any stagger offset. "after" is
+the load with the offsets the jobs have, or, with --window-sec, the load if every job were
+staggered within that window.
+"""
+
+import argparse
+import datetime
+
+from dateutil import tz
+
+from ndscheduler import settings
+from ndscheduler.corescheduler import stagger
+from ndscheduler.corescheduler import utils
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report the per-second load of job runs.')
+    parser.add_argument('--hours', type=float, default=1,
+                        help='Length of the time range to simulate, from now.')
+    parser.add_argument('--window-sec', type=int, default=None,
+                        help='Stagger every job within this window, instead of the offsets '
+                             'they have.')
+    args = parser.parse_args(argv)
+
+    datastore = utils.get_datastore_instance(settings.DATABASE_CLASS,
+                                             settings.DATABASE_CONFIG_DICT,
+                                             settings.DATABASE_TABLENAMES)
+    # apscheduler only creates the jobs table when the scheduler starts.
+    datastore.jobs_t.create(datastore.engine, checkfirst=True)
+    # Paused jobs don't run.
+    jobs = [job for job in datastore.get_all_jobs() if job.next_run_time]
+    before = [stagger.with_offset(job.trigger, 0) for job in jobs]
+    if args.window_sec is None:
+        after = [job.trigger for job in jobs]
+    else:
+        after = [stagger.with_offset(job.trigger, stagger.get_offset(job.id, args.window_sec))
+                 for job in jobs]
+
+    start = datetime.datetime.now(tz.tzutc())
+    end = start + datetime.timedelta(hours=args.hours)
+    print('%d jobs, from %s to %s' % (len(jobs), start.isoformat(), end.isoformat()))
+    for label, triggers in (('before', before), ('after', after)):
+        summary = stagger.summarize_dispatch_load(
+            stagger.get_dispatch_load(triggers, start, end))
+        print('%-6s  runs: %d  busy seconds: %d  max runs/sec: %d  p99 runs/sec: %d' % (
+            label, summary['runs'], summary['busy_seconds'], summary['max'], summary['p99']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Rewrites pickled job states in the compact format.
+
+Run it with the settings of the scheduler, e.g.,
+
+    NDSCHEDULER_SETTINGS_MODULE=simple_scheduler.settings \\
+        python -m ndscheduler.migrate_job_states --dry-run
+
+Jobs the scheduler stores after the upgrade are in the compact format already, and pickled ones
+are still read, so this is only needed to shrink the jobs table and get database credentials out
+of it. It's safe to run while the scheduler is running.
+"""
+
+import argparse
+
+from ndscheduler import settings
+from ndscheduler.corescheduler import utils
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rewrite pickled job states as compact JSON.')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Max number of jobs rewritten in one transaction.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only count the jobs that would be rewritten.')
+    args = parser.parse_args(argv)
+
+    datastore = utils.get_datastore_instance(settings.DATABASE_CLASS,
+                                             settings.DATABASE_CONFIG_DICT,
+                                             settings.DATABASE_TABLENAMES)
+    counts = datastore.migrate_job_states(args.batch_size, dry_run=args.dry_run)
+    print('%s %d jobs, %d already compact, %d skipped' % (
+        'Would migrate' if args.dry_run else 'Migrated', counts['migrated'], counts['compact'],
+        counts['skipped']))
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,18 @@ from ndscheduler.server.handlers import base
 
 class Handler(base.BaseHandler):
 
+    def _get_time_range(self):
+        """Returns the time range of audit logs in the query string.
+
+        :return: A tuple of (time_range_start, time_range_end).
+        :rtype: tuple
+        """
+        now = datetime.utcnow()
+        time_range_end = self.get_argument('time_range_end', now.isoformat())
+        ten_minutes_ago = now - timedelta(minutes=10)
+        time_range_start = self.get_argument('time_range_start', ten_minutes_ago.isoformat())
+        return time_range_start, time_range_end
+
     def _get_logs(self):
         """Returns a dictionary of audit logs in a specific time range.
 
@@ -19,12 +31,7 @@ class Handler(base.BaseHandler):
         :return: executions info.
         :rtype: dict
         """
-        now = datetime.utcnow()
-        time_range_end = self.get_argument('time_range_end', now.isoformat())
-        ten_minutes_ago = now - timedelta(minutes=10)
-        time_range_start = self.get_argument('time_range_start', ten_minutes_ago.isoformat())
-
-        logs = self.datastore.get_audit_logs(time_range_start, time_range_end)
+        logs = self.datastore.get_audit_logs(*self._get_time_range())
         return logs
 
     @tornado.concurrent.run_on_executor
@@ -36,9 +43,22 @@ class Handler(base.BaseHandler):
         """
         return self._get_logs()
 
+    @tornado.gen.coroutine
+    def get_logs_async(self):
+        """Same as _get_logs(), with the asyncio datastore.
+
+        :return: audit log info.
+        :rtype: dict
+        """
+        logs = yield self.async_datastore.get_audit_logs(*self._get_time_range())
+        raise tornado.gen.Return(logs)
+
     @tornado.gen.engine
     def get_logs_yield(self):
-        return_json = yield self.get_logs()
+        if self.async_datastore:
+            return_json = yield self.get_logs_async()
+        else:
+            return_json = yield self.get_logs()
         self.finish(return_json)
 
     @tornado.web.removeslash
@@ -29,6 +29,8 @@ class BaseHandler(tornado.web.RequestHandler):
         self.username = self.get_username()
         self.scheduler_manager = self.application.settings['scheduler_manager']
         self.datastore = self.scheduler_manager.get_datastore()
+        # If set, handlers await it rather than calling datastore on the executor.
+        self.async_datastore = self.scheduler_manager.get_async_datastore()
 
     def get_username(self):
         """Returns login username.
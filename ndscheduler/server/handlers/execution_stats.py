@@ -0,0 +1,87 @@
+"""Handler for execution statistics endpoint."""
+
+from datetime import datetime
+from datetime import timedelta
+
+import tornado.gen
+import tornado.web
+
+from ndscheduler.server.handlers import base
+
+
+class Handler(base.BaseHandler):
+
+    def _get_stats_arguments(self):
+        """Parses the query string parameters of GET /api/v1/executions/stats.
+
+        :return: A tuple of (arguments for get_execution_stats(), None), or (None, a dictionary
+            of error message) if a parameter is invalid.
+        :rtype: tuple
+        """
+        now = datetime.utcnow()
+        time_range_end = self.get_argument('time_range_end', now.isoformat())
+        ten_minutes_ago = now - timedelta(minutes=10)
+        time_range_start = self.get_argument('time_range_start', ten_minutes_ago.isoformat())
+
+        group_by = self.get_argument('group_by', None)
+        if group_by not in (None, 'job_id'):
+            self.set_status(400)
+            return None, {'error': 'group_by can only be job_id'}
+
+        return (time_range_start, time_range_end, group_by == 'job_id'), None
+
+    def _get_stats(self):
+        """Returns a dictionary of execution counts in a specific time range.
+
+        This is a blocking operation.
+
+        :return: execution counts.
+        :rtype: dict
+        """
+        arguments, error = self._get_stats_arguments()
+        if error:
+            return error
+        return self.datastore.get_execution_stats(*arguments)
+
+    @tornado.concurrent.run_on_executor
+    def get_stats(self):
+        """Wrapper for _get_stats to run on threaded executor.
+
+        :return: execution counts.
+        :rtype: dict
+        """
+        return self._get_stats()
+
+    @tornado.gen.coroutine
+    def get_stats_async(self):
+        """Same as _get_stats(), with the asyncio datastore.
+
+        :return: execution counts.
+        :rtype: dict
+        """
+        arguments, error = self._get_stats_arguments()
+        if error:
+            raise tornado.gen.Return(error)
+        stats = yield self.async_datastore.get_execution_stats(*arguments)
+        raise tornado.gen.Return(stats)
+
+    @tornado.gen.engine
+    def get_stats_yield(self):
+        """Wrapper for get_stats to run in async mode."""
+        if self.async_datastore:
+            return_json = yield self.get_stats_async()
+        else:
+            return_json = yield self.get_stats()
+        self.finish(return_json)
+
+    @tornado.web.removeslash
+    @tornado.web.asynchronous
+    @tornado.gen.engine
+    def get(self):
+        """Returns the number of executions in each state.
+
+        Handles the endpoint GET /api/v1/executions/stats.
+            It takes the same time range parameters as GET /api/v1/executions, and:
+            - group_by - 'job_id' to also return the counts of each job.
+        """
+        self.get_stats_yield()
@@ -5,6 +5,7 @@ from datetime import timedelta
 
 import tornado.gen
 import tornado.web
+from apscheduler.executors.base import MaxInstancesReachedError
 
 from ndscheduler import settings
 from ndscheduler.corescheduler import constants
@@ -42,15 +43,58 @@ class Handler(base.BaseHandler):
         """
         return self._get_execution(execution_id)
 
+    @tornado.gen.coroutine
+    def get_execution_async(self, execution_id):
+        """Same as _get_execution(), with the asyncio datastore.
+
+        :param str execution_id: Execution id.
+
+        :return: Job execution info.
+        :rtype: dict
+        """
+        execution = yield self.async_datastore.get_execution(execution_id)
+        if not execution:
+            self.set_status(400)
+            execution = {'error': 'Execution not found: %s' % execution_id}
+        raise tornado.gen.Return(execution)
+
     @tornado.gen.engine
     def get_execution_yield(self, execution_id):
         """Wrapper for get_execution to run in async mode
 
         :param str execution_id: Execution id.
         """
-        return_json = yield self.get_execution(execution_id)
+        if self.async_datastore:
+            return_json = yield self.get_execution_async(execution_id)
+        else:
+            return_json = yield self.get_execution(execution_id)
         self.finish(return_json)
 
+    def _get_executions_arguments(self):
+        """Parses the query string parameters of GET /api/v1/executions.
+
+        :return: A tuple of (keyword arguments for get_executions(), None), or (None, a
+            dictionary of error message) if a parameter is invalid.
+        :rtype: tuple
+        """
+        now = datetime.utcnow()
+        time_range_end = self.get_argument('time_range_end', now.isoformat())
+        ten_minutes_ago = now - timedelta(minutes=10)
+        time_range_start = self.get_argument('time_range_start', ten_minutes_ago.isoformat())
+
+        try:
+            limit = int(self.get_argument('limit', settings.EXECUTIONS_MAX_LIMIT))
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            self.set_status(400)
+            return None, {'error': 'limit has to be a positive integer'}
+        limit = min(limit, settings.EXECUTIONS_MAX_LIMIT)
+        cursor = self.get_argument('cursor', None)
+
+        return {'time_range_start': time_range_start, 'time_range_end': time_range_end,
+                'limit': limit, 'cursor': cursor}, None
+
     def _get_executions(self):
         """Returns a dictionary of executions in a specific time range.
 
@@ -59,13 +103,15 @@ class Handler(base.BaseHandler):
         :return: executions info.
         :rtype: dict
         """
+        kwargs, error = self._get_executions_arguments()
+        if error:
+            return error
 
-        now = datetime.utcnow()
-        time_range_end = self.get_argument('time_range_end', now.isoformat())
-        ten_minutes_ago = now - timedelta(minutes=10)
-        time_range_start = self.get_argument('time_range_start', ten_minutes_ago.isoformat())
-
-        executions = self.datastore.get_executions(time_range_start, time_range_end)
+        try:
+            executions = self.datastore.get_executions(**kwargs)
+        except ValueError as e:
+            self.set_status(400)
+            return {'error': str(e)}
         return executions
 
     @tornado.concurrent.run_on_executor
@@ -77,10 +123,31 @@ class Handler(base.BaseHandler):
         """
         return self._get_executions()
 
+    @tornado.gen.coroutine
+    def get_executions_async(self):
+        """Same as _get_executions(), with the asyncio datastore.
+
+        :return: executions info.
+        :rtype: dict
+        """
+        kwargs, error = self._get_executions_arguments()
+        if error:
+            raise tornado.gen.Return(error)
+
+        try:
+            executions = yield self.async_datastore.get_executions(**kwargs)
+        except ValueError as e:
+            self.set_status(400)
+            executions = {'error': str(e)}
+        raise tornado.gen.Return(executions)
+
     @tornado.gen.engine
     def get_executions_yield(self):
         """Wrapper for get_executions to run in async mode."""
-        return_json = yield self.get_executions()
+        if self.async_datastore:
+            return_json = yield self.get_executions_async()
+        else:
+            return_json = yield self.get_executions()
         self.finish(return_json)
 
     @tornado.web.removeslash
@@ -96,6 +163,10 @@ class Handler(base.BaseHandler):
                 - time_range_start - unix epoch timestamp. Default: 10 minutes ago.
                 These two parameters limit the executions to return:
                 time_range_start <= execution.scheduled_time <= time_range_end
+                It also takes two pagination parameters:
+                - limit - max number of executions to return. Default and upper bound:
+                  settings.EXECUTIONS_MAX_LIMIT
+                - cursor - next_cursor returned by the previous page.
 
             GET /api/v1/executions/{execution_id}  (when execution_id != None)
 
@@ -107,7 +178,7 @@ class Handler(base.BaseHandler):
             self.get_execution_yield(execution_id)
 
     def _run_job(self, job_id):
-        """Kicks off a job.
+        """Kicks off a job on the executor of the scheduler, without waiting for it to end.
 
         :param str job_id: Job id.
 
@@ -119,13 +190,12 @@ class Handler(base.BaseHandler):
         if not job:
             self.set_status(400)
             return {'error': 'Job not found: %s' % job_id}
-        job_name = utils.get_job_name(job)
-        args = utils.get_job_args(job)
-        kwargs = job.kwargs
-        scheduler = utils.import_from_path(settings.SCHEDULER_CLASS)
-        execution_id = scheduler.run_job(job_name, job_id, settings.DATABASE_CLASS,
-                                         self.datastore.db_config, self.datastore.table_names,
-                                         *args, **kwargs)
+        try:
+            execution_id = self.scheduler_manager.run_job_now(job)
+        except MaxInstancesReachedError:
+            self.set_status(400)
+            return {'error': 'Job already has %d running instances: %s' % (
+                job.max_instances, job_id)}
 
         # Audit log
         self.datastore.add_audit_log(job_id, job.name, constants.AUDIT_LOG_CUSTOM_RUN,
@@ -170,11 +240,84 @@ class Handler(base.BaseHandler):
         """
         self.run_job_yield(job_id)
 
+    def _stop_execution(self, execution_id):
+        """Asks a running execution to stop.
+
+        Only runs of jobs with a timeout can be stopped, as they're the ones running in a child
+        process that can be killed.
+
+        Execution writes queued by write-behind in this process are flushed first, so that a run
+        that just started is found running. Writes queued by process pool workers aren't.
+
+        :param str execution_id: Execution id.
+
+        :return: If success, a dictionary of the execution id and its state; otherwise, a
+            dictionary of error message.
+        :rtype: dict
+        """
+        self.datastore.flush_execution_writes()
+        execution = self.datastore.get_execution(execution_id)
+        if not execution:
+            self.set_status(400)
+            return {'error': 'Execution not found: %s' % execution_id}
+
+        if 'job' not in execution:
+            # Without its job, there's no telling whether it runs in a process that can be killed.
+            self.set_status(400)
+            return {'error': 'Execution can\'t be stopped, its job doesn\'t exist: %s' %
+                    execution_id}
+
+        scheduler = utils.import_from_path(settings.SCHEDULER_CLASS)
+        try:
+            job_class = utils.import_from_path(execution['job']['task_name'])
+            timeout = scheduler.get_job_timeout(job_class)
+        except Exception:
+            timeout = None
+        if timeout is None:
+            self.set_status(400)
+            return {'error': 'Execution can\'t be stopped, its job has no timeout: %s' %
+                    execution_id}
+
+        if not self.datastore.stop_execution(execution_id):
+            self.set_status(400)
+            return {'error': 'Execution is not running: %s' % execution_id}
+
+        return {
+            'execution_id': execution_id,
+            'state': constants.EXECUTION_STATUS_DICT[constants.EXECUTION_STATUS_STOPPING]}
+
+    @tornado.concurrent.run_on_executor
+    def stop_execution(self, execution_id):
+        """Wrapper for _stop_execution() to run on threaded executor.
+
+        :param str execution_id: Execution id.
+
+        :return: A dictionary of the execution id and its state.
+        :rtype: dict
+        """
+        return self._stop_execution(execution_id)
+
+    @tornado.gen.engine
+    def stop_execution_yield(self, execution_id):
+        """Wrapper for stop_execution to run in async mode.
+
+        :param str execution_id: Execution id.
+        """
+        return_json = yield self.stop_execution(execution_id)
+        self.finish(return_json)
+
     @tornado.web.removeslash
-    def delete(self, job_id):
+    @tornado.web.asynchronous
+    @tornado.gen.engine
+    def delete(self, execution_id):
         """Stops a job execution.
 
         Handles an endpoint:
-            POST /api/v1/executions
+            DELETE /api/v1/executions/{execution_id}
+
+        The execution is moved to the stopping state, and then to the stopped state once the
+        worker running it killed it.
+
+        :param str execution_id: Execution id.
         """
-        raise tornado.web.HTTPError(501, 'Not implemented yet.')
+        self.stop_execution_yield(execution_id)
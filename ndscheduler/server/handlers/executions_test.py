@@ -2,14 +2,29 @@
 
 import datetime
 import json
+import os
+import shutil
+import tempfile
+import unittest
 
+import mock
 import tornado.testing
+from apscheduler.schedulers.blocking import BlockingScheduler
 
+from ndscheduler import settings
 from ndscheduler.corescheduler import constants
 from ndscheduler.corescheduler import scheduler_manager
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.corescheduler.datastore.testing import make_job
 from ndscheduler.server import server
+from ndscheduler.server.handlers import execution_stats
 from ndscheduler.server.handlers import executions
 
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
 
 def mock_get_executions_yield(self):
     return_json = self._get_executions()
@@ -21,6 +36,16 @@ def mock_get_execution_yield(self, execution_id):
     self.finish(return_json)
 
 
+def mock_stop_execution_yield(self, execution_id):
+    return_json = self._stop_execution(execution_id)
+    self.finish(return_json)
+
+
+def mock_get_stats_yield(self):
+    return_json = self._get_stats()
+    self.finish(return_json)
+
+
 class ExecutionsTest(tornado.testing.AsyncHTTPTestCase):
 
     def setUp(self, *args, **kwargs):
@@ -31,11 +56,17 @@ class ExecutionsTest(tornado.testing.AsyncHTTPTestCase):
         self.old_get_execution_yield = executions.Handler.get_execution_yield
         executions.Handler.get_executions_yield = mock_get_executions_yield
         executions.Handler.get_execution_yield = mock_get_execution_yield
+        self.old_stop_execution_yield = executions.Handler.stop_execution_yield
+        executions.Handler.stop_execution_yield = mock_stop_execution_yield
+        self.old_get_stats_yield = execution_stats.Handler.get_stats_yield
+        execution_stats.Handler.get_stats_yield = mock_get_stats_yield
 
     def tearDown(self, *args, **kwargs):
         self.server.stop_scheduler()
         executions.Handler.get_executions_yield = self.old_get_executions_yield
         executions.Handler.get_execution_yield = self.old_get_execution_yield
+        executions.Handler.stop_execution_yield = self.old_stop_execution_yield
+        execution_stats.Handler.get_stats_yield = self.old_get_stats_yield
         super(ExecutionsTest, self).tearDown(*args, **kwargs)
 
     def get_app(self):
@@ -79,3 +110,169 @@ class ExecutionsTest(tornado.testing.AsyncHTTPTestCase):
             two_minutes_later.isoformat()))
         return_info = json.loads(response.body.decode())
         self.assertEqual(return_info['executions'][0]['execution_id'], execution1['eid'])
+
+    def test_stop_execution(self):
+        datastore = self.scheduler.get_datastore()
+        datastore.add_job(make_job(
+            BlockingScheduler(), '5678',
+            job_class_string='ndscheduler.corescheduler.core.base_test.KillableJob'))
+        datastore.add_execution('1234', '5678', state=constants.EXECUTION_STATUS_RUNNING)
+
+        url = self.EXECUTIONS_URL + '/1234'
+        response = self.fetch(url, method='DELETE')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(json.loads(response.body.decode()),
+                         {'execution_id': '1234', 'state': 'stopping'})
+        self.assertEqual(datastore.get_execution_state('1234'),
+                         constants.EXECUTION_STATUS_STOPPING)
+
+        # Not running anymore
+        self.assertEqual(self.fetch(url, method='DELETE').code, 400)
+        self.assertEqual(self.fetch(self.EXECUTIONS_URL + '/missing', method='DELETE').code, 400)
+
+    def test_stop_execution_of_job_without_timeout(self):
+        datastore = self.scheduler.get_datastore()
+        datastore.add_job(make_job(BlockingScheduler(), '5678'))
+        datastore.add_execution('1234', '5678', state=constants.EXECUTION_STATUS_RUNNING)
+        # The job of this one was deleted.
+        datastore.add_execution('1235', 'deleted', state=constants.EXECUTION_STATUS_RUNNING)
+
+        for execution_id in ('1234', '1235'):
+            response = self.fetch(self.EXECUTIONS_URL + '/' + execution_id, method='DELETE')
+            self.assertEqual(response.code, 400)
+            self.assertEqual(datastore.get_execution_state(execution_id),
+                             constants.EXECUTION_STATUS_RUNNING)
+
+    def test_stop_execution_with_write_behind(self):
+        datastore = self.scheduler.get_datastore()
+        datastore.add_job(make_job(
+            BlockingScheduler(), '5678',
+            job_class_string='ndscheduler.corescheduler.core.base_test.KillableJob'))
+        with mock.patch.object(datastore, 'flush_execution_writes') as flush:
+            # Still queued, until it's flushed.
+            flush.side_effect = lambda: datastore.add_execution(
+                '1234', '5678', state=constants.EXECUTION_STATUS_RUNNING)
+            response = self.fetch(self.EXECUTIONS_URL + '/1234', method='DELETE')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(datastore.get_execution_state('1234'),
+                         constants.EXECUTION_STATUS_STOPPING)
+
+    def test_get_executions_paginated(self):
+        datastore = self.scheduler.get_datastore()
+        now = datetime.datetime.utcnow()
+        for i in range(3):
+            datastore.add_execution('eid%d' % i, '5678', constants.EXECUTION_STATUS_SCHEDULED,
+                                    scheduled_time=now,
+                                    updated_time=now + datetime.timedelta(seconds=i))
+        url = self.EXECUTIONS_URL + '?time_range_end=%s&limit=2' % (
+            (now + datetime.timedelta(minutes=2)).isoformat())
+        response = self.fetch(url)
+        return_info = json.loads(response.body.decode())
+        self.assertEqual([e['execution_id'] for e in return_info['executions']],
+                         ['eid2', 'eid1'])
+
+        response = self.fetch(url + '&cursor=%s' % return_info['next_cursor'])
+        return_info = json.loads(response.body.decode())
+        self.assertEqual([e['execution_id'] for e in return_info['executions']], ['eid0'])
+        self.assertIsNone(return_info['next_cursor'])
+
+    def test_get_executions_limit_is_capped(self):
+        datastore = self.scheduler.get_datastore()
+        now = datetime.datetime.utcnow()
+        for i in range(3):
+            datastore.add_execution('eid%d' % i, '5678', constants.EXECUTION_STATUS_SCHEDULED,
+                                    scheduled_time=now)
+        url = self.EXECUTIONS_URL + '?time_range_end=%s&limit=1000000' % (
+            (now + datetime.timedelta(minutes=2)).isoformat())
+        with mock.patch.object(settings, 'EXECUTIONS_MAX_LIMIT', 2):
+            response = self.fetch(url)
+        return_info = json.loads(response.body.decode())
+        self.assertEqual(len(return_info['executions']), 2)
+        self.assertIsNotNone(return_info['next_cursor'])
+
+    def test_get_executions_bad_parameters(self):
+        response = self.fetch(self.EXECUTIONS_URL + '?limit=abc')
+        self.assertEqual(response.code, 400)
+        response = self.fetch(self.EXECUTIONS_URL + '?limit=0')
+        self.assertEqual(response.code, 400)
+        response = self.fetch(self.EXECUTIONS_URL + '?cursor=bogus')
+        self.assertEqual(response.code, 400)
+
+    def test_get_execution_stats(self):
+        datastore = self.scheduler.get_datastore()
+        now = datetime.datetime.utcnow()
+        for i, state in enumerate([constants.EXECUTION_STATUS_SUCCEEDED,
+                                   constants.EXECUTION_STATUS_SUCCEEDED,
+                                   constants.EXECUTION_STATUS_FAILED]):
+            datastore.add_execution('eid%d' % i, '5678', state, scheduled_time=now)
+        url = self.EXECUTIONS_URL + '/stats?time_range_end=%s' % (
+            (now + datetime.timedelta(minutes=2)).isoformat())
+        response = self.fetch(url)
+        return_info = json.loads(response.body.decode())
+        self.assertEqual(return_info['total'], 3)
+        self.assertEqual(return_info['states']['succeeded'], 2)
+        self.assertEqual(return_info['states']['failed'], 1)
+        self.assertNotIn('jobs', return_info)
+
+        response = self.fetch(url + '&group_by=job_id')
+        return_info = json.loads(response.body.decode())
+        self.assertEqual(return_info['jobs']['5678']['total'], 3)
+
+        response = self.fetch(url + '&group_by=state')
+        self.assertEqual(response.code, 400)
+
+
+@unittest.skipIf(aiosqlite is None, 'aiosqlite is not installed')
+class AsyncDatastoreExecutionsTest(tornado.testing.AsyncHTTPTestCase):
+    """Same endpoints, served by awaiting the asyncio datastore on the IOLoop."""
+
+    def setUp(self, *args, **kwargs):
+        # The datastore is a singleton, and this one is in a file.
+        self.tmp_dir = tempfile.mkdtemp()
+        DatastoreSqlite.destroy_instance()
+        super(AsyncDatastoreExecutionsTest, self).setUp(*args, **kwargs)
+        self.server.start_scheduler()
+        self.EXECUTIONS_URL = '/api/v1/executions'
+
+    def tearDown(self, *args, **kwargs):
+        self.server.stop_scheduler()
+        self.scheduler.get_datastore().engine.dispose()
+        DatastoreSqlite.destroy_instance()
+        super(AsyncDatastoreExecutionsTest, self).tearDown(*args, **kwargs)
+        shutil.rmtree(self.tmp_dir)
+
+    def get_app(self):
+        scp = 'ndscheduler.corescheduler.core.base.BaseScheduler'
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        self.scheduler = scheduler_manager.SchedulerManager(
+            scheduler_class_path=scp,
+            datastore_class_path=dcp,
+            db_config={'file_path': os.path.join(self.tmp_dir, 'datastore.db')},
+            async_datastore=True
+        )
+        self.server = server.SchedulerServer(self.scheduler)
+        return self.server.application
+
+    def test_get_executions(self):
+        datastore = self.scheduler.get_datastore()
+        now = datetime.datetime.utcnow()
+        datastore.add_execution('eid1', '5678', constants.EXECUTION_STATUS_SUCCEEDED,
+                                scheduled_time=now)
+        end = (now + datetime.timedelta(minutes=2)).isoformat()
+
+        with mock.patch.object(datastore, 'get_executions') as mock_get_executions:
+            response = self.fetch(self.EXECUTIONS_URL + '?time_range_end=%s' % end)
+        self.assertFalse(mock_get_executions.called)
+        return_info = json.loads(response.body.decode())
+        self.assertEqual([execution['execution_id'] for execution in return_info['executions']],
+                         ['eid1'])
+
+        response = self.fetch(self.EXECUTIONS_URL + '/eid1')
+        self.assertEqual(json.loads(response.body.decode())['execution_id'], 'eid1')
+        response = self.fetch(self.EXECUTIONS_URL + '/missing')
+        self.assertEqual(response.code, 400)
+        response = self.fetch(self.EXECUTIONS_URL + '?cursor=bogus')
+        self.assertEqual(response.code, 400)
+
+        response = self.fetch(self.EXECUTIONS_URL + '/stats?time_range_end=%s' % end)
+        self.assertEqual(json.loads(response.body.decode())['total'], 1)
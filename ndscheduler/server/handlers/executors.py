@@ -0,0 +1,16 @@
+"""Handler for endpoint of the utilization of pools of workers."""
+
+import tornado.web
+
+from ndscheduler.server.handlers import base
+
+
+class Handler(base.BaseHandler):
+
+    @tornado.web.removeslash
+    def get(self):
+        """Returns the utilization of each pool of workers running jobs.
+
+        Handles the endpoint GET /api/v1/executors.
+        """
+        self.finish({'executors': self.scheduler_manager.get_executor_stats()})
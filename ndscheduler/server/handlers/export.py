@@ -0,0 +1,127 @@
+"""Handlers for endpoints of streaming exports of executions and audit logs."""
+
+import json
+import zlib
+
+from concurrent import futures
+from datetime import datetime
+from datetime import timedelta
+
+import tornado.concurrent
+import tornado.gen
+import tornado.web
+
+from ndscheduler import settings
+from ndscheduler.server.handlers import base
+
+
+class BaseExportHandler(base.BaseHandler):
+    """Streams records as newline-delimited JSON, one chunk of rows at a time.
+
+    Memory use doesn't grow with the size of the export, and the first records are sent as soon
+    as the first chunk is read from the database.
+    """
+
+    # Name of the exported records, used in the file name.
+    NAME = None
+
+    def _iter_chunks(self, time_range_start, time_range_end):
+        """Returns a generator of lists of records in a time range.
+
+        :param str time_range_start: ISO format for time range starting point.
+        :param str time_range_end: ISO for time range ending point.
+        :rtype: generator
+        """
+        raise NotImplementedError('Please implement this function.')
+
+    @tornado.concurrent.run_on_executor(executor='export_executor')
+    def _next_chunk(self, chunks):
+        """Reads the next chunk of records. This is a blocking operation.
+
+        :param generator chunks: generator returned by _iter_chunks().
+        :return: a list of records, or None if there are no more.
+        :rtype: list
+        """
+        return next(chunks, None)
+
+    @tornado.concurrent.run_on_executor(executor='export_executor')
+    def _close_chunks(self, chunks):
+        """Releases the database connection of chunks, even if it wasn't fully read.
+
+        :param generator chunks: generator returned by _iter_chunks().
+        """
+        chunks.close()
+
+    @tornado.web.removeslash
+    @tornado.gen.coroutine
+    def get(self):
+        """Exports records as newline-delimited JSON.
+
+        Handles the endpoints GET /api/v1/executions/export and GET /api/v1/logs/export.
+            It takes the same time range parameters as GET /api/v1/executions, and:
+            - gzip - 'true' to gzip the export.
+        """
+        now = datetime.utcnow()
+        time_range_end = self.get_argument('time_range_end', now.isoformat())
+        ten_minutes_ago = now - timedelta(minutes=10)
+        time_range_start = self.get_argument('time_range_start', ten_minutes_ago.isoformat())
+        use_gzip = self.get_argument('gzip', 'false') == 'true'
+
+        # All chunks are read through one database connection, which some drivers only allow
+        # on the thread that opened it.
+        self.export_executor = futures.ThreadPoolExecutor(max_workers=1)
+        chunks = self._iter_chunks(time_range_start, time_range_end)
+        try:
+            try:
+                chunk = yield self._next_chunk(chunks)
+            except ValueError as e:
+                self.set_status(400)
+                self.finish({'error': str(e)})
+                return
+
+            file_name = '%s.ndjson' % self.NAME
+            compressor = None
+            if use_gzip:
+                compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED,
+                                              16 + zlib.MAX_WBITS)
+                file_name += '.gz'
+                self.set_header('Content-Type', 'application/gzip')
+            else:
+                self.set_header('Content-Type', 'application/x-ndjson')
+            self.set_header('Content-Disposition', 'attachment; filename="%s"' % file_name)
+
+            while chunk:
+                data = ''.join(json.dumps(record) + '\n' for record in chunk).encode('utf-8')
+                if compressor:
+                    # So that clients can decompress what they got so far.
+                    data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                self.write(data)
+                # Waits for the chunk to be sent, so that a slow client doesn't make the export
+                # pile up in memory.
+                yield self.flush()
+                chunk = yield self._next_chunk(chunks)
+
+            if compressor:
+                self.write(compressor.flush())
+            self.finish()
+        finally:
+            yield self._close_chunks(chunks)
+            self.export_executor.shutdown(wait=False)
+
+
+class ExecutionsHandler(BaseExportHandler):
+
+    NAME = 'executions'
+
+    def _iter_chunks(self, time_range_start, time_range_end):
+        return self.datastore.iter_executions(time_range_start, time_range_end,
+                                              settings.EXPORT_CHUNK_SIZE)
+
+
+class AuditLogsHandler(BaseExportHandler):
+
+    NAME = 'logs'
+
+    def _iter_chunks(self, time_range_start, time_range_end):
+        return self.datastore.iter_audit_logs(time_range_start, time_range_end,
+                                              settings.EXPORT_CHUNK_SIZE)
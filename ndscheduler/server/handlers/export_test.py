@@ -0,0 +1,93 @@
+"""Unit tests for export endpoints."""
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import zlib
+
+import mock
+import tornado.testing
+
+from ndscheduler import settings
+from ndscheduler.corescheduler import constants
+from ndscheduler.corescheduler import scheduler_manager
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.server import server
+
+
+class ExportTest(tornado.testing.AsyncHTTPTestCase):
+
+    def setUp(self, *args, **kwargs):
+        # Exports read the datastore on their own thread, so it can't be an in-memory database,
+        # which is per thread. The datastore is a singleton.
+        self.tmp_dir = tempfile.mkdtemp()
+        DatastoreSqlite.destroy_instance()
+        super(ExportTest, self).setUp(*args, **kwargs)
+        self.server.start_scheduler()
+        self.datastore = self.scheduler.get_datastore()
+        self.now = datetime.datetime.utcnow()
+        self.time_range = 'time_range_start=%s&time_range_end=%s' % (
+            (self.now - datetime.timedelta(minutes=5)).isoformat(),
+            (self.now + datetime.timedelta(minutes=5)).isoformat())
+
+    def tearDown(self, *args, **kwargs):
+        self.server.stop_scheduler()
+        self.datastore.engine.dispose()
+        DatastoreSqlite.destroy_instance()
+        super(ExportTest, self).tearDown(*args, **kwargs)
+        shutil.rmtree(self.tmp_dir)
+
+    def get_app(self):
+        scp = 'ndscheduler.corescheduler.core.base.BaseScheduler'
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        self.scheduler = scheduler_manager.SchedulerManager(
+            scheduler_class_path=scp,
+            datastore_class_path=dcp,
+            db_config={'file_path': os.path.join(self.tmp_dir, 'datastore.db')}
+        )
+        self.server = server.SchedulerServer(self.scheduler)
+        return self.server.application
+
+    def _add_executions(self, count):
+        for i in range(count):
+            self.datastore.add_execution('eid%d' % i, '5678', constants.EXECUTION_STATUS_SUCCEEDED,
+                                         scheduled_time=self.now,
+                                         updated_time=self.now + datetime.timedelta(seconds=i))
+
+    def test_export_executions(self):
+        self._add_executions(5)
+        with mock.patch.object(settings, 'EXPORT_CHUNK_SIZE', 2):
+            response = self.fetch('/api/v1/executions/export?' + self.time_range)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+        lines = response.body.decode().splitlines()
+        self.assertEqual([json.loads(line)['execution_id'] for line in lines],
+                         ['eid4', 'eid3', 'eid2', 'eid1', 'eid0'])
+
+    def test_export_executions_gzip(self):
+        self._add_executions(3)
+        with mock.patch.object(settings, 'EXPORT_CHUNK_SIZE', 2):
+            response = self.fetch('/api/v1/executions/export?gzip=true&' + self.time_range,
+                                  decompress_response=False)
+        self.assertEqual(response.headers['Content-Type'], 'application/gzip')
+        self.assertIn('executions.ndjson.gz', response.headers['Content-Disposition'])
+        lines = zlib.decompress(response.body, 16 + zlib.MAX_WBITS).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_export_empty(self):
+        response = self.fetch('/api/v1/executions/export?' + self.time_range)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, b'')
+
+    def test_export_bad_time_range(self):
+        response = self.fetch('/api/v1/executions/export?time_range_start=abc')
+        self.assertEqual(response.code, 400)
+
+    def test_export_audit_logs(self):
+        self.datastore.add_audit_log('5678', 'job', constants.AUDIT_LOG_ADDED, user='foo')
+        response = self.fetch('/api/v1/logs/export?' + self.time_range)
+        lines = response.body.decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['user'], 'foo')
@@ -1,9 +1,6 @@
 """Serves the single page app web ui."""
 
-import json
-
 from ndscheduler import settings
-from ndscheduler import utils
 from ndscheduler.server.handlers import base
 
 
@@ -11,7 +8,8 @@ class Handler(base.BaseHandler):
     """Index page request handler."""
 
     def get(self):
-        """Serve up the single page app for scheduler dashboard."""
+        """Serve up the single page app for scheduler dashboard.
 
-        meta_info = utils.get_all_available_jobs()
-        self.render(settings.APP_INDEX_PAGE, jobs_meta_info=json.dumps(meta_info))
+        The web ui loads the job classes from GET /api/v1/job_classes.
+        """
+        self.render(settings.APP_INDEX_PAGE)
@@ -0,0 +1,37 @@
+"""Handler for endpoint of the available job classes."""
+
+import tornado.concurrent
+import tornado.gen
+import tornado.web
+
+from ndscheduler import utils
+from ndscheduler.server.handlers import base
+
+
+class Handler(base.BaseHandler):
+
+    @tornado.concurrent.run_on_executor
+    def get_job_classes(self):
+        """Wrapper for utils.get_available_jobs_json() to run on threaded executor, as it
+        imports job modules when they changed.
+
+        :return: a tuple of (JSON string, ETag string)
+        :rtype: tuple
+        """
+        return utils.get_available_jobs_json()
+
+    @tornado.web.removeslash
+    @tornado.gen.coroutine
+    def get(self):
+        """Returns the meta info of the job classes in settings.JOB_CLASS_PACKAGES.
+
+        Handles the endpoint GET /api/v1/job_classes.
+        """
+        body, etag = yield self.get_job_classes()
+        self.set_header('Etag', etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.finish(body)
@@ -0,0 +1,124 @@
+"""Unit tests for job classes endpoint."""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import mock
+import tornado.testing
+
+from ndscheduler import settings
+from ndscheduler import utils
+from ndscheduler.corescheduler import scheduler_manager
+from ndscheduler.corescheduler.datastore.providers.sqlite import DatastoreSqlite
+from ndscheduler.server import server
+
+JOB_MODULE = '''from ndscheduler.corescheduler.job import JobBase
+
+
+class AJob(JobBase):
+
+    @classmethod
+    def meta_info(cls):
+        return dict(super(AJob, cls).meta_info(), notes=%r)
+'''
+
+
+class JobClassesTest(tornado.testing.AsyncHTTPTestCase):
+
+    def setUp(self, *args, **kwargs):
+        super(JobClassesTest, self).setUp(*args, **kwargs)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        package_dir = os.path.join(tmp_dir, 'registry_test_jobs')
+        os.mkdir(package_dir)
+        open(os.path.join(package_dir, '__init__.py'), 'w').close()
+        self.module_file = os.path.join(package_dir, 'a_job.py')
+        self._write_job_module('v1')
+
+        sys.path.insert(0, tmp_dir)
+        self.addCleanup(sys.path.remove, tmp_dir)
+        for module_name in ('registry_test_jobs', 'registry_test_jobs.a_job'):
+            self.addCleanup(sys.modules.pop, module_name, None)
+        patcher = mock.patch.object(settings, 'JOB_CLASS_PACKAGES', ['registry_test_jobs'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Look for changed modules on every request, unless a test says otherwise.
+        patcher = mock.patch.object(settings, 'JOB_CLASSES_RESCAN_INTERVAL_SEC', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(utils._job_classes.update, mtimes=None, json=None, etag=None,
+                        scanned_at=None)
+        self.URL = '/api/v1/job_classes'
+
+    def tearDown(self, *args, **kwargs):
+        DatastoreSqlite.destroy_instance()
+        super(JobClassesTest, self).tearDown(*args, **kwargs)
+
+    def get_app(self):
+        scp = 'ndscheduler.corescheduler.core.base.BaseScheduler'
+        dcp = 'ndscheduler.corescheduler.datastore.providers.sqlite.DatastoreSqlite'
+        self.scheduler = scheduler_manager.SchedulerManager(
+            scheduler_class_path=scp,
+            datastore_class_path=dcp
+        )
+        self.server = server.SchedulerServer(self.scheduler)
+        return self.server.application
+
+    def _write_job_module(self, notes, mtime_offset=0):
+        with open(self.module_file, 'w') as f:
+            f.write(JOB_MODULE % notes)
+        mtime = os.path.getmtime(self.module_file) + mtime_offset
+        os.utime(self.module_file, (mtime, mtime))
+
+    def _get_notes(self, response):
+        for meta_info in json.loads(response.body.decode()):
+            if meta_info['job_class_string'] == 'registry_test_jobs.a_job.AJob':
+                return meta_info['notes']
+
+    def test_get_job_classes(self):
+        response = self.fetch(self.URL)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(self._get_notes(response), 'v1')
+        etag = response.headers['Etag']
+
+        with mock.patch.object(utils, 'get_all_available_jobs') as mock_get_jobs:
+            response = self.fetch(self.URL, headers={'If-None-Match': etag})
+            self.assertEqual(response.code, 304)
+            response = self.fetch(self.URL)
+            self.assertEqual(response.code, 200)
+            self.assertEqual(self._get_notes(response), 'v1')
+            # Served from the cache
+            self.assertFalse(mock_get_jobs.called)
+
+        # Changed modules aren't reloaded, unless JOB_CLASS_RELOAD_ON_CHANGE is set.
+        self._write_job_module('v2', mtime_offset=10)
+        response = self.fetch(self.URL, headers={'If-None-Match': etag})
+        self.assertEqual(response.code, 304)
+
+        self._write_job_module('v3', mtime_offset=20)
+        with mock.patch.object(settings, 'JOB_CLASS_RELOAD_ON_CHANGE', True):
+            response = self.fetch(self.URL, headers={'If-None-Match': etag})
+        self.assertEqual(response.code, 200)
+        self.assertEqual(self._get_notes(response), 'v3')
+        self.assertNotEqual(response.headers['Etag'], etag)
+
+    def test_rescan_interval(self):
+        self.assertEqual(self._get_notes(self.fetch(self.URL)), 'v1')
+
+        self._write_job_module('v2', mtime_offset=10)
+        with mock.patch.object(settings, 'JOB_CLASSES_RESCAN_INTERVAL_SEC', 60), \
+                mock.patch.object(settings, 'JOB_CLASS_RELOAD_ON_CHANGE', True), \
+                mock.patch.object(utils, '_get_job_module_files') as mock_get_files:
+            self.assertEqual(self._get_notes(self.fetch(self.URL)), 'v1')
+            # Modules aren't even listed until the interval passes.
+            self.assertFalse(mock_get_files.called)
+
+        with mock.patch.object(settings, 'JOB_CLASS_RELOAD_ON_CHANGE', True), \
+                mock.patch.object(utils, '_get_job_module_files',
+                                  wraps=utils._get_job_module_files) as mock_get_files:
+            self.assertEqual(self._get_notes(self.fetch(self.URL)), 'v2')
+            # The modules listed to check their mtimes are the ones rebuilt from.
+            self.assertEqual(mock_get_files.call_count, 1)
@@ -5,6 +5,7 @@ import json
 import tornado.concurrent
 import tornado.gen
 import tornado.web
+from apscheduler.jobstores.base import JobLookupError
 
 from ndscheduler.corescheduler import constants
 from ndscheduler.corescheduler import utils
@@ -14,15 +15,28 @@ from ndscheduler.server.handlers import base
 class Handler(base.BaseHandler):
 
     def _get_jobs(self):
-        """Returns a dictionary for all jobs info.
+        """Returns all jobs info from the job listing cache.
 
-        It's a blocking operation.
+        It's a blocking operation if jobs changed since the last call.
+
+        :return: a tuple of (etag, json string of {'jobs': [...]}).
+        :rtype: tuple
         """
-        jobs = self.scheduler_manager.get_jobs()
-        return_json = []
-        for job in jobs:
-            return_json.append(self._build_job_dict(job))
-        return {'jobs': return_json}
+        return self.scheduler_manager.get_job_listing()
+
+    def _finish_jobs(self, etag, body):
+        """Sends the job listing, or 304 Not Modified if the client already has it.
+
+        :param str etag: ETag of the listing.
+        :param str body: json string of the listing.
+        """
+        self.set_header('Etag', etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.finish(body)
 
     def _build_job_dict(self, job):
         """Transforms apscheduler's job structure to a python dictionary.
@@ -31,38 +45,22 @@ class Handler(base.BaseHandler):
         :return: dictionary for job info
         :rtype: dict
         """
-        if job.next_run_time:
-            next_run_time = job.next_run_time.isoformat()
-        else:
-            next_run_time = ''
-        return_dict = {
-            'job_id': job.id,
-            'name': job.name,
-            'next_run_time': next_run_time,
-            'job_class_string': utils.get_job_name(job),
-            'pub_args': utils.get_job_args(job)}
-
-        return_dict.update(utils.get_cron_strings(job))
-        return return_dict
+        return utils.get_job_dict(job)
 
     @tornado.concurrent.run_on_executor
     def get_jobs(self):
         """Wrapper to run _get_jobs() on a thread executor.
 
-        :return: dictionary for jobs
-            A dictionary of jobs, e.g., :
-            {
-                jobs: [...]
-            }
-        :rtype: dict
+        :return: a tuple of (etag, json string of {'jobs': [...]}).
+        :rtype: tuple
         """
         return self._get_jobs()
 
     @tornado.gen.engine
     def get_jobs_yield(self):
         """Wrapper for get_jobs in async mode."""
-        return_json = yield self.get_jobs()
-        self.finish(return_json)
+        etag, body = yield self.get_jobs()
+        self._finish_jobs(etag, body)
 
     def _get_job(self, job_id):
         """Returns a dictionary for a job info.
@@ -116,17 +114,14 @@ class Handler(base.BaseHandler):
         else:
             self.get_job_yield(job_id)
 
-    @tornado.web.removeslash
-    def post(self):
+    def _add_job(self):
         """Adds a job.
 
         add_job() is a non-blocking operation, but audit log is a blocking operation.
 
-        Handles an endpoint:
-            POST /api/v1/jobs
+        :return: A dictionary with the only field of job_id.
+        :rtype: dict
         """
-        self._validate_post_data()
-
         # This is non-blocking function.
         # It returns job_id immediately.
         job_id = self.scheduler_manager.add_job(**self.json_args)
@@ -135,10 +130,31 @@ class Handler(base.BaseHandler):
         self.datastore.add_audit_log(job_id, self.json_args['name'],
                                      constants.AUDIT_LOG_ADDED, user=self.username)
 
-        response = {
-            'job_id': job_id}
+        return {'job_id': job_id}
+
+    @tornado.concurrent.run_on_executor
+    def add_job(self):
+        """Wrapper for _add_job() to run on a threaded executor."""
+        return self._add_job()
+
+    @tornado.gen.engine
+    def add_job_yield(self):
+        """Wrapper for add_job() to run in async mode."""
+        response = yield self.add_job()
         self.set_status(201)
-        self.write(response)
+        self.finish(response)
+
+    @tornado.web.removeslash
+    @tornado.web.asynchronous
+    @tornado.gen.engine
+    def post(self):
+        """Adds a job.
+
+        Handles an endpoint:
+            POST /api/v1/jobs
+        """
+        self._validate_post_data()
+        self.add_job_yield()
 
     def _delete_job(self, job_id):
         """Deletes a job.
@@ -211,6 +227,8 @@ class Handler(base.BaseHandler):
             'name',
             'job_class_string',
             'pub_args',
+            'executor',
+            'stagger_sec',
             'minute',
             'hour',
             'day',
@@ -274,18 +292,15 @@ class Handler(base.BaseHandler):
         self.set_status(200)
         self.finish(response)
 
-    @tornado.web.removeslash
-    def patch(self, job_id):
+    def _pause_job(self, job_id):
         """Pauses a job.
 
         pause_job() is a non-blocking operation, but audit log is a blocking operation.
 
-        Handles an endpoint:
-            PATCH /api/v1/jobs/{job_id}
-
         :param str job_id: Job id.
+        :return: A dictionary with the only field of job_id.
+        :rtype: dict
         """
-
         # This is non-blocking function.
         # It returns job_id immediately.
         self.scheduler_manager.pause_job(job_id)
@@ -296,23 +311,48 @@ class Handler(base.BaseHandler):
         self.datastore.add_audit_log(job_id, job['name'],
                                      constants.AUDIT_LOG_PAUSED, user=self.username)
 
-        response = {
-            'job_id': job_id}
+        return {'job_id': job_id}
+
+    @tornado.concurrent.run_on_executor
+    def pause_job(self, job_id):
+        """Wrapper for _pause_job() to run on a threaded executor.
+
+        :param str job_id: Job id.
+        """
+        return self._pause_job(job_id)
+
+    @tornado.gen.engine
+    def pause_job_yield(self, job_id):
+        """Wrapper for pause_job() to run in async mode.
+
+        :param str job_id: Job id.
+        """
+        response = yield self.pause_job(job_id)
         self.set_status(200)
-        self.write(response)
+        self.finish(response)
 
     @tornado.web.removeslash
-    def options(self, job_id):
-        """Resumes a job.
-
-        resume_job() is a non-blocking operation, but audit log is a blocking operation.
+    @tornado.web.asynchronous
+    @tornado.gen.engine
+    def patch(self, job_id):
+        """Pauses a job.
 
         Handles an endpoint:
-            OPTIONS /api/v1/jobs/{job_id}
+            PATCH /api/v1/jobs/{job_id}
 
         :param str job_id: Job id.
         """
+        self.pause_job_yield(job_id)
 
+    def _resume_job(self, job_id):
+        """Resumes a job.
+
+        resume_job() is a non-blocking operation, but audit log is a blocking operation.
+
+        :param str job_id: Job id.
+        :return: A dictionary with the only field of job_id.
+        :rtype: dict
+        """
         # This is non-blocking function.
         # It returns job_id immediately.
         self.scheduler_manager.resume_job(job_id)
@@ -322,10 +362,38 @@ class Handler(base.BaseHandler):
         self.datastore.add_audit_log(job_id, job['name'], constants.AUDIT_LOG_RESUMED,
                                      user=self.username)
 
-        response = {
-            'job_id': job_id}
+        return {'job_id': job_id}
+
+    @tornado.concurrent.run_on_executor
+    def resume_job(self, job_id):
+        """Wrapper for _resume_job() to run on a threaded executor.
+
+        :param str job_id: Job id.
+        """
+        return self._resume_job(job_id)
+
+    @tornado.gen.engine
+    def resume_job_yield(self, job_id):
+        """Wrapper for resume_job() to run in async mode.
+
+        :param str job_id: Job id.
+        """
+        response = yield self.resume_job(job_id)
         self.set_status(200)
-        self.write(response)
+        self.finish(response)
+
+    @tornado.web.removeslash
+    @tornado.web.asynchronous
+    @tornado.gen.engine
+    def options(self, job_id):
+        """Resumes a job.
+
+        Handles an endpoint:
+            OPTIONS /api/v1/jobs/{job_id}
+
+        :param str job_id: Job id.
+        """
+        self.resume_job_yield(job_id)
 
     def _validate_post_data(self):
         """Validates POST data for adding a job.
@@ -334,20 +402,247 @@ class Handler(base.BaseHandler):
         :return: a dictionary that serves as kwargs for Scheduler.add_job()
         :rtype: dict
 
+        :raises: HTTPError(400: Bad arguments).
+        """
+        self._validate_job_data(self.json_args)
+
+    def _validate_job_data(self, job_data):
+        """Validates the fields of a job to add or modify.
+
+        :param dict job_data: kwargs for Scheduler.add_job() or Scheduler.modify_job().
+
         :raises: HTTPError(400: Bad arguments).
         """
         all_required_fields = ['name', 'job_class_string']
         for field in all_required_fields:
-            if field not in self.json_args:
+            if field not in job_data:
                 raise tornado.web.HTTPError(400, reason='Require this parameter: %s' % field)
 
         at_least_one_required_fields = ['month', 'day', 'hour', 'minute', 'day_of_week']
         valid_cron_string = False
         for field in at_least_one_required_fields:
-            if field in self.json_args:
+            if field in job_data:
                 valid_cron_string = True
                 break
 
         if not valid_cron_string:
             raise tornado.web.HTTPError(400, reason=('Require at least one of following parameters:'
                                                      ' %s' % str(at_least_one_required_fields)))
+
+        if ('executor' in job_data and
+                job_data['executor'] not in self.scheduler_manager.executor_pools):
+            raise tornado.web.HTTPError(400, reason='Unknown executor: %s' % job_data['executor'])
+
+        stagger_window_sec = job_data.get('stagger_window_sec')
+        if stagger_window_sec is not None and (
+                isinstance(stagger_window_sec, bool) or
+                not isinstance(stagger_window_sec, int) or stagger_window_sec < 0):
+            raise tornado.web.HTTPError(
+                400, reason='stagger_window_sec must be a non-negative integer')
+
+
+class BulkHandler(Handler):
+    """Adds, modifies or deletes many jobs at once.
+
+    Each request changes the jobs in one transaction, wakes up the scheduler once, and writes
+    all audit logs with one statement.
+    """
+
+    SUPPORTED_METHODS = ('POST', 'PUT', 'DELETE')
+
+    def _get_bulk_data(self, field):
+        """Returns a non-empty list from the JSON body.
+
+        :param str field: Name of the list, e.g., jobs.
+        :return: The list.
+        :rtype: list
+
+        :raises: HTTPError(400: Bad arguments).
+        """
+        items = (self.json_args or {}).get(field)
+        if not items or not isinstance(items, list):
+            raise tornado.web.HTTPError(400, reason='Require a non-empty list: %s' % field)
+        return items
+
+    def _get_job_dicts(self, job_ids):
+        """Returns dictionaries of jobs info, loading all jobs at once.
+
+        It's a blocking operation.
+
+        :param list job_ids: Job ids.
+        :return: A tuple of (dictionary mapping job id to job info, None), or (None, a dictionary
+            of error message) if a job doesn't exist.
+        :rtype: tuple
+        """
+        jobs = self.datastore.lookup_jobs(job_ids)
+        missing_job_ids = sorted(set(job_ids) - set(jobs))
+        if missing_job_ids:
+            self.set_status(400)
+            return None, {'error': 'Jobs not found: %s' % ', '.join(missing_job_ids)}
+        return dict((job_id, self._build_job_dict(job)) for job_id, job in jobs.items()), None
+
+    def _add_jobs(self, jobs):
+        """Adds jobs.
+
+        It's a blocking operation.
+
+        :param list jobs: kwargs for Scheduler.add_job() of each job.
+        :return: A dictionary with the only field of job_ids, in the order of jobs, or a
+            dictionary of error message if a job is invalid, e.g., has a bad cron field.
+        :rtype: dict
+        """
+        try:
+            job_ids = self.scheduler_manager.add_jobs(jobs)
+        except ValueError as e:
+            self.set_status(400)
+            return {'error': str(e)}
+
+        self.datastore.add_audit_logs([
+            {'job_id': job_id, 'job_name': job['name'], 'event': constants.AUDIT_LOG_ADDED,
+             'user': self.username}
+            for job_id, job in zip(job_ids, jobs)])
+
+        return {'job_ids': job_ids}
+
+    @tornado.concurrent.run_on_executor
+    def add_jobs(self, jobs):
+        """Wrapper for _add_jobs() to run on a threaded executor."""
+        return self._add_jobs(jobs)
+
+    @tornado.gen.engine
+    def add_jobs_yield(self, jobs):
+        """Wrapper for add_jobs() to run in async mode."""
+        response = yield self.add_jobs(jobs)
+        if 'error' not in response:
+            self.set_status(201)
+        self.finish(response)
+
+    @tornado.web.removeslash
+    @tornado.web.asynchronous
+    @tornado.gen.engine
+    def post(self):
+        """Adds jobs.
+
+        Handles an endpoint:
+            POST /api/v1/jobs/bulk
+        """
+        jobs = self._get_bulk_data('jobs')
+        for job in jobs:
+            self._validate_job_data(job)
+        self.add_jobs_yield(jobs)
+
+    def _modify_jobs(self, jobs):
+        """Modifies jobs.
+
+        It's a blocking operation.
+
+        :param list jobs: kwargs for Scheduler.modify_job() of each job, plus its job_id.
+        :return: A dictionary with the only field of job_ids.
+        :rtype: dict
+        """
+        changes = dict((job['job_id'], dict((key, value) for key, value in job.items()
+                                            if key != 'job_id'))
+                       for job in jobs)
+        old_jobs, error = self._get_job_dicts(list(changes))
+        if error:
+            return error
+
+        try:
+            self.scheduler_manager.modify_jobs(changes)
+        except JobLookupError as e:
+            # Deleted in the meantime.
+            self.set_status(400)
+            return {'error': str(e)}
+        except ValueError as e:
+            # E.g., a bad cron field.
+            self.set_status(400)
+            return {'error': str(e)}
+
+        new_jobs, error = self._get_job_dicts(list(changes))
+        if error:
+            return error
+
+        # Audit log
+        self.datastore.add_audit_logs([
+            {'job_id': job_id, 'job_name': job['name'], 'event': constants.AUDIT_LOG_MODIFIED,
+             'user': self.username,
+             'description': self._generate_description_for_modify(old_jobs[job_id], job)}
+            for job_id, job in new_jobs.items()])
+
+        return {'job_ids': [job['job_id'] for job in jobs]}
+
+    @tornado.concurrent.run_on_executor
+    def modify_jobs(self, jobs):
+        """Wrapper for _modify_jobs() to run on a threaded executor."""
+        return self._modify_jobs(jobs)
+
+    @tornado.gen.engine
+    def modify_jobs_yield(self, jobs):
+        """Wrapper for modify_jobs() to run in async mode."""
+        response = yield self.modify_jobs(jobs)
+        self.finish(response)
+
+    @tornado.web.removeslash
+    @tornado.web.asynchronous
+    @tornado.gen.engine
+    def put(self):
+        """Modifies jobs.
+
+        Handles an endpoint:
+            PUT /api/v1/jobs/bulk
+        """
+        jobs = self._get_bulk_data('jobs')
+        for job in jobs:
+            if 'job_id' not in job:
+                raise tornado.web.HTTPError(400, reason='Require this parameter: job_id')
+            self._validate_job_data(job)
+        self.modify_jobs_yield(jobs)
+
+    def _delete_jobs(self, job_ids):
+        """Deletes jobs.
+
+        It's a blocking operation.
+
+        :param list job_ids: Job ids.
+        :return: A dictionary with the only field of job_ids.
+        :rtype: dict
+        """
+        jobs, error = self._get_job_dicts(job_ids)
+        if error:
+            return error
+
+        try:
+            self.scheduler_manager.remove_jobs(job_ids)
+        except JobLookupError as e:
+            # Deleted in the meantime.
+            self.set_status(400)
+            return {'error': str(e)}
+
+        self.datastore.add_audit_logs([
+            {'job_id': job_id, 'job_name': job['name'], 'event': constants.AUDIT_LOG_DELETED,
+             'user': self.username, 'description': json.dumps(job)}
+            for job_id, job in jobs.items()])
+
+        return {'job_ids': job_ids}
+
+    @tornado.concurrent.run_on_executor
+    def delete_jobs(self, job_ids):
+        """Wrapper for _delete_jobs() to run on a threaded executor."""
+        return self._delete_jobs(job_ids)
+
+    @tornado.gen.engine
+    def delete_jobs_yield(self, job_ids):
+        """Wrapper for delete_jobs() to run in async mode."""
+        response = yield self.delete_jobs(job_ids)
+        self.finish(response)
+
+    @tornado.web.removeslash
+    @tornado.web.asynchronous
+    @tornado.gen.engine
+    def delete(self):
+        """Deletes jobs.
+
+        Handles an endpoint:
+            DELETE /api/v1/jobs/bulk
+        """
+        self.delete_jobs_yield(self._get_bulk_data('job_ids'))
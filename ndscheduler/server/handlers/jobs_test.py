@@ -1,7 +1,10 @@
 """Unit tests for jobs endpoint."""
 
+import datetime
 import json
+import time
 
+import mock
 import tornado.testing
 
 from ndscheduler.corescheduler import scheduler_manager
@@ -11,8 +14,8 @@ from ndscheduler.server.handlers import jobs
 
 
 def mock_get_jobs_yield(self):
-    return_json = self._get_jobs()
-    self.finish(return_json)
+    etag, body = self._get_jobs()
+    self._finish_jobs(etag, body)
 
 
 def mock_get_job_yield(self, job_id):
@@ -20,6 +23,20 @@ def mock_get_job_yield(self, job_id):
     self.finish(return_json)
 
 
+def mock_add_job_yield(self):
+    response = self._add_job()
+    self.set_status(201)
+    self.finish(response)
+
+
+def mock_pause_job_yield(self, job_id):
+    self.finish(self._pause_job(job_id))
+
+
+def mock_resume_job_yield(self, job_id):
+    self.finish(self._resume_job(job_id))
+
+
 def mock_delete_job_yield(self, job_id):
     self._delete_job(job_id)
 
@@ -28,6 +45,21 @@ def mock_modify_job_yield(self, job_id):
     self._modify_job(job_id)
 
 
+def mock_add_jobs_yield(self, jobs):
+    response = self._add_jobs(jobs)
+    if 'error' not in response:
+        self.set_status(201)
+    self.finish(response)
+
+
+def mock_modify_jobs_yield(self, jobs):
+    self.finish(self._modify_jobs(jobs))
+
+
+def mock_delete_jobs_yield(self, job_ids):
+    self.finish(self._delete_jobs(job_ids))
+
+
 class JobsTest(tornado.testing.AsyncHTTPTestCase):
 
     def setUp(self, *args, **kwargs):
@@ -39,11 +71,24 @@ class JobsTest(tornado.testing.AsyncHTTPTestCase):
         self.old_get_job_yield = jobs.Handler.get_job_yield
         self.old_delete_job_yield = jobs.Handler.delete_job_yield
         self.old_modify_job_yield = jobs.Handler.modify_job_yield
+        self.old_add_job_yield = jobs.Handler.add_job_yield
+        self.old_pause_job_yield = jobs.Handler.pause_job_yield
+        self.old_resume_job_yield = jobs.Handler.resume_job_yield
 
         jobs.Handler.get_jobs_yield = mock_get_jobs_yield
         jobs.Handler.get_job_yield = mock_get_job_yield
         jobs.Handler.delete_job_yield = mock_delete_job_yield
         jobs.Handler.modify_job_yield = mock_modify_job_yield
+        jobs.Handler.add_job_yield = mock_add_job_yield
+        jobs.Handler.pause_job_yield = mock_pause_job_yield
+        jobs.Handler.resume_job_yield = mock_resume_job_yield
+
+        self.old_add_jobs_yield = jobs.BulkHandler.add_jobs_yield
+        self.old_modify_jobs_yield = jobs.BulkHandler.modify_jobs_yield
+        self.old_delete_jobs_yield = jobs.BulkHandler.delete_jobs_yield
+        jobs.BulkHandler.add_jobs_yield = mock_add_jobs_yield
+        jobs.BulkHandler.modify_jobs_yield = mock_modify_jobs_yield
+        jobs.BulkHandler.delete_jobs_yield = mock_delete_jobs_yield
 
     def tearDown(self, *args, **kwargs):
         self.server.stop_scheduler()
@@ -51,6 +96,12 @@ class JobsTest(tornado.testing.AsyncHTTPTestCase):
         jobs.Handler.get_job_yield = self.old_get_job_yield
         jobs.Handler.delete_job_yield = self.old_delete_job_yield
         jobs.Handler.modify_job_yield = self.old_modify_job_yield
+        jobs.Handler.add_job_yield = self.old_add_job_yield
+        jobs.Handler.pause_job_yield = self.old_pause_job_yield
+        jobs.Handler.resume_job_yield = self.old_resume_job_yield
+        jobs.BulkHandler.add_jobs_yield = self.old_add_jobs_yield
+        jobs.BulkHandler.modify_jobs_yield = self.old_modify_jobs_yield
+        jobs.BulkHandler.delete_jobs_yield = self.old_delete_jobs_yield
 
         super(JobsTest, self).tearDown(*args, **kwargs)
 
@@ -97,6 +148,15 @@ class JobsTest(tornado.testing.AsyncHTTPTestCase):
                               body=json.dumps(data))
         self.assertEqual(response.code, 400)
 
+        data = {
+            'job_class_string': 'hello.world',
+            'name': 'hello world job',
+            'minute': '*/5',
+            'stagger_window_sec': -1}
+        response = self.fetch(self.JOBS_URL, method='POST', headers=headers,
+                              body=json.dumps(data))
+        self.assertEqual(response.code, 400)
+
     def test_pause_resume_job(self):
         headers = {'Content-Type': 'application/json; charset=UTF-8'}
         data = {
@@ -136,6 +196,29 @@ class JobsTest(tornado.testing.AsyncHTTPTestCase):
         self.assertEqual(job['name'], data['name'])
         self.assertEqual(job['minute'], data['minute'])
 
+    def test_get_jobs_etag(self):
+        headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        data = {
+            'job_class_string': 'hello.world',
+            'name': 'hello world job',
+            'minute': '*/5'}
+        self.fetch(self.JOBS_URL, method='POST', headers=headers, body=json.dumps(data))
+
+        response = self.fetch(self.JOBS_URL)
+        self.assertEqual(response.code, 200)
+        etag = response.headers['Etag']
+
+        response = self.fetch(self.JOBS_URL, headers={'If-None-Match': etag})
+        self.assertEqual(response.code, 304)
+        self.assertEqual(response.body, b'')
+
+        data['name'] = 'another job'
+        self.fetch(self.JOBS_URL, method='POST', headers=headers, body=json.dumps(data))
+        response = self.fetch(self.JOBS_URL, headers={'If-None-Match': etag})
+        self.assertEqual(response.code, 200)
+        self.assertNotEqual(response.headers['Etag'], etag)
+        self.assertEqual(len(json.loads(response.body.decode())['jobs']), 2)
+
     def test_delete_job(self):
         headers = {'Content-Type': 'application/json; charset=UTF-8'}
         data = {
@@ -182,3 +265,99 @@ class JobsTest(tornado.testing.AsyncHTTPTestCase):
         job = self.scheduler.get_job(return_info['job_id'])
         self.assertEqual(utils.get_job_name(job), data['job_class_string'])
         self.assertEqual(job.name, data['name'])
+
+    def test_bulk_jobs(self):
+        headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        data = {'jobs': [
+            {'job_class_string': 'hello.world', 'name': 'job %d' % i, 'minute': '*/5'}
+            for i in range(3)]}
+        response = self.fetch(self.JOBS_URL + '/bulk', method='POST', headers=headers,
+                              body=json.dumps(data))
+        self.assertEqual(response.code, 201)
+        job_ids = json.loads(response.body.decode())['job_ids']
+        self.assertEqual([self.scheduler.get_job(job_id).name for job_id in job_ids],
+                         ['job 0', 'job 1', 'job 2'])
+
+        data = {'jobs': [
+            {'job_id': job_id, 'job_class_string': 'hello.world', 'name': 'renamed',
+             'minute': '*/20'}
+            for job_id in job_ids[:2]]}
+        response = self.fetch(self.JOBS_URL + '/bulk', method='PUT', headers=headers,
+                              body=json.dumps(data))
+        self.assertEqual(response.code, 200)
+        self.assertEqual([self.scheduler.get_job(job_id).name for job_id in job_ids],
+                         ['renamed', 'renamed', 'job 2'])
+
+        response = self.fetch(self.JOBS_URL + '/bulk', method='DELETE', headers=headers,
+                              body=json.dumps({'job_ids': job_ids[1:]}),
+                              allow_nonstandard_methods=True)
+        self.assertEqual(response.code, 200)
+        self.assertEqual([job.id for job in self.scheduler.get_jobs()], job_ids[:1])
+
+        now = datetime.datetime.utcnow()
+        logs = self.scheduler.get_datastore().get_audit_logs(
+            (now - datetime.timedelta(minutes=1)).isoformat(), now.isoformat())['logs']
+        self.assertEqual(sorted(log['event'] for log in logs),
+                         ['added'] * 3 + ['deleted'] * 2 + ['modified'] * 2)
+
+    def test_bulk_jobs_failed(self):
+        headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        job = {'job_class_string': 'hello.world', 'name': 'job', 'minute': '*/5'}
+        response = self.fetch(self.JOBS_URL + '/bulk', method='POST', headers=headers,
+                              body=json.dumps({'jobs': [job, {'name': 'no class'}]}))
+        self.assertEqual(response.code, 400)
+        response = self.fetch(self.JOBS_URL + '/bulk', method='POST', headers=headers,
+                              body=json.dumps({'jobs': []}))
+        self.assertEqual(response.code, 400)
+        self.assertEqual(self.scheduler.get_jobs(), [])
+
+        response = self.fetch(self.JOBS_URL + '/bulk', method='POST', headers=headers,
+                              body=json.dumps({'jobs': [job]}))
+        job_id = json.loads(response.body.decode())['job_ids'][0]
+        response = self.fetch(self.JOBS_URL + '/bulk', method='DELETE', headers=headers,
+                              body=json.dumps({'job_ids': [job_id, 'missing']}),
+                              allow_nonstandard_methods=True)
+        self.assertEqual(response.code, 400)
+        self.assertIn('missing', json.loads(response.body.decode())['error'])
+
+        bad_job = dict(job, minute='abc')
+        response = self.fetch(self.JOBS_URL + '/bulk', method='POST', headers=headers,
+                              body=json.dumps({'jobs': [job, bad_job]}))
+        self.assertEqual(response.code, 400)
+        self.assertIn('error', json.loads(response.body.decode()))
+        response = self.fetch(self.JOBS_URL + '/bulk', method='PUT', headers=headers,
+                              body=json.dumps({'jobs': [dict(bad_job, job_id=job_id)]}))
+        self.assertEqual(response.code, 400)
+        self.assertIn('error', json.loads(response.body.decode()))
+        self.assertEqual([job.id for job in self.scheduler.get_jobs()], [job_id])
+        self.assertIsNotNone(self.scheduler.get_job(job_id))
+
+        response = self.fetch(self.JOBS_URL + '/bulk')
+        self.assertEqual(response.code, 405)
+
+    @tornado.testing.gen_test
+    def test_slow_audit_log_does_not_block_other_requests(self):
+        # The in-memory datastore is per thread, so only the audit log runs on the executor.
+        jobs.Handler.add_job_yield = self.old_add_job_yield
+
+        def slow_add_audit_log(*args, **kwargs):
+            time.sleep(1)
+
+        headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        data = {
+            'job_class_string': 'hello.world',
+            'name': 'hello world job',
+            'minute': '*/5'}
+        with mock.patch.object(self.scheduler, 'add_job', return_value='1234'), \
+                mock.patch.object(self.scheduler.get_datastore(), 'add_audit_log',
+                                  side_effect=slow_add_audit_log):
+            add_job_future = self.http_client.fetch(self.get_url(self.JOBS_URL), method='POST',
+                                                    headers=headers, body=json.dumps(data))
+            start_time = time.time()
+            response = yield self.http_client.fetch(self.get_url(self.JOBS_URL))
+            self.assertEqual(response.code, 200)
+            self.assertLess(time.time() - start_time, 0.5)
+
+            response = yield add_job_future
+            self.assertEqual(response.code, 201)
+            self.assertEqual(json.loads(response.body.decode())['job_id'], '1234')
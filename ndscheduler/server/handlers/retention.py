@@ -0,0 +1,20 @@
+"""Handler for endpoint of retention progress."""
+
+import tornado.web
+
+from ndscheduler.server.handlers import base
+
+
+class Handler(base.BaseHandler):
+
+    @tornado.web.removeslash
+    def get(self):
+        """Returns the progress of purging old executions and audit logs.
+
+        Handles the endpoint GET /api/v1/retention.
+        """
+        progress = self.scheduler_manager.get_retention_progress()
+        return_json = {'enabled': progress is not None}
+        if progress:
+            return_json.update(progress)
+        self.finish(return_json)
@@ -12,11 +12,17 @@ import sys
 import tornado
 
 from ndscheduler import settings
+from ndscheduler import utils
 from ndscheduler.corescheduler import scheduler_manager
 from ndscheduler.server.handlers import audit_logs
+from ndscheduler.server.handlers import execution_stats
 from ndscheduler.server.handlers import executions
+from ndscheduler.server.handlers import executors
+from ndscheduler.server.handlers import export
 from ndscheduler.server.handlers import index
+from ndscheduler.server.handlers import job_classes
 from ndscheduler.server.handlers import jobs
+from ndscheduler.server.handlers import retention
 
 logger = logging.getLogger(__name__)
 
@@ -45,10 +51,19 @@ class SchedulerServer:
 
             # APIs
             (r'/api/%s/jobs' % self.VERSION, jobs.Handler),
+            # Has to come before jobs/(.*), which would take 'bulk' for a job id.
+            (r'/api/%s/jobs/bulk' % self.VERSION, jobs.BulkHandler),
             (r'/api/%s/jobs/(.*)' % self.VERSION, jobs.Handler),
             (r'/api/%s/executions' % self.VERSION, executions.Handler),
+            # Have to come before executions/(.*), which would take them for execution ids.
+            (r'/api/%s/executions/stats' % self.VERSION, execution_stats.Handler),
+            (r'/api/%s/executions/export' % self.VERSION, export.ExecutionsHandler),
             (r'/api/%s/executions/(.*)' % self.VERSION, executions.Handler),
             (r'/api/%s/logs' % self.VERSION, audit_logs.Handler),
+            (r'/api/%s/logs/export' % self.VERSION, export.AuditLogsHandler),
+            (r'/api/%s/retention' % self.VERSION, retention.Handler),
+            (r'/api/%s/executors' % self.VERSION, executors.Handler),
+            (r'/api/%s/job_classes' % self.VERSION, job_classes.Handler),
         ]
         self.application = tornado.web.Application(URLS, **self.tornado_settings)
 
@@ -89,11 +104,33 @@ class SchedulerServer:
                 job_misfire_grace_sec=settings.JOB_MISFIRE_GRACE_SEC,
                 job_max_instances=settings.JOB_MAX_INSTANCES,
                 thread_pool_size=settings.THREAD_POOL_SIZE,
-                timezone=settings.TIMEZONE
+                process_pool_size=settings.PROCESS_POOL_SIZE,
+                executor_type=settings.EXECUTOR_TYPE,
+                executor_pools=settings.EXECUTOR_POOLS,
+                job_class_reload_on_change=settings.JOB_CLASS_RELOAD_ON_CHANGE,
+                timezone=settings.TIMEZONE,
+                execution_write_behind=settings.EXECUTION_WRITE_BEHIND,
+                execution_write_batch_size=settings.EXECUTION_WRITE_BATCH_SIZE,
+                execution_write_flush_interval_sec=settings.EXECUTION_WRITE_FLUSH_INTERVAL_SEC,
+                job_index=settings.JOB_INDEX,
+                compact_job_state=settings.COMPACT_JOB_STATE,
+                job_stagger_window_sec=settings.JOB_STAGGER_WINDOW_SEC,
+                execution_retention_days=settings.EXECUTION_RETENTION_DAYS,
+                execution_retention_days_by_state=settings.EXECUTION_RETENTION_DAYS_BY_STATE,
+                execution_retention_per_job=settings.EXECUTION_RETENTION_PER_JOB,
+                audit_log_retention_days=settings.AUDIT_LOG_RETENTION_DAYS,
+                retention_batch_size=settings.RETENTION_BATCH_SIZE,
+                retention_interval_sec=settings.RETENTION_INTERVAL_SEC,
+                retention_archive_dir=settings.RETENTION_ARCHIVE_DIR,
+                job_cache_max_age_sec=settings.JOB_CACHE_MAX_AGE_SEC,
+                execution_result_inline_max_bytes=settings.EXECUTION_RESULT_INLINE_MAX_BYTES,
+                async_datastore=settings.ASYNC_DATASTORE
             )
 
             cls.singleton = cls(sched_manager)
             cls.singleton.start_scheduler()
+            # Builds the job class registry now, rather than on the first page load.
+            utils.get_available_jobs_json()
             cls.singleton.application.listen(settings.HTTP_PORT, settings.HTTP_ADDRESS)
             logger.info('Running server at %s:%d ...' % (settings.HTTP_ADDRESS, settings.HTTP_PORT))
             logger.info('*** You can access scheduler web ui at http://localhost:%d'
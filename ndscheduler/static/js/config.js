@@ -13,6 +13,7 @@ define([], function() {
     'jobs_url': urlPrefix + '/jobs',
     'executions_url': urlPrefix + '/executions',
     'logs_url': urlPrefix + '/logs',
+    'job_classes_url': urlPrefix + '/job_classes',
     'scheduler_url': urlPrefix + '/scheduler'
   };
 });
@@ -68,7 +68,7 @@ define(['config',
         style = 'running-color';
       } else if (state === 'succeeded') {
         style = 'success-color';
-      } else if (state === 'failed') {
+      } else if (state === 'failed' || state === 'timeout' || state === 'stopped') {
         style = 'failed-color';
       }
       return '<span class="' + style + '">' + state + '</span>';
@@ -118,7 +118,7 @@ define(['config',
       var state = this.get('state');
       if(state === 'scheduled error'){
         style = 'scheduled-error-color';
-      }else if(state === 'failed'){
+      }else if(state === 'failed' || state === 'timeout' || state === 'stopped'){
         style = 'failed-color';
       }else if(state === 'succeeded'){
         style = 'success-color';
@@ -128,6 +128,8 @@ define(['config',
 
       return ('<span><a href="#" data-content="' +
           encodeURI(result) +
+          '" data-execution-id="' + this.get('execution_id') +
+          '" data-truncated="' + (this.get('result_truncated') ? 'true' : 'false') +
           '" data-action="show-result"><i class="fa fa-file-text-o fa-lg ' +
           style + 
           '"></i></a></span>');
@@ -31,22 +31,36 @@ define(['utils',
   return Backbone.Collection.extend({
 
     /**
-     * Fetches number of all executions.
+     * Returns number of all executions, as of the last fetchStats().
      */
     getTotalCount: function() {
-      return this.executions.length;
+      return this.stats ? this.stats.total : 0;
     },
 
     /**
-     * Fetches number of all executions with certain state.
+     * Returns number of all executions with certain state, as of the last
+     * fetchStats().
      *
      * @param {string} state the state of execution, which can only be one
      *   of the following strings: scheduled, running, stopping, stopped,
      *   failed, succeeded, timeout, scheduled error.
      */
     getCount: function(state) {
-      return _.filter(this.executions, function(execution) {
-        return execution.get('state') == state }).length;
+      return this.stats ? this.stats.states[state] : 0;
+    },
+
+    /**
+     * Fetches number of executions per state, which are counted by the api
+     * server, and triggers a 'stats' event once they're here.
+     *
+     * @param {string} query optional query string with the time range.
+     */
+    fetchStats: function(query) {
+      $.getJSON(config.executions_url + '/stats' + (query || ''),
+          _.bind(function(stats) {
+            this.stats = stats;
+            this.trigger('stats');
+          }, this));
     },
 
     /**
@@ -56,6 +70,29 @@ define(['utils',
       // Default, pull latest 10 minutes
       this.url = config.executions_url;
       this.fetch();
+      this.fetchStats();
+    },
+
+    /**
+     * Tells whether the last fetch stopped at the page size, with more
+     * executions left in the time range.
+     */
+    hasMoreExecutions: function() {
+      return !!this.nextCursor;
+    },
+
+    /**
+     * Fetches the next page of executions of the last fetch, added to the
+     * ones already fetched.
+     */
+    getMoreExecutions: function() {
+      if (!this.nextCursor) {
+        return;
+      }
+      var url = this.url.replace(/[?&]cursor=[^&]*/, '');
+      this.url = url + (url.indexOf('?') === -1 ? '?' : '&') + 'cursor=' +
+          encodeURIComponent(this.nextCursor);
+      this.fetch({remove: false, more: true});
     },
 
     /**
@@ -75,9 +112,10 @@ define(['utils',
      * @param {string} end ending time in UTC and in iso8601 format.
      */
     getExecutionsByRange: function(start, end) {
-      this.url = config.executions_url + '?time_range_end=' + end +
-          '&time_range_start=' + start;
+      var query = '?time_range_end=' + end + '&time_range_start=' + start;
+      this.url = config.executions_url + query;
       this.fetch();
+      this.fetchStats(query);
     },
 
     /**
@@ -88,6 +126,7 @@ define(['utils',
      */
     parse: function(response) {
       var executions = response.executions;
+      this.nextCursor = response.next_cursor;
 
       // If api server returns a single execution, then make an array here.
       if (!executions) {
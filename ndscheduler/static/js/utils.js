@@ -2,7 +2,8 @@ require.config({
   paths: {
     'spin': 'vendor/spin',
     'noty': 'vendor/jquery.noty',
-    'jquery': 'vendor/jquery'
+    'jquery': 'vendor/jquery',
+    'config': 'config'
   },
 
   shim: {
@@ -12,7 +13,7 @@ require.config({
   }
 });
 
-define(['spin', 'noty'], function(Spinner) {
+define(['spin', 'config', 'noty'], function(Spinner, config) {
   'use strict';
 
   /**
@@ -111,6 +112,22 @@ define(['spin', 'noty'], function(Spinner) {
     return results[1] || undefined;
   };
 
+  /**
+   * Get the meta info of available job classes. They're only fetched once per page load.
+   *
+   * @param {Function} callback Called with the list of job class meta info.
+   */
+  var jobClassesRequest;
+  var getJobClasses = function(callback) {
+    if (!jobClassesRequest) {
+      jobClassesRequest = $.getJSON(config.job_classes_url).fail(function(response) {
+        jobClassesRequest = undefined;
+        alertError('Failed to load job classes: ' + response.responseText);
+      });
+    }
+    jobClassesRequest.done(callback);
+  };
+
   /**
    * Public functions
    */
@@ -122,6 +139,7 @@ define(['spin', 'noty'], function(Spinner) {
     alertError: alertError,
 
     getTaskArgs: getTaskArgs,
-    getParameterByName: getParameterByName
+    getParameterByName: getParameterByName,
+    getJobClasses: getJobClasses
   };
 });
@@ -28,11 +28,11 @@ define(['backbone', 'bootstrap'], function() {
 
   return Backbone.View.extend({
     initialize: function() {
-      this.listenTo(this.collection, 'sync', this.render);
+      this.listenTo(this.collection, 'stats', this.render);
     },
 
     /**
-     * Event handler for finishing fetching executions data.
+     * Event handler for finishing fetching executions stats.
      */
     render: function() {
       $('#executions-total-count').text(this.collection.getTotalCount());
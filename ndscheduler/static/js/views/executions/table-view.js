@@ -13,6 +13,7 @@ require.config({
     'datatables': 'vendor/jquery.dataTables',
 
     'utils': 'utils',
+    'config': 'config',
     'text': 'vendor/text',
     'execution-result': 'templates/execution-result.html'
   },
@@ -35,10 +36,11 @@ require.config({
 });
 
 define(['utils',
+        'config',
         'text!execution-result',
         'backbone',
         'bootstrap',
-        'datatables'], function(utils, ExecutionResultHtml) {
+        'datatables'], function(utils, config, ExecutionResultHtml) {
   'use strict';
 
   return Backbone.View.extend({
@@ -49,6 +51,11 @@ define(['utils',
       this.listenTo(this.collection, 'request', this.requestRender);
       this.listenTo(this.collection, 'error', this.requestError);
 
+      $('#executions-load-more-button').on('click', _.bind(function(e) {
+        e.preventDefault();
+        this.collection.getMoreExecutions();
+      }, this));
+
       this.table = $('#executions-table').dataTable({
         // Sorted by last updated time
         'order': [[3, 'desc']],
@@ -58,13 +65,36 @@ define(['utils',
         ]
       });
       
+      /**
+       * Shows a result in the result modal, indented if it's JSON.
+       *
+       * @param {string} result
+       */
+      var showResult = function(result) {
+        try {
+          result = JSON.stringify(JSON.parse(result), null, 4);
+        } catch (e) {
+          // Not JSON, shown as is.
+        }
+        $('#result-box').text(result);
+        $('#execution-result-modal').modal();
+      };
+
       $('#executions-table').on('draw.dt', function () {
         var buttons = $('[data-action=show-result]');
         _.each(buttons, function(btn) {
           $(btn).on('click', _.bind(function(e) {
             e.preventDefault();
-            $('#result-box').text(decodeURI($(btn).data('content')));
-            $('#execution-result-modal').modal();
+            // Listings only have a preview of large results, the full one is fetched on demand.
+            if ($(btn).data('truncated') === true) {
+              $.getJSON(config.executions_url + '/' + $(btn).data('execution-id'), function(execution) {
+                showResult(execution.result);
+              }).fail(function(response) {
+                utils.alertError('Request failed: ' + response.responseText);
+              });
+              return;
+            }
+            showResult(decodeURI($(btn).data('content')));
           }, this));
 
           // If there's a query parameter result, we'll display the result.
@@ -90,16 +120,28 @@ define(['utils',
 
     /**
      * Event handler for starting to send network request.
+     *
+     * @param {object} collection
+     * @param {object} xhr
+     * @param {object} options
      */
-    requestRender: function() {
-      this.table.fnClearTable();
+    requestRender: function(collection, xhr, options) {
+      // Further pages are added to the executions already shown.
+      if (!options || !options.more) {
+        this.table.fnClearTable();
+      }
+      $('#executions-load-more').hide();
       this.spinner = utils.startSpinner('executions-spinner');
     },
 
     /**
      * Event handler for finishing fetching execution data.
+     *
+     * @param {object} collection
+     * @param {object} response
+     * @param {object} options
      */
-    render: function() {
+    render: function(collection, response, options) {
       var executions = this.collection.executions;
 
       var data = [];
@@ -115,10 +157,15 @@ define(['utils',
       });
 
       if (data.length) {
-        this.table.fnClearTable();
+        if (!options || !options.more) {
+          this.table.fnClearTable();
+        }
         this.table.fnAddData(data);
       }
 
+      // Only a page of the executions in the time range is fetched at once.
+      $('#executions-load-more').toggle(this.collection.hasMoreExecutions());
+
       utils.stopSpinner(this.spinner);
     }
   });
@@ -50,22 +50,23 @@ define(['utils',
       $('body').append(AddJobModalHtml);
       this.bindAddJobConfirmClickEvent();
 
-      var jobsMetaInfo = $.parseJSON($('#jobs-meta-info').html());
-      var data = [];
-      _.forEach(jobsMetaInfo, function(job) {
-        data.push({
-          id: job.job_class_string,
-          text: job.job_class_string,
-          job: job
-        })
-      });
-      $('#input-job-task-class').select2({
-        placeholder: "Select an job class, please",
-        data: data
-      }).on("select2-selecting", function(e) {
-        $('#add-job-class-notes').html(
-            _.template(JobClassNotesHtml)({job: e.choice.job})
-        );
+      utils.getJobClasses(function(jobsMetaInfo) {
+        var data = [];
+        _.forEach(jobsMetaInfo, function(job) {
+          data.push({
+            id: job.job_class_string,
+            text: job.job_class_string,
+            job: job
+          })
+        });
+        $('#input-job-task-class').select2({
+          placeholder: "Select an job class, please",
+          data: data
+        }).on("select2-selecting", function(e) {
+          $('#add-job-class-notes').html(
+              _.template(JobClassNotesHtml)({job: e.choice.job})
+          );
+        });
       });
 
     },
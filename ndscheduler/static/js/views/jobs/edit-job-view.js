@@ -47,21 +47,22 @@ define(['utils',
     initialize: function() {
       $('body').append(EditJobModalHtml);
 
-      var jobsMetaInfo = $.parseJSON($('#jobs-meta-info').html());
-      var data = [];
-      _.forEach(jobsMetaInfo, function(job) {
-        data.push({
-          id: job.job_class_string,
-          text: job.job_class_string,
-          job: job
-        })
-      });
-      $('#edit-input-job-task-class').select2({
-        data: data
-      }).on("select2-selecting", function(e) {
-        $('#edit-job-class-notes').html(
-            _.template(JobClassNotesHtml)({job: e.choice.job})
-        );
+      utils.getJobClasses(function(jobsMetaInfo) {
+        var data = [];
+        _.forEach(jobsMetaInfo, function(job) {
+          data.push({
+            id: job.job_class_string,
+            text: job.job_class_string,
+            job: job
+          })
+        });
+        $('#edit-input-job-task-class').select2({
+          data: data
+        }).on("select2-selecting", function(e) {
+          $('#edit-job-class-notes').html(
+              _.template(JobClassNotesHtml)({job: e.choice.job})
+          );
+        });
       });
 
       this.bindEditJobConfirmClickEvent();
@@ -1,16 +1,26 @@
 """Some convenient utils functions."""
 
+import hashlib
 import importlib
+import json
 import logging
 import glob
 import os
+import sys
+import threading
+import time
 
 from ndscheduler import settings
+from ndscheduler.corescheduler import utils as core_utils
 
 logger = logging.getLogger(__name__)
 
+# Metadata of the job classes, as served by GET /api/v1/job_classes, and what it was built from.
+_job_classes_lock = threading.Lock()
+_job_classes = {'mtimes': None, 'json': None, 'etag': None, 'scanned_at': None}
 
-def get_all_available_jobs():
+
+def get_all_available_jobs(module_names=None):
     """Returns a list of available jobs info.
 
     Looks like this:
@@ -26,6 +36,8 @@ def get_all_available_jobs():
                 'notes': 'need to specify environment variable API_KEY first'
             }
         ]
+    :param list module_names: modules to look for job classes in, as returned by
+        _get_job_module_files(). Defaults to all the modules of settings.JOB_CLASS_PACKAGES.
     :return: a list of available jobs info.
     :rtype: a list of dict
     """
@@ -33,7 +45,28 @@ def get_all_available_jobs():
     # Prevent circular import
     from ndscheduler.corescheduler import job
 
+    if module_names is None:
+        module_names = _get_job_module_files()
     results = []
+    for module_name in module_names:
+        job_module = importlib.import_module(module_name)
+        for property in dir(job_module):
+            module_property = getattr(job_module, property)
+            try:
+                if issubclass(module_property, job.JobBase):
+                    results.append(module_property.meta_info())
+            except TypeError:
+                pass
+    return results
+
+
+def _get_job_module_files():
+    """Returns the modules of the packages in settings.JOB_CLASS_PACKAGES.
+
+    :return: a dictionary mapping module name to the path of its file.
+    :rtype: dict
+    """
+    module_files = {}
     for job_class_package in settings.JOB_CLASS_PACKAGES:
         try:
             package = importlib.import_module(job_class_package)
@@ -42,18 +75,49 @@ def get_all_available_jobs():
             continue
 
         for dir_path in package.__path__:
-            files = glob.glob(os.path.join(dir_path, '*.py'))
-            for file in files:
+            for file in sorted(glob.glob(os.path.join(dir_path, '*.py'))):
                 filename = os.path.basename(file)
                 if filename == '__init__.py':
                     continue
-                module_name = filename[:-3]
-                job_module = importlib.import_module('%s.%s' % (job_class_package, module_name))
-                for property in dir(job_module):
-                    module_property = getattr(job_module, property)
-                    try:
-                        if issubclass(module_property, job.JobBase):
-                            results.append(module_property.meta_info())
-                    except TypeError:
-                        pass
-    return results
+                module_files['%s.%s' % (job_class_package, filename[:-3])] = file
+    return module_files
+
+
+def get_available_jobs_json():
+    """Returns get_all_available_jobs() as JSON, along with its ETag.
+
+    It's only rebuilt when a module of settings.JOB_CLASS_PACKAGES was added, removed or
+    modified since the last call, which costs a stat() call per module. Modules are looked at
+    no more than once per settings.JOB_CLASSES_RESCAN_INTERVAL_SEC. If
+    settings.JOB_CLASS_RELOAD_ON_CHANGE is set, modified modules are reloaded first.
+
+    :return: a tuple of (JSON string, ETag string)
+    :rtype: tuple
+    """
+    with _job_classes_lock:
+        now = time.time()
+        scanned_at = _job_classes['scanned_at']
+        if (_job_classes['json'] is not None and scanned_at is not None and
+                0 <= now - scanned_at < settings.JOB_CLASSES_RESCAN_INTERVAL_SEC):
+            return _job_classes['json'], _job_classes['etag']
+
+        mtimes = {}
+        for module_name, file in _get_job_module_files().items():
+            try:
+                mtimes[module_name] = os.path.getmtime(file)
+            except OSError:
+                continue
+
+        old_mtimes = _job_classes['mtimes']
+        if mtimes != old_mtimes:
+            for module_name, mtime in mtimes.items():
+                if (settings.JOB_CLASS_RELOAD_ON_CHANGE and old_mtimes and
+                        module_name in sys.modules and
+                        old_mtimes.get(module_name, mtime) != mtime):
+                    core_utils.reload_module(sys.modules[module_name])
+            blob = json.dumps(get_all_available_jobs(list(mtimes)))
+            _job_classes.update(
+                mtimes=mtimes, json=blob,
+                etag='"%s"' % hashlib.sha1(blob.encode('utf-8')).hexdigest())
+        _job_classes['scanned_at'] = now
+        return _job_classes['json'], _job_classes['etag']
@@ -1,13 +1,60 @@
 """Unit tests for utils module."""
 
+import os
+import shutil
+import sys
+import tempfile
 import unittest
 
+import mock
+
 from ndscheduler.corescheduler import utils
 
 
 class UtilsTest(unittest.TestCase):
 
+    def setUp(self):
+        utils.invalidate_import_cache()
+        self.addCleanup(utils.invalidate_import_cache)
+
     def test_class_import_from_path(self):
         path = 'ndscheduler.default_settings_test'
         module = utils.import_from_path(path)
         self.assertEqual(module.DEBUG, True)
+
+    def test_import_from_path_is_cached(self):
+        path = 'ndscheduler.corescheduler.job.JobBase'
+        job_class = utils.import_from_path(path)
+        with mock.patch('ndscheduler.corescheduler.utils.__import__', create=True) as mock_import:
+            self.assertIs(utils.import_from_path(path), job_class)
+            self.assertFalse(mock_import.called)
+
+            utils.invalidate_import_cache(path)
+            mock_import.return_value = sys.modules['ndscheduler']
+            self.assertIs(utils.import_from_path(path), job_class)
+            self.assertTrue(mock_import.called)
+
+    def test_import_from_path_reload_on_change(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        sys.path.insert(0, tmp_dir)
+        self.addCleanup(sys.path.remove, tmp_dir)
+        self.addCleanup(sys.modules.pop, 'reload_test_jobs', None)
+        file_path = os.path.join(tmp_dir, 'reload_test_jobs.py')
+
+        with open(file_path, 'w') as f:
+            f.write('class MyJob(object):\n    VERSION = 1\n')
+        path = 'reload_test_jobs.MyJob'
+        self.assertEqual(utils.import_from_path(path).VERSION, 1)
+
+        with open(file_path, 'w') as f:
+            f.write('class MyJob(object):\n    VERSION = 2\n')
+        mtime = os.path.getmtime(file_path) + 10
+        os.utime(file_path, (mtime, mtime))
+
+        # Cached
+        self.assertEqual(utils.import_from_path(path).VERSION, 1)
+
+        utils.set_import_reload_on_change(True)
+        self.addCleanup(utils.set_import_reload_on_change, False)
+        self.assertEqual(utils.import_from_path(path).VERSION, 2)
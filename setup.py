@@ -5,8 +5,10 @@ import multiprocessing  # To make python setup.py test happy
 import os
 import shutil
 import subprocess
+import sys
 
 from distutils.command.clean import clean
+from setuptools.command.build_py import build_py
 from setuptools import find_packages
 from setuptools import setup
 
@@ -39,8 +41,26 @@ class CleanHook(clean):
         subprocess.call('find . -name "*.pyc" -exec rm -rf {} \;',
                         shell=True)
 
+
+class BuildPyHook(build_py):
+    """Leaves out the modules that can't be compiled by this version of Python."""
+
+    # (package, module) of modules using async/await, i.e., requiring Python 3.5+.
+    PY35_MODULES = [
+        ('ndscheduler.corescheduler.datastore', 'async_datastore'),
+    ]
+
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 5):
+            modules = [module for module in modules if module[:2] not in self.PY35_MODULES]
+        return modules
+
 # -*- Classifiers -*-
 
+# Python 2.7 and 3.3+ are supported, except for the asyncio datastore (ASYNC_DATASTORE setting),
+# which requires Python 3.6+ and isn't installed on versions older than 3.5.
+
 classes = """
     Development Status :: 5 - Production/Stable
     License :: OSI Approved :: BSD License
@@ -87,5 +107,5 @@ setup(
         'python-dateutil >= 2.2',
     ],
     classifiers=classifiers,
-    cmdclass={'clean': CleanHook},
+    cmdclass={'clean': CleanHook, 'build_py': BuildPyHook},
 )